@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import Certificate
+from .stats import invalidate_certificate_stats
 
 
 @admin.register(Certificate)
@@ -105,6 +107,8 @@ class CertificateAdmin(admin.ModelAdmin):
     update_status.short_description = "Mettre à jour le statut"
     
     def mark_for_enrichment(self, request, queryset):
-        count = queryset.update(needs_enrichment=True)
+        # update() contourne save() et les signaux: updated_at et cache à la main
+        count = queryset.update(needs_enrichment=True, updated_at=timezone.now())
+        invalidate_certificate_stats()
         self.message_user(request, f'{count} certificats marqués pour enrichissement')
     mark_for_enrichment.short_description = "Marquer pour enrichissement"
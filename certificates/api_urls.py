@@ -0,0 +1,18 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from . import views_api
+
+app_name = 'api'
+
+router = DefaultRouter()
+router.register('certificates', views_api.CertificateViewSet, basename='certificate')
+
+urlpatterns = [
+    # Authentification des intégrations (JWT)
+    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    
+    path('', include(router.urls)),
+]
@@ -2,7 +2,8 @@
 Service d'analyse CSV pour la détection intelligente des certificats
 """
 from datetime import datetime
-from typing import Dict, List, Tuple
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
 from .models import Certificate
 
 
@@ -17,35 +18,59 @@ class CSVAnalyzer:
     ACTION_DUPLICATE = 'duplicate'
     ACTION_CONFLICT = 'conflict'
     
+    # Colonnes chargées pour la comparaison (pas de pem_data / san_list)
+    EXISTING_FIELDS = ('id', 'common_name', 'issuer', 'valid_until', 'template_name', 'environment', 'created_at')
+    
     def __init__(self):
+        self._reset()
+    
+    def _reset(self):
+        """
+        Oublie les certificats chargés: l'état ne couvre que le lot en cours
+        (iter_analysis), pour que la mémoire ne croisse pas avec le fichier
+        """
+        # common_name -> liste de certificats
         self.existing_certs = {}
-        self._load_existing_certificates()
+        # common_name -> certificat dont la date d'expiration est la plus récente
+        self.most_recent = {}
+        # common_name -> {date d'expiration: certificat}
+        self.existing_dates = {}
+        # common_names déjà recherchés en base (présents ou non)
+        self._loaded_names = set()
     
-    def _load_existing_certificates(self):
+    def _load_existing_certificates(self, common_names: Iterable[str]):
         """
-        Charge tous les certificats actifs (non archivés) de la base
-        Clé: common_name -> liste de certificats
+        Charge les certificats actifs (non archivés) portant ces common_names
+        
+        Seules les colonnes utiles sont lues, et uniquement pour les noms
+        qui n'ont pas encore été chargés.
         """
-        active_certs = Certificate.objects.filter(archived=False).select_related()
+        names = set(common_names) - self._loaded_names
+        if not names:
+            return
+        self._loaded_names.update(names)
+        
+        active_certs = Certificate.objects.filter(
+            archived=False,
+            common_name__in=names
+        ).values_list(*self.EXISTING_FIELDS)
         
-        for cert in active_certs:
-            if cert.common_name not in self.existing_certs:
-                self.existing_certs[cert.common_name] = []
+        for row in active_certs:
+            cert = dict(zip(self.EXISTING_FIELDS, row))
             
             # Normaliser valid_until en date (pas datetime) pour comparaison
-            valid_until = cert.valid_until
+            valid_until = cert['valid_until']
             if hasattr(valid_until, 'date'):
                 valid_until = valid_until.date()
+            cert['valid_until'] = valid_until
             
-            self.existing_certs[cert.common_name].append({
-                'id': cert.id,
-                'common_name': cert.common_name,
-                'issuer': cert.issuer,
-                'valid_until': valid_until,
-                'template_name': cert.template_name,
-                'environment': cert.environment,
-                'created_at': cert.created_at,
-            })
+            common_name = cert['common_name']
+            self.existing_certs.setdefault(common_name, []).append(cert)
+            self.existing_dates.setdefault(common_name, {}).setdefault(valid_until, cert)
+            
+            most_recent = self.most_recent.get(common_name)
+            if most_recent is None or valid_until > most_recent['valid_until']:
+                self.most_recent[common_name] = cert
     
     def analyze_certificate(self, csv_cert: Dict) -> Dict:
         """
@@ -67,6 +92,10 @@ class CSVAnalyzer:
         if csv_date and hasattr(csv_date, 'date'):
             csv_date = csv_date.date()
         
+        # Cas d'un appel direct (hors iter_analysis)
+        if common_name not in self._loaded_names:
+            self._load_existing_certificates([common_name])
+        
         # Certificat n'existe pas du tout
         if common_name not in self.existing_certs:
             return {
@@ -77,15 +106,8 @@ class CSVAnalyzer:
                 'recommendation': 'Sera créé'
             }
         
-        # Certificat(s) existant(s) avec le même common_name
-        existing_versions = self.existing_certs[common_name]
-        
         # Chercher un doublon exact (même date d'expiration)
-        exact_match = None
-        for existing in existing_versions:
-            if existing['valid_until'] == csv_date:
-                exact_match = existing
-                break
+        exact_match = self.existing_dates[common_name].get(csv_date)
         
         # Doublon exact trouvé
         if exact_match:
@@ -97,8 +119,8 @@ class CSVAnalyzer:
                 'recommendation': 'Sera ignoré'
             }
         
-        # Trouver le certificat avec la date la plus récente
-        most_recent = max(existing_versions, key=lambda x: x['valid_until'])
+        # Certificat avec la date la plus récente (précalculé au chargement)
+        most_recent = self.most_recent[common_name]
         
         # Cas 1: CSV contient une version plus récente (mise à jour)
         if csv_date > most_recent['valid_until']:
@@ -120,6 +142,83 @@ class CSVAnalyzer:
                 'recommendation': 'Nécessite décision manuelle'
             }
     
+    DEFAULT_CHUNK_SIZE = 1000
+    
+    @staticmethod
+    def empty_summary() -> Dict:
+        return {
+            'new_count': 0,
+            'update_count': 0,
+            'duplicate_count': 0,
+            'conflict_count': 0,
+            'error_count': 0,
+            'total': 0
+        }
+    
+    def analyze_row(self, cert_data: Dict, summary: Dict) -> Dict:
+        """Analyse une ligne (éventuellement en erreur) et met à jour le résumé"""
+        summary['total'] += 1
+        
+        # Ignorer les lignes avec erreurs
+        if 'error' in cert_data:
+            summary['error_count'] += 1
+            return {
+                'csv_data': cert_data,
+                'action': 'error',
+                'existing_cert': None,
+                'reason': cert_data.get('error'),
+                'recommendation': 'Sera ignoré'
+            }
+        
+        # Une date d'expiration est indispensable pour comparer et créer
+        if not cert_data.get('valid_until'):
+            summary['error_count'] += 1
+            return {
+                'csv_data': cert_data,
+                'action': 'error',
+                'existing_cert': None,
+                'reason': f"Ligne {cert_data.get('line_number')}: date d'expiration absente ou invalide",
+                'recommendation': 'Sera ignoré'
+            }
+        
+        # Analyser le certificat
+        analysis = self.analyze_certificate(cert_data)
+        
+        # Mettre à jour les compteurs
+        if analysis['action'] == self.ACTION_NEW:
+            summary['new_count'] += 1
+        elif analysis['action'] == self.ACTION_UPDATE:
+            summary['update_count'] += 1
+        elif analysis['action'] == self.ACTION_DUPLICATE:
+            summary['duplicate_count'] += 1
+        elif analysis['action'] == self.ACTION_CONFLICT:
+            summary['conflict_count'] += 1
+        
+        return analysis
+    
+    def iter_analysis(self, csv_rows: Iterable[Dict], summary: Dict,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict]:
+        """
+        Analyse un flux de lignes CSV par lots de chunk_size
+        
+        Génère un résultat par ligne (format de analyze_certificate) et tient
+        à jour `summary` au fil de l'eau: la mémoire utilisée ne dépend que
+        de chunk_size, pas de la taille du fichier.
+        """
+        rows = iter(csv_rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            # Une requête par lot, limitée aux common_names du lot
+            self._reset()
+            self._load_existing_certificates(
+                cert_data['common_name'] for cert_data in chunk
+                if 'error' not in cert_data and cert_data.get('valid_until')
+            )
+            for cert_data in chunk:
+                yield self.analyze_row(cert_data, summary)
+    
     def analyze_batch(self, csv_certificates: List[Dict]) -> Dict:
         """
         Analyse un lot de certificats du CSV
@@ -136,42 +235,8 @@ class CSVAnalyzer:
                 }
             }
         """
-        results = []
-        summary = {
-            'new_count': 0,
-            'update_count': 0,
-            'duplicate_count': 0,
-            'conflict_count': 0,
-            'error_count': 0,
-            'total': len(csv_certificates)
-        }
-        
-        for cert_data in csv_certificates:
-            # Ignorer les lignes avec erreurs
-            if 'error' in cert_data:
-                summary['error_count'] += 1
-                results.append({
-                    'csv_data': cert_data,
-                    'action': 'error',
-                    'existing_cert': None,
-                    'reason': cert_data.get('error'),
-                    'recommendation': 'Sera ignoré'
-                })
-                continue
-            
-            # Analyser le certificat
-            analysis = self.analyze_certificate(cert_data)
-            results.append(analysis)
-            
-            # Mettre à jour les compteurs
-            if analysis['action'] == self.ACTION_NEW:
-                summary['new_count'] += 1
-            elif analysis['action'] == self.ACTION_UPDATE:
-                summary['update_count'] += 1
-            elif analysis['action'] == self.ACTION_DUPLICATE:
-                summary['duplicate_count'] += 1
-            elif analysis['action'] == self.ACTION_CONFLICT:
-                summary['conflict_count'] += 1
+        summary = self.empty_summary()
+        results = list(self.iter_analysis(csv_certificates, summary))
         
         return {
             'results': results,
@@ -0,0 +1,129 @@
+"""
+Export en flux de l'inventaire des certificats (CSV / JSON)
+
+Les lignes sont lues par un itérateur côté serveur (curseur nommé sur
+PostgreSQL) et écrites par blocs: ni le queryset ni le fichier ne sont
+jamais entièrement en mémoire.
+
+Le CSV reprend le format de l'import (CSVImportForm), avec une 8e colonne
+Environnement: un export peut être réimporté tel quel. Le JSON reprend les
+champs de l'import groupé de l'API (POST /api/certificates/bulk/).
+"""
+import csv
+import json
+from typing import Iterable, Iterator
+
+from .filters import filter_certificates
+from .models import Certificate
+from .pagination import KEYSET_ORDERING
+
+EXPORT_FORMATS = ('csv', 'json')
+
+# Lignes lues par aller-retour base et écrites par bloc
+EXPORT_CHUNK_SIZE = 2000
+
+# Colonnes lues (ordre du format d'import CSV)
+EXPORT_FIELDS = (
+    'common_name',
+    'issuer',
+    'valid_until',
+    'key_usage',
+    'friendly_name',
+    'status',
+    'template_name',
+    'environment',
+)
+
+CSV_HEADER = (
+    'Délivré à',
+    'Délivré par',
+    "Date d'expiration",
+    'Rôles prévus',
+    'Nom convivial',
+    'Statut',
+    'Modèle de certificat',
+    'Environnement',
+)
+
+# Valeur écrite par l'autorité de certification pour un champ vide
+CSV_EMPTY_VALUE = '<Aucun>'
+
+STATUS_LABELS = dict(Certificate.STATUS_CHOICES)
+
+
+def get_export_rows(params=None, include_archived: bool = False):
+    """
+    Tuples (EXPORT_FIELDS) des certificats correspondant aux filtres de la liste
+    
+    Args:
+        params: Filtres GET de la liste des certificats (status, environment, search...)
+        include_archived: Exporter aussi les certificats archivés
+    """
+    queryset = Certificate.objects.all()
+    if not include_archived:
+        queryset = queryset.filter(archived=False)
+    
+    queryset = filter_certificates(queryset.order_by(*KEYSET_ORDERING), params or {})
+    return queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+class _LineBuffer:
+    """Pseudo-fichier: csv.writer écrit dans une liste de lignes vidée à chaque bloc"""
+    
+    def __init__(self):
+        self.lines = []
+    
+    def write(self, line):
+        self.lines.append(line)
+
+
+def iter_csv(rows: Iterable, delimiter: str = '\t') -> Iterator[str]:
+    """Blocs de texte CSV (en-tête compris) au format de l'import"""
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator='\n')
+    
+    # BOM: Excel ouvre le fichier en UTF-8 (l'import le détecte)
+    buffer.write('\ufeff')
+    writer.writerow(CSV_HEADER)
+    
+    for index, (common_name, issuer, valid_until, key_usage, friendly_name,
+                status, template_name, environment) in enumerate(rows, start=1):
+        writer.writerow((
+            common_name,
+            issuer,
+            valid_until.strftime('%d/%m/%Y'),
+            key_usage or CSV_EMPTY_VALUE,
+            friendly_name or CSV_EMPTY_VALUE,
+            STATUS_LABELS.get(status, status or ''),
+            template_name or '',
+            environment or '',
+        ))
+        if index % EXPORT_CHUNK_SIZE == 0:
+            yield ''.join(buffer.lines)
+            buffer.lines.clear()
+    
+    yield ''.join(buffer.lines)
+
+
+def iter_json(rows: Iterable) -> Iterator[str]:
+    """Blocs d'un tableau JSON d'objets (champs de l'import groupé de l'API)"""
+    separator = '\n'
+    parts = ['[']
+    
+    for index, row in enumerate(rows, start=1):
+        item = dict(zip(EXPORT_FIELDS, row))
+        item['valid_until'] = item['valid_until'].isoformat()
+        parts.append(separator + json.dumps(item, ensure_ascii=False))
+        separator = ',\n'
+        if index % EXPORT_CHUNK_SIZE == 0:
+            yield ''.join(parts)
+            parts = []
+    
+    parts.append('\n]\n')
+    yield ''.join(parts)
+
+
+def iter_export(export_format: str, rows: Iterable, delimiter: str = '\t') -> Iterator[str]:
+    if export_format == 'json':
+        return iter_json(rows)
+    return iter_csv(rows, delimiter=delimiter)
@@ -0,0 +1,85 @@
+"""
+Filtres de la liste des certificats (paramètres GET)
+
+Partagés par la vue liste et l'API: une même URL de filtres donne
+les mêmes certificats dans les deux.
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .search import search_certificates
+
+# Période d'expiration -> nombre de jours à partir d'aujourd'hui
+EXPIRATION_PERIODS = {
+    'today': 0,
+    'week': 7,
+    'month': 30,
+    'quarter': 90,
+}
+
+
+def filter_certificates(queryset, params):
+    """
+    Applique les filtres de la liste (statut, environnement, émetteur,
+    jours restants, date/période d'expiration, recherche)
+    
+    Args:
+        queryset: QuerySet de Certificate
+        params: QueryDict (request.GET) ou dictionnaire équivalent
+    """
+    # Filtre par statut
+    status = params.get('status')
+    if status:
+        queryset = queryset.filter(status=status)
+    
+    # Filtre par environnement
+    environment = params.get('environment')
+    if environment:
+        queryset = queryset.filter(environment=environment)
+    
+    # Filtre par émetteur
+    issuer = params.get('issuer')
+    if issuer:
+        queryset = queryset.filter(issuer__icontains=issuer)
+    
+    # Filtre par jours restants (utilise le champ DB pour performance)
+    days = params.get('days')
+    if days:
+        try:
+            if days == 'expired':
+                queryset = queryset.filter(days_remaining__lt=0)
+            elif days == 'critical':
+                queryset = queryset.filter(days_remaining__gte=0, days_remaining__lte=7)
+            elif days == 'warning':
+                queryset = queryset.filter(days_remaining__gt=7, days_remaining__lte=30)
+            elif days == 'safe':
+                queryset = queryset.filter(days_remaining__gt=30)
+            else:
+                days_int = int(days)
+                queryset = queryset.filter(days_remaining=days_int)
+        except ValueError:
+            pass
+    
+    # Filtre par date d'expiration
+    expiration_date = params.get('expiration_date')
+    if expiration_date:
+        try:
+            date_obj = datetime.strptime(expiration_date, '%Y-%m-%d').date()
+            queryset = queryset.filter(valid_until=date_obj)
+        except ValueError:
+            pass
+    
+    # Filtre par période d'expiration
+    expiration_period = params.get('expiration_period')
+    if expiration_period in EXPIRATION_PERIODS:
+        today = timezone.now().date()
+        period_end = today + timedelta(days=EXPIRATION_PERIODS[expiration_period])
+        queryset = queryset.filter(valid_until__range=[today, period_end])
+    
+    # Recherche générale, classée par pertinence (index trigrammes sur PostgreSQL)
+    search = (params.get('search') or '').strip()
+    if search:
+        queryset = search_certificates(queryset, search)
+    
+    return queryset
@@ -1,8 +1,8 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import Certificate
+import codecs
 import csv
-import io
 from datetime import datetime
 
 
@@ -59,7 +59,7 @@ class CSVImportForm(forms.Form):
     
     csv_file = forms.FileField(
         label="Fichier CSV",
-        help_text="Format: Délivré à | Délivré par | Date d'expiration | Rôles prévus | Nom convivial | Statut | Modèle de certificat",
+        help_text="Format: Délivré à | Délivré par | Date d'expiration | Rôles prévus | Nom convivial | Statut | Modèle de certificat [| Environnement]",
         widget=forms.FileInput(attrs={
             'class': 'form-control',
             'accept': '.csv,.txt'
@@ -111,37 +111,112 @@ class CSVImportForm(forms.Form):
         
         return csv_file
     
-    def parse_csv(self):
+    @classmethod
+    def for_file(cls, csv_file, skip_header=True, delimiter='\t', default_environment=None):
         """
-        Parse le fichier CSV et retourne une liste de dictionnaires
-        avec preview des données
+        Formulaire prêt à parser un fichier hors requête HTTP
+        (tâche Celery, commande de gestion): pas de limite de taille d'upload
         """
-        csv_file = self.cleaned_data['csv_file']
-        skip_header = self.cleaned_data['skip_header']
-        delimiter = self.cleaned_data['delimiter']
+        form = cls()
+        form.cleaned_data = {
+            'csv_file': csv_file,
+            'skip_header': skip_header,
+            'delimiter': delimiter,
+            'default_environment': default_environment,
+        }
+        return form
+    
+    # Taille du préfixe utilisé pour détecter l'encodage et des blocs lus ensuite
+    ENCODING_PREFIX_SIZE = 64 * 1024
+    READ_CHUNK_SIZE = 64 * 1024
+    
+    # Encodages essayés sur le préfixe (latin-1 accepte toujours)
+    ENCODINGS = ['utf-8', 'windows-1252', 'latin-1']
+    
+    def detect_encoding(self, prefix: bytes) -> str:
+        """
+        Détecte l'encodage à partir du début du fichier
+        Un caractère multi-octets coupé en fin de préfixe est toléré.
+        """
+        if prefix.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
         
-        # Lire le contenu avec détection automatique de l'encodage
-        csv_file.seek(0)
-        raw_content = csv_file.read()
+        for encoding in self.ENCODINGS:
+            try:
+                codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+                return encoding
+            except UnicodeDecodeError:
+                continue
         
-        # Essayer différents encodages courants
-        encodings = ['utf-8-sig', 'utf-8', 'windows-1252', 'iso-8859-1', 'cp1252', 'latin-1']
-        content = None
+        raise ValidationError("Impossible de lire le fichier. Encodage non supporté.")
+    
+    def iter_decoded_chunks(self, csv_file):
+        """
+        Lit et décode le fichier bloc par bloc (mémoire constante)
+        
+        Si un bloc ultérieur n'est pas valide dans l'encodage détecté
+        (ex: fichier Windows sans accent dans le préfixe), le reste du
+        fichier est décodé en windows-1252 à partir de l'octet fautif.
+        """
+        csv_file.seek(0)
+        chunk = csv_file.read(self.ENCODING_PREFIX_SIZE)
+        encoding = self.detect_encoding(chunk)
+        if encoding == 'utf-8-sig':
+            # BOM retiré ici pour que les positions d'erreur portent sur les octets lus
+            chunk = chunk[len(codecs.BOM_UTF8):]
+            encoding = 'utf-8'
+        decoder = codecs.getincrementaldecoder(encoding)()
         
-        for encoding in encodings:
+        while chunk:
             try:
-                content = raw_content.decode(encoding)
-                break
-            except (UnicodeDecodeError, AttributeError):
+                yield decoder.decode(chunk)
+            except UnicodeDecodeError as e:
+                # Octets en attente du bloc précédent (caractère coupé) + bloc courant:
+                # la partie valide garde l'encodage détecté, la suite passe en windows-1252
+                data = decoder.getstate()[0] + chunk
+                yield data[:e.start].decode(encoding)
+                decoder = codecs.getincrementaldecoder('windows-1252')(errors='replace')
+                yield decoder.decode(data[e.start:])
+            chunk = csv_file.read(self.READ_CHUNK_SIZE)
+        
+        yield decoder.decode(b'', final=True)
+    
+    def iter_lines(self, csv_file):
+        """Découpe le flux décodé en lignes (fin de ligne conservée pour le module csv)"""
+        pending = ''
+        for text in self.iter_decoded_chunks(csv_file):
+            if not text:
                 continue
+            lines = (pending + text).split('\n')
+            # La dernière ligne peut être incomplète: elle attend le bloc suivant
+            pending = lines.pop()
+            for line in lines:
+                yield line + '\n'
+        if pending:
+            yield pending
+    
+    # Colonne optionnelle "Environnement" (8e colonne, écrite par l'export)
+    ENVIRONMENTS = {choice for choice, _ in Certificate.ENVIRONMENT_CHOICES}
+    
+    def parse_environment(self, value: str):
+        """Code d'environnement de la 8e colonne (None si absent ou inconnu)"""
+        value = value.strip().lower()
+        return value if value in self.ENVIRONMENTS else None
+    
+    def iter_csv_rows(self):
+        """
+        Parse le fichier CSV en flux et génère un dictionnaire par ligne
         
-        if content is None:
-            raise ValidationError("Impossible de lire le fichier. Encodage non supporté.")
+        Les lignes ne sont jamais toutes chargées en mémoire: elles peuvent
+        être passées directement à CSVAnalyzer.iter_analysis().
+        """
+        csv_file = self.cleaned_data['csv_file']
+        skip_header = self.cleaned_data['skip_header']
+        delimiter = self.cleaned_data['delimiter']
+        default_environment = self.cleaned_data.get('default_environment') or None
         
         # Parser le CSV
-        reader = csv.reader(io.StringIO(content), delimiter=delimiter)
-        
-        certificates_data = []
+        reader = csv.reader(self.iter_lines(csv_file), delimiter=delimiter)
         
         for i, row in enumerate(reader):
             # Ignorer l'en-tête si demandé
@@ -168,7 +243,7 @@ class CSVImportForm(forms.Form):
                 else:
                     valid_until = None
                 
-                cert_data = {
+                yield {
                     'common_name': row[0].strip() if len(row) > 0 else '',
                     'issuer': row[1].strip() if len(row) > 1 else '',
                     'valid_until': valid_until,
@@ -176,21 +251,24 @@ class CSVImportForm(forms.Form):
                     'friendly_name': row[4].strip() if len(row) > 4 and row[4].strip() != '<Aucun>' else None,
                     'status_csv': row[5].strip() if len(row) > 5 else '',
                     'template_name': row[6].strip() if len(row) > 6 else None,
-                    'environment': self.cleaned_data.get('default_environment') or None,
+                    'environment': self.parse_environment(row[7] if len(row) > 7 else '') or default_environment,
                     'line_number': i + 1,
                 }
                 
-                certificates_data.append(cert_data)
-                
             except Exception as e:
                 # Ajouter l'erreur aux données pour affichage
-                certificates_data.append({
+                yield {
                     'error': f"Erreur ligne {i + 1}: {str(e)}",
                     'line_number': i + 1,
                     'raw_data': row,
-                })
-        
-        return certificates_data
+                }
+    
+    def parse_csv(self):
+        """
+        Parse le fichier CSV et retourne une liste de dictionnaires
+        avec preview des données
+        """
+        return list(self.iter_csv_rows())
 
 
 class DomainScanForm(forms.Form):
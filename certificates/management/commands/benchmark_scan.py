@@ -0,0 +1,163 @@
+"""
+Commande pour mesurer le gain du scan parallèle contre un serveur TLS local
+Usage: python manage.py benchmark_scan [--hosts 20] [--workers 10] [--latency 0.5]
+"""
+import datetime
+import os
+import socket
+import ssl
+import tempfile
+import threading
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.core.management.base import BaseCommand
+
+from certificates.utils import CertificateScanner
+
+
+class LocalTLSServer:
+    """
+    Serveur TLS local (auto-signé) qui simule la latence d'un serveur distant
+    en attendant `latency` secondes avant chaque handshake
+    """
+
+    def __init__(self, latency: float = 0.5):
+        self.latency = latency
+        self.port = None
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._context = self._build_context()
+        self._sock = None
+        self._stop = threading.Event()
+
+    def _build_context(self) -> ssl.SSLContext:
+        """Génère un certificat auto-signé et le contexte SSL serveur"""
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'benchmark.certitrack.local')])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=90))
+            .add_extension(
+                x509.SubjectAlternativeName([x509.DNSName('benchmark.certitrack.local')]),
+                critical=False,
+            )
+            .sign(key, hashes.SHA256())
+        )
+
+        cert_path = os.path.join(self._tmpdir.name, 'cert.pem')
+        key_path = os.path.join(self._tmpdir.name, 'key.pem')
+        with open(cert_path, 'wb') as f:
+            f.write(cert.public_bytes(serialization.Encoding.PEM))
+        with open(key_path, 'wb') as f:
+            f.write(key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.TraditionalOpenSSL,
+                serialization.NoEncryption(),
+            ))
+
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+        return context
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(256)
+        self._sock.settimeout(0.2)
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self._sock.close()
+        self._tmpdir.cleanup()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except (socket.timeout, OSError):
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        try:
+            time.sleep(self.latency)
+            with self._context.wrap_socket(conn, server_side=True) as tls_conn:
+                tls_conn.recv(1)
+        except (ssl.SSLError, OSError):
+            pass
+        finally:
+            conn.close()
+
+
+class Command(BaseCommand):
+    help = 'Compare le scan séquentiel et le scan parallèle contre un serveur TLS local'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hosts',
+            type=int,
+            default=20,
+            help='Nombre de scans à effectuer (défaut: 20)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=CertificateScanner.DEFAULT_MAX_WORKERS,
+            help=f'Nombre de threads pour le scan parallèle (défaut: {CertificateScanner.DEFAULT_MAX_WORKERS})',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.5,
+            help='Latence simulée par handshake en secondes (défaut: 0.5)',
+        )
+
+    def handle(self, *args, **options):
+        hosts = options['hosts']
+        workers = options['workers']
+
+        server = LocalTLSServer(latency=options['latency'])
+        server.start()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'🔄 Serveur TLS local sur 127.0.0.1:{server.port} '
+            f'(latence {options["latency"]}s, {hosts} scans)'
+        ))
+
+        try:
+            hostnames = ['127.0.0.1'] * hosts
+            timings = {}
+
+            for label, max_workers in [('séquentiel', 1), ('parallèle', workers)]:
+                scanner = CertificateScanner(timeout=5, verify_ssl=False, max_workers=max_workers)
+                start = time.perf_counter()
+                results = scanner.scan_multiple_hosts(hostnames, server.port)
+                elapsed = time.perf_counter() - start
+                timings[label] = elapsed
+
+                failures = [r for r in results if not r.get('success')]
+                self.stdout.write(
+                    f'  • {label} ({max_workers} worker(s)): {elapsed:.2f}s, '
+                    f'{len(results) - len(failures)}/{len(results)} succès'
+                )
+                if failures:
+                    self.stdout.write(self.style.ERROR(f'    ✗ {failures[0]["error"]}'))
+        finally:
+            server.stop()
+
+        speedup = timings['séquentiel'] / timings['parallèle'] if timings['parallèle'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ Accélération: x{speedup:.1f} (attendu ≈ x{min(workers, hosts)})'
+        ))
@@ -0,0 +1,82 @@
+"""
+Commande pour exporter l'inventaire des certificats en CSV ou JSON (en flux)
+Usage: python manage.py export_certificates [-o fichier.csv] [--format json] [--status expired] [--search eid.local]
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from certificates.exporter import EXPORT_FORMATS, get_export_rows, iter_export
+from certificates.models import Certificate
+
+
+class Command(BaseCommand):
+    help = 'Exporte les certificats (mêmes filtres que la liste) dans un fichier CSV réimportable ou JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-o', '--output',
+            help='Fichier de sortie (défaut: sortie standard)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=EXPORT_FORMATS,
+            default='csv',
+            help='Format de sortie (défaut: csv)',
+        )
+        parser.add_argument(
+            '--delimiter',
+            default='\t',
+            help='Séparateur de colonnes du CSV (défaut: tabulation, comme l\'import)',
+        )
+        parser.add_argument(
+            '--include-archived',
+            action='store_true',
+            help='Exporter aussi les certificats archivés',
+        )
+        parser.add_argument(
+            '--status',
+            choices=[choice for choice, _ in Certificate.STATUS_CHOICES],
+            help='Filtrer par statut',
+        )
+        parser.add_argument(
+            '--environment',
+            choices=[choice for choice, _ in Certificate.ENVIRONMENT_CHOICES],
+            help='Filtrer par environnement',
+        )
+        parser.add_argument('--issuer', help='Filtrer par émetteur (contient)')
+        parser.add_argument(
+            '--days',
+            help='Filtrer par jours restants (expired, critical, warning, safe ou nombre)',
+        )
+        parser.add_argument(
+            '--expiration-period',
+            choices=['today', 'week', 'month', 'quarter'],
+            help='Filtrer par période d\'expiration',
+        )
+        parser.add_argument('--search', help='Recherche générale (nom, émetteur, modèle)')
+
+    def handle(self, *args, **options):
+        filters = {
+            key: options[key]
+            for key in ['status', 'environment', 'issuer', 'days', 'expiration_period', 'search']
+            if options[key]
+        }
+        rows = get_export_rows(filters, include_archived=options['include_archived'])
+        chunks = iter_export(options['format'], rows, delimiter=options['delimiter'])
+
+        if not options['output']:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+            return
+
+        try:
+            output = open(options['output'], 'w', encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(f'Impossible d\'écrire le fichier: {e}')
+
+        with output:
+            for chunk in chunks:
+                output.write(chunk)
+
+        self.stderr.write(self.style.SUCCESS(f'✅ Export écrit dans {options["output"]}'))
@@ -0,0 +1,104 @@
+"""
+Commande pour importer un fichier CSV volumineux sans passer par l'interface web
+(analyse vers la table de staging puis application ensembliste, comme l'import web)
+Usage: python manage.py import_csv fichier.csv [--delimiter ";"] [--environment prod] [--dry-run]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from certificates.csv_analyzer import CSVAnalyzer
+from certificates.forms import CSVImportForm
+from certificates.models import Certificate, ImportBatch
+
+
+class Command(BaseCommand):
+    help = 'Importe un fichier CSV de certificats en mode groupé (staging + bulk_create)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Chemin du fichier CSV')
+        parser.add_argument(
+            '--delimiter',
+            default='\t',
+            help='Séparateur de colonnes (défaut: tabulation)',
+        )
+        parser.add_argument(
+            '--no-header',
+            action='store_true',
+            help='Le fichier ne contient pas de ligne d\'en-tête',
+        )
+        parser.add_argument(
+            '--environment',
+            choices=[choice for choice, _ in Certificate.ENVIRONMENT_CHOICES],
+            help='Environnement par défaut des certificats importés',
+        )
+        parser.add_argument(
+            '--auto-enrich',
+            action='store_true',
+            help='Marquer les certificats créés pour enrichissement',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Taille des lots d\'insertion dans la table de staging (défaut: 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Analyse le fichier sans rien enregistrer',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            csv_file = open(options['csv_file'], 'rb')
+        except OSError as e:
+            raise CommandError(f'Impossible d\'ouvrir le fichier: {e}')
+
+        # Réutiliser le parsing en flux du formulaire (sans la limite de taille de l'upload web)
+        form = CSVImportForm.for_file(
+            csv_file,
+            skip_header=not options['no_header'],
+            delimiter=options['delimiter'],
+            default_environment=options['environment'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'🔄 Import de {options["csv_file"]}...'))
+        start = time.monotonic()
+
+        with csv_file:
+            if options['dry_run']:
+                analyzer = CSVAnalyzer()
+                summary = analyzer.empty_summary()
+                for _ in analyzer.iter_analysis(form.iter_csv_rows(), summary):
+                    pass
+                counts = None
+            else:
+                batch = ImportBatch.import_rows(
+                    form.iter_csv_rows(),
+                    auto_enrich=options['auto_enrich'],
+                    chunk_size=options['batch_size'],
+                )
+                summary = batch.summary
+                counts = batch.result
+
+        elapsed = time.monotonic() - start
+
+        self.stdout.write(
+            f'  - {summary["total"]} ligne(s): {summary["new_count"]} nouveau(x), '
+            f'{summary["update_count"]} mise(s) à jour, {summary["duplicate_count"]} doublon(s), '
+            f'{summary["conflict_count"]} conflit(s), {summary["error_count"]} erreur(s)'
+        )
+
+        if counts is None:
+            self.stdout.write(self.style.WARNING(
+                f'\n⚠️  Mode dry-run: aucune modification enregistrée ({elapsed:.1f}s)'
+            ))
+            return
+
+        rate = summary['total'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ {counts["created"] + counts["updated"]} certificat(s) créé(s), '
+            f'{counts["archived"]} archivé(s), {counts["ignored"]} ignoré(s) '
+            f'en {elapsed:.1f}s ({rate:.0f} lignes/s)'
+        ))
@@ -0,0 +1,58 @@
+"""
+Commande pour trouver les certificats couvrant un nom d'hôte (CN + SAN, wildcards)
+Usage: python manage.py lookup_hostname api.eid.local [--suffix] [--include-archived] [--rebuild-index]
+"""
+from django.core.management.base import BaseCommand
+
+from certificates.models import Certificate
+from certificates.san import find_covering_certificates, find_names_under, sync_certificate_names
+
+
+class Command(BaseCommand):
+    help = 'Recherche les certificats couvrant un ou plusieurs noms d\'hôte via l\'index des SAN'
+
+    def add_arguments(self, parser):
+        parser.add_argument('hostnames', nargs='*', help='Noms d\'hôte à rechercher')
+        parser.add_argument(
+            '--suffix',
+            action='store_true',
+            help='Lister tous les noms indexés sous ces domaines',
+        )
+        parser.add_argument(
+            '--include-archived',
+            action='store_true',
+            help='Inclure les certificats archivés',
+        )
+        parser.add_argument(
+            '--rebuild-index',
+            action='store_true',
+            help='Reconstruire l\'index des noms de tous les certificats avant la recherche',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_index']:
+            self.stdout.write('🔄 Reconstruction de l\'index des noms...')
+            indexed = sync_certificate_names(Certificate.objects.values_list('id', flat=True))
+            self.stdout.write(self.style.SUCCESS(f'✅ {indexed} nom(s) indexé(s)'))
+
+        finder = find_names_under if options['suffix'] else find_covering_certificates
+
+        for hostname in options['hostnames']:
+            entries = finder(hostname, include_archived=options['include_archived'])
+            if entries is None:
+                self.stdout.write(self.style.ERROR(f'\n❌ Nom d\'hôte invalide: {hostname}'))
+                continue
+
+            entries = list(entries.defer('certificate__pem_data'))
+            if not entries:
+                self.stdout.write(self.style.WARNING(f'\n⚠️  {hostname}: aucun certificat'))
+                continue
+
+            self.stdout.write(self.style.SUCCESS(f'\n🔍 {hostname}: {len(entries)} correspondance(s)'))
+            for entry in entries:
+                cert = entry.certificate
+                archived = ' [archivé]' if cert.archived else ''
+                self.stdout.write(
+                    f'  - {entry.name} -> {cert.common_name} (#{cert.pk}) '
+                    f'expire le {cert.valid_until} ({cert.days_remaining} j, {cert.status}){archived}'
+                )
@@ -0,0 +1,116 @@
+"""
+Commande pour scanner tout l'inventaire de certificats avec le scanner asyncio
+Usage: python manage.py scan_inventory [--concurrency 500] [--timeout 5] [--hosts-file hosts.txt]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from certificates.models import Certificate
+from certificates.utils import CertificateScanner
+
+
+class Command(BaseCommand):
+    help = 'Scanne les serveurs de l\'inventaire en parallèle (asyncio) et affiche le débit de handshakes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=CertificateScanner.DEFAULT_MAX_IN_FLIGHT,
+            help=f'Nombre maximal de handshakes en vol (défaut: {CertificateScanner.DEFAULT_MAX_IN_FLIGHT})',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=5,
+            help='Échéance par serveur en secondes (défaut: 5)',
+        )
+        parser.add_argument(
+            '--hosts-file',
+            help='Fichier de serveurs (un par ligne, host ou host:port) au lieu de l\'inventaire',
+        )
+        parser.add_argument(
+            '--needs-enrichment',
+            action='store_true',
+            help='Ne scanner que les certificats marqués pour enrichissement',
+        )
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Affiche le détail des erreurs',
+        )
+
+    def handle(self, *args, **options):
+        targets = self.get_targets(options)
+
+        if not targets:
+            self.stdout.write(self.style.WARNING('⚠️  Aucun serveur à scanner'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'🔍 Scan de {len(targets)} serveur(s), {options["concurrency"]} handshake(s) en vol max...'
+        ))
+
+        scanner = CertificateScanner(timeout=options['timeout'], verify_ssl=False)
+        start = time.monotonic()
+        last_report = start
+
+        def report_progress(done, total):
+            nonlocal last_report
+            now = time.monotonic()
+            if now - last_report < 1 and done < total:
+                return
+            last_report = now
+            elapsed = now - start
+            rate = done / elapsed if elapsed else 0
+            self.stdout.write(
+                f'  ↳ {done}/{total} ({done * 100 // total}%) - {rate:.1f} handshakes/s'
+            )
+
+        results = scanner.scan_targets_async(
+            targets,
+            max_in_flight=options['concurrency'],
+            progress_callback=report_progress
+        )
+        elapsed = time.monotonic() - start
+
+        failures = [r for r in results if not r.get('success')]
+
+        if options['verbose']:
+            for result in failures:
+                self.stdout.write(self.style.ERROR(f'  ✗ {result["hostname"]}: {result["error"]}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ {len(results) - len(failures)} succès, {len(failures)} erreur(s) '
+            f'en {elapsed:.1f}s ({len(results) / elapsed if elapsed else 0:.1f} handshakes/s)'
+        ))
+        self.stdout.write(
+            f'   Temps cumulé: réseau {scanner.timings["network"]:.1f}s, '
+            f'parsing {scanner.timings["parse"]:.1f}s'
+        )
+
+    def get_targets(self, options):
+        """Construit la liste des (hostname, port) à scanner"""
+        if options['hosts_file']:
+            targets = []
+            try:
+                with open(options['hosts_file'], encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line or line.startswith('#'):
+                            continue
+                        hostname, _, port = line.partition(':')
+                        targets.append((hostname, int(port) if port else 443))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Fichier de serveurs invalide: {e}')
+            return targets
+
+        certificates = Certificate.objects.filter(archived=False)
+        if options['needs_enrichment']:
+            certificates = certificates.filter(needs_enrichment=True)
+
+        return [
+            (common_name, scan_port or 443)
+            for common_name, scan_port in certificates.values_list('common_name', 'scan_port')
+        ]
@@ -2,8 +2,10 @@
 Commande pour mettre à jour le champ days_remaining de tous les certificats
 Usage: python manage.py update_days_remaining
 """
+import time
+
 from django.core.management.base import BaseCommand
-from django.utils import timezone
+from django.db.models import Count
 from certificates.models import Certificate
 
 
@@ -14,7 +16,7 @@ class Command(BaseCommand):
         parser.add_argument(
             '--verbose',
             action='store_true',
-            help='Affiche les détails pour chaque certificat',
+            help='Affiche la répartition des certificats par statut après mise à jour',
         )
     
     def handle(self, *args, **options):
@@ -22,30 +24,18 @@ class Command(BaseCommand):
         
         self.stdout.write(self.style.SUCCESS('🔄 Mise à jour des jours restants...'))
         
-        certificates = Certificate.objects.all()
-        total = certificates.count()
-        updated = 0
+        # Une seule requête UPDATE ensembliste (certificats révoqués exclus)
+        start = time.monotonic()
+        updated = Certificate.refresh_days_remaining()
+        elapsed_ms = (time.monotonic() - start) * 1000
         
-        for cert in certificates:
-            old_days = cert.days_remaining
-            
-            # Le save() va calculer automatiquement days_remaining
-            cert.save()
-            
-            if verbose:
-                new_days = cert.days_remaining
-                if old_days != new_days:
-                    self.stdout.write(
-                        f'  ✓ {cert.common_name}: {old_days} → {new_days} jours'
-                    )
-                else:
-                    self.stdout.write(
-                        f'  - {cert.common_name}: {new_days} jours (inchangé)'
-                    )
-            
-            updated += 1
+        if verbose:
+            by_status = Certificate.objects.values('status').annotate(
+                count=Count('id')
+            ).order_by('status')
+            for row in by_status:
+                self.stdout.write(f'  - {row["status"]}: {row["count"]} certificat(s)')
         
         self.stdout.write(self.style.SUCCESS(
-            f'\n✅ {updated}/{total} certificat(s) mis à jour avec succès'
+            f'\n✅ {updated} certificat(s) modifié(s) en {elapsed_ms:.0f} ms'
         ))
-
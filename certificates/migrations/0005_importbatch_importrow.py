@@ -0,0 +1,161 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("certificates", "0004_certificate_archived_certificate_archived_at_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportBatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente de confirmation"),
+                            ("applied", "Appliqué"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "auto_enrich",
+                    models.BooleanField(
+                        default=False, verbose_name="Enrichissement automatique"
+                    ),
+                ),
+                (
+                    "summary",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Résumé de l'analyse"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Créé le"),
+                ),
+                (
+                    "applied_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Appliqué le"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="import_batches",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Créé par",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Lot d'import",
+                "verbose_name_plural": "Lots d'import",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ImportRow",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("line_number", models.IntegerField(verbose_name="Ligne")),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("new", "Nouveau"),
+                            ("update", "Mise à jour"),
+                            ("duplicate", "Doublon"),
+                            ("conflict", "Conflit"),
+                            ("error", "Erreur"),
+                        ],
+                        max_length=10,
+                        verbose_name="Action",
+                    ),
+                ),
+                ("common_name", models.CharField(blank=True, max_length=255)),
+                ("issuer", models.CharField(blank=True, max_length=255)),
+                ("valid_until", models.DateField(blank=True, null=True)),
+                ("key_usage", models.CharField(blank=True, max_length=255, null=True)),
+                (
+                    "friendly_name",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                (
+                    "template_name",
+                    models.CharField(blank=True, max_length=100, null=True),
+                ),
+                ("environment", models.CharField(blank=True, max_length=50, null=True)),
+                ("existing_valid_until", models.DateField(blank=True, null=True)),
+                ("existing_created_at", models.DateTimeField(blank=True, null=True)),
+                ("reason", models.TextField(blank=True)),
+                ("recommendation", models.CharField(blank=True, max_length=255)),
+                (
+                    "batch",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rows",
+                        to="certificates.importbatch",
+                        verbose_name="Lot d'import",
+                    ),
+                ),
+                (
+                    "existing_certificate",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="certificates.certificate",
+                        verbose_name="Certificat existant",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ligne d'import",
+                "verbose_name_plural": "Lignes d'import",
+                "ordering": ["batch", "line_number"],
+                "indexes": [
+                    models.Index(
+                        fields=["batch", "action"],
+                        name="certificate_batch_i_55de56_idx",
+                    ),
+                    models.Index(
+                        fields=["batch", "line_number"],
+                        name="certificate_batch_i_240597_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("certificates", "0005_importbatch_importrow"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importbatch",
+            name="csv_file",
+            field=models.FileField(
+                blank=True, null=True, upload_to="imports/", verbose_name="Fichier CSV"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="error",
+            field=models.TextField(blank=True, verbose_name="Erreur"),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="is_async",
+            field=models.BooleanField(
+                default=False, verbose_name="Traitement en arrière-plan"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="options",
+            field=models.JSONField(
+                blank=True, default=dict, verbose_name="Options de lecture du CSV"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="processed_rows",
+            field=models.IntegerField(default=0, verbose_name="Lignes analysées"),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="result",
+            field=models.JSONField(
+                blank=True, default=dict, verbose_name="Résultat de l'import"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="started_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Démarré le"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importbatch",
+            name="total_rows",
+            field=models.IntegerField(default=0, verbose_name="Lignes estimées"),
+        ),
+        migrations.AlterField(
+            model_name="importbatch",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("queued", "En file d'attente"),
+                    ("analyzing", "Analyse en cours"),
+                    ("pending", "En attente de confirmation"),
+                    ("applying", "Application en cours"),
+                    ("applied", "Appliqué"),
+                    ("failed", "Échec"),
+                ],
+                default="pending",
+                max_length=10,
+                verbose_name="Statut",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("certificates", "0006_importbatch_async"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="certificate",
+            index=models.Index(
+                fields=["valid_until", "common_name", "id"],
+                name="certificate_keyset_idx",
+            ),
+        ),
+    ]
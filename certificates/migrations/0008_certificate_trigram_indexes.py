@@ -0,0 +1,38 @@
+# Index trigrammes (pg_trgm) pour la recherche de la liste des certificats
+
+from django.db import migrations
+
+SEARCH_FIELDS = ['common_name', 'issuer', 'template_name']
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Uniquement sur PostgreSQL: SQLite conserve la recherche LIKE
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in SEARCH_FIELDS:
+        # Même expression que le lookup icontains de Django: UPPER(col::text)
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS certificate_{field}_trgm_idx '
+            f'ON certificates_certificate USING gin (UPPER({field}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS certificate_{field}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ("certificates", "0007_certificate_keyset_index"),
+    ]
+    
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
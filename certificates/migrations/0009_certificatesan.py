@@ -0,0 +1,125 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Copie figée des règles de certificates.san au moment de la migration
+SYNC_BATCH_SIZE = 1000
+
+
+def normalize_hostname(name):
+    """Nom DNS en minuscules sans point final (None si ce n'est pas un nom d'hôte)"""
+    if not name:
+        return None
+    
+    name = str(name).strip().lower().rstrip(".")
+    if not name or any(char in name for char in "@/: "):
+        return None
+    return name
+
+
+def split_name(name):
+    """(is_wildcard, reversed_name) - le label '*' d'un wildcard est retiré"""
+    is_wildcard = name.startswith("*.")
+    if is_wildcard:
+        name = name[2:]
+    return is_wildcard, ".".join(reversed(name.split(".")))
+
+
+def iter_certificate_names(common_name, san_list):
+    """Noms distincts couverts par un certificat: (nom, source 'cn'|'san')"""
+    seen = set()
+    for source, names in (("cn", [common_name]), ("san", san_list or [])):
+        for raw_name in names:
+            name = normalize_hostname(raw_name)
+            if name and name not in seen:
+                seen.add(name)
+                yield name, source
+
+
+def index_existing_certificates(apps, schema_editor):
+    """Indexe le CN et les SAN des certificats existants"""
+    Certificate = apps.get_model("certificates", "Certificate")
+    CertificateSAN = apps.get_model("certificates", "CertificateSAN")
+    
+    entries = []
+    rows = Certificate.objects.values_list("id", "common_name", "san_list")
+    for certificate_id, common_name, san_list in rows.iterator(chunk_size=SYNC_BATCH_SIZE):
+        for name, source in iter_certificate_names(common_name, san_list):
+            is_wildcard, reversed_name = split_name(name)
+            entries.append(CertificateSAN(
+                certificate_id=certificate_id,
+                name=name[:255],
+                reversed_name=reversed_name[:255],
+                is_wildcard=is_wildcard,
+                source=source,
+            ))
+        if len(entries) >= SYNC_BATCH_SIZE:
+            CertificateSAN.objects.bulk_create(entries)
+            entries = []
+    
+    if entries:
+        CertificateSAN.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ("certificates", "0008_certificate_trigram_indexes"),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name="CertificateSAN",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, verbose_name="Nom")),
+                (
+                    "reversed_name",
+                    models.CharField(
+                        db_index=True, max_length=255, verbose_name="Nom inversé"
+                    ),
+                ),
+                (
+                    "is_wildcard",
+                    models.BooleanField(default=False, verbose_name="Wildcard"),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("cn", "Common Name"),
+                            ("san", "Subject Alternative Name"),
+                        ],
+                        default="san",
+                        max_length=3,
+                        verbose_name="Source",
+                    ),
+                ),
+                (
+                    "certificate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="san_entries",
+                        to="certificates.certificate",
+                        verbose_name="Certificat",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Nom couvert",
+                "verbose_name_plural": "Noms couverts",
+                "unique_together": {("certificate", "name")},
+            },
+        ),
+        migrations.RunPython(index_existing_certificates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("certificates", "0009_certificatesan"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="certificate",
+            name="import_method",
+            field=models.CharField(
+                choices=[
+                    ("manual", "Saisie Manuelle"),
+                    ("csv", "Import CSV"),
+                    ("scan", "Scan Domaine"),
+                    ("api", "Import API"),
+                ],
+                max_length=10,
+                verbose_name="Méthode d'import",
+            ),
+        ),
+    ]
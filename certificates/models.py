@@ -1,9 +1,40 @@
 from django.db import models
+from django.db.models import Case, F, Value, When
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 
 
+class DaysUntil(models.Func):
+    """
+    Nombre de jours entre une date de référence et un champ date (SQL)
+    Équivalent de (champ - date_reference).days, pour PostgreSQL et SQLite
+    """
+    output_field = models.IntegerField()
+    
+    def __init__(self, expression, reference_date, **extra):
+        super().__init__(expression, Value(reference_date, output_field=models.DateField()), **extra)
+    
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='(%(expressions)s)', arg_joiner=' - ',
+            **extra_context
+        )
+    
+    def as_postgresql(self, compiler, connection, **extra_context):
+        # date - date donne directement un entier en PostgreSQL
+        return self.as_sql(compiler, connection, **extra_context)
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+
 class Certificate(models.Model):
     """
     Modèle pour gérer les certificats SSL/TLS
@@ -14,6 +45,7 @@ class Certificate(models.Model):
         ('manual', 'Saisie Manuelle'),
         ('csv', 'Import CSV'),
         ('scan', 'Scan Domaine'),
+        ('api', 'Import API'),
     ]
     
     STATUS_CHOICES = [
@@ -254,6 +286,8 @@ class Certificate(models.Model):
             models.Index(fields=['issuer']),
             models.Index(fields=['status']),
             models.Index(fields=['environment']),
+            # Pagination par curseur de la liste (certificates.pagination)
+            models.Index(fields=['valid_until', 'common_name', 'id'], name='certificate_keyset_idx'),
         ]
     
     def __str__(self):
@@ -290,6 +324,51 @@ class Certificate(models.Model):
         else:
             return 'success'
     
+    @classmethod
+    def refresh_days_remaining(cls, queryset=None, today=None):
+        """
+        Recalcule days_remaining et status en une seule requête UPDATE
+        
+        Même logique que save(), mais ensembliste et sans toucher updated_at.
+        Les certificats révoqués ne sont pas touchés. Seules les lignes dont
+        la valeur change sont mises à jour.
+        
+        Returns:
+            Nombre de lignes modifiées
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        if today is None:
+            today = timezone.now().date()
+        
+        days = DaysUntil('valid_until', today)
+        new_status = Case(
+            When(new_days__lt=0, then=Value('expired')),
+            When(new_days__gt=0, new_days__lte=30, then=Value('expiring_soon')),
+            default=Value('active'),
+            output_field=models.CharField(),
+        )
+        
+        from .stats import invalidate_certificate_stats, mark_days_refreshed
+        
+        updated = queryset.exclude(valid_until__isnull=True).exclude(
+            status='revoked'
+        ).alias(
+            new_days=days
+        ).alias(
+            new_status=new_status
+        ).exclude(
+            days_remaining=F('new_days'), status=F('new_status')
+        ).update(
+            days_remaining=days,
+            status=new_status
+        )
+        
+        if updated:
+            mark_days_refreshed()
+            invalidate_certificate_stats()
+        return updated
+    
     def update_status(self):
         """Met à jour le statut basé sur la date d'expiration"""
         if not self.valid_until:
@@ -302,21 +381,516 @@ class Certificate(models.Model):
             self.status = 'active'
         self.save()
     
+    @staticmethod
+    def compute_expiration(valid_until, status='unknown', today=None):
+        """
+        Calcule (days_remaining, status) comme le fait save()
+        
+        Utilisé par save() et par ImportRow.to_certificate() (bulk_create,
+        qui contourne save()).
+        """
+        if not valid_until:
+            return None, status
+        
+        if today is None:
+            today = timezone.now().date()
+        if hasattr(valid_until, 'date'):
+            valid_until = valid_until.date()
+        days = (valid_until - today).days
+        
+        if days < 0:
+            status = 'expired'
+        elif 0 < days <= 30:
+            status = 'expiring_soon'
+        elif status not in ['revoked']:
+            status = 'active'
+        
+        return days, status
+    
     def save(self, *args, **kwargs):
         """Override save pour mettre à jour automatiquement le statut et les jours restants"""
-        if self.valid_until:
-            # Calculer et stocker les jours restants
-            delta = self.valid_until - timezone.now().date()
-            self.days_remaining = delta.days
-            
-            # Auto-update status
-            if self.is_expired:
-                self.status = 'expired'
-            elif self.is_expiring_soon:
-                self.status = 'expiring_soon'
-            elif self.status not in ['revoked']:
-                self.status = 'active'
-        else:
-            self.days_remaining = None
+        self.days_remaining, self.status = self.compute_expiration(self.valid_until, self.status)
         
         super().save(*args, **kwargs)
+
+
+class CertificateSAN(models.Model):
+    """
+    Nom couvert par un certificat (CN ou SAN), indexé par labels inversés
+    Tenu à jour par le signal post_save de Certificate et par les écritures
+    groupées (voir certificates.san).
+    """
+    
+    SOURCE_CHOICES = [
+        ('cn', 'Common Name'),
+        ('san', 'Subject Alternative Name'),
+    ]
+    
+    certificate = models.ForeignKey(
+        Certificate,
+        on_delete=models.CASCADE,
+        related_name='san_entries',
+        verbose_name="Certificat"
+    )
+    
+    name = models.CharField(
+        max_length=255,
+        verbose_name="Nom"
+    )
+    
+    # api.eid.local -> local.eid.api ; *.eid.local -> local.eid (is_wildcard)
+    reversed_name = models.CharField(
+        max_length=255,
+        db_index=True,
+        verbose_name="Nom inversé"
+    )
+    
+    is_wildcard = models.BooleanField(
+        default=False,
+        verbose_name="Wildcard"
+    )
+    
+    source = models.CharField(
+        max_length=3,
+        choices=SOURCE_CHOICES,
+        default='san',
+        verbose_name="Source"
+    )
+    
+    class Meta:
+        verbose_name = "Nom couvert"
+        verbose_name_plural = "Noms couverts"
+        unique_together = [('certificate', 'name')]
+    
+    def __str__(self):
+        return f"{self.name} → {self.certificate_id}"
+
+
+class ImportBatch(models.Model):
+    """
+    Lot d'import CSV en attente de confirmation
+    L'analyse de chaque ligne est stockée dans ImportRow (table de staging)
+    au lieu de la session utilisateur.
+    
+    Les gros fichiers sont analysés puis appliqués en arrière-plan (Celery):
+    le fichier est alors conservé dans csv_file le temps de l'analyse.
+    """
+    
+    STATUS_CHOICES = [
+        ('queued', 'En file d\'attente'),
+        ('analyzing', 'Analyse en cours'),
+        ('pending', 'En attente de confirmation'),
+        ('applying', 'Application en cours'),
+        ('applied', 'Appliqué'),
+        ('failed', 'Échec'),
+    ]
+    
+    # Statuts pendant lesquels une tâche Celery travaille sur le lot
+    RUNNING_STATUSES = ['queued', 'analyzing', 'applying']
+    
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name="Statut"
+    )
+    
+    auto_enrich = models.BooleanField(
+        default=False,
+        verbose_name="Enrichissement automatique"
+    )
+    
+    summary = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Résumé de l'analyse"
+    )
+    
+    # === Traitement en arrière-plan ===
+    is_async = models.BooleanField(
+        default=False,
+        verbose_name="Traitement en arrière-plan"
+    )
+    
+    csv_file = models.FileField(
+        upload_to='imports/',
+        null=True,
+        blank=True,
+        verbose_name="Fichier CSV"
+    )
+    
+    options = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Options de lecture du CSV"
+    )
+    
+    total_rows = models.IntegerField(
+        default=0,
+        verbose_name="Lignes estimées"
+    )
+    
+    processed_rows = models.IntegerField(
+        default=0,
+        verbose_name="Lignes analysées"
+    )
+    
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Démarré le"
+    )
+    
+    result = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Résultat de l'import"
+    )
+    
+    error = models.TextField(
+        blank=True,
+        verbose_name="Erreur"
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Créé le"
+    )
+    
+    applied_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Appliqué le"
+    )
+    
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='import_batches',
+        verbose_name="Créé par"
+    )
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Lot d'import"
+        verbose_name_plural = "Lots d'import"
+    
+    def __str__(self):
+        return f"Import #{self.pk} ({self.get_status_display()})"
+    
+    @property
+    def is_running(self):
+        return self.status in self.RUNNING_STATUSES
+    
+    def stage(self, csv_rows, chunk_size=1000):
+        """
+        Analyse les lignes du CSV en flux et les insère dans la table de staging
+        
+        processed_rows est mis à jour après chaque lot pour le suivi de progression.
+        """
+        from .csv_analyzer import CSVAnalyzer
+        
+        analyzer = CSVAnalyzer()
+        summary = analyzer.empty_summary()
+        
+        pending_rows = []
+        for result in analyzer.iter_analysis(csv_rows, summary, chunk_size):
+            pending_rows.append(ImportRow.from_analysis(self, result))
+            if len(pending_rows) >= chunk_size:
+                ImportRow.objects.bulk_create(pending_rows)
+                pending_rows = []
+                ImportBatch.objects.filter(pk=self.pk).update(processed_rows=summary['total'])
+        if pending_rows:
+            ImportRow.objects.bulk_create(pending_rows)
+        
+        self.summary = summary
+        self.processed_rows = summary['total']
+        self.save(update_fields=['summary', 'processed_rows'])
+        return summary
+    
+    def progress(self):
+        """
+        État d'avancement du lot (endpoint JSON de suivi)
+        
+        Le débit et le temps restant sont estimés à partir des lignes déjà
+        analysées depuis started_at; total_rows est une estimation (nombre de
+        lignes du fichier).
+        """
+        rows_per_second = None
+        eta_seconds = None
+        
+        if self.status == 'analyzing' and self.started_at and self.processed_rows:
+            elapsed = (timezone.now() - self.started_at).total_seconds()
+            if elapsed > 0:
+                rows_per_second = self.processed_rows / elapsed
+                remaining = max(self.total_rows - self.processed_rows, 0)
+                eta_seconds = round(remaining / rows_per_second)
+                rows_per_second = round(rows_per_second, 1)
+        
+        percent = None
+        if self.status in ['pending', 'applying', 'applied']:
+            percent = 100
+        elif self.total_rows:
+            percent = min(100, self.processed_rows * 100 // self.total_rows)
+        
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'status_display': self.get_status_display(),
+            'running': self.is_running,
+            'processed_rows': self.processed_rows,
+            'total_rows': self.total_rows,
+            'percent': percent,
+            'rows_per_second': rows_per_second,
+            'eta_seconds': eta_seconds,
+            'error': self.error,
+        }
+    
+    def claim_for_apply(self) -> bool:
+        """
+        Réserve le lot pour l'application: 'pending' -> 'applying' en un UPDATE conditionnel
+        
+        Returns:
+            False si le lot n'est plus en attente (déjà confirmé, par exemple
+            par un double envoi du formulaire)
+        """
+        claimed = ImportBatch.objects.filter(pk=self.pk, status='pending').update(status='applying')
+        if claimed:
+            self.status = 'applying'
+        return bool(claimed)
+    
+    @classmethod
+    def import_rows(cls, csv_rows, created_by=None, auto_enrich=False, chunk_size=1000):
+        """
+        Import sans confirmation (commande import_csv): analyse vers la table de
+        staging puis application immédiate, par le même chemin que l'import
+        interactif
+        
+        Returns:
+            Lot appliqué (compteurs dans result, analyse dans summary)
+        """
+        batch = cls.objects.create(created_by=created_by, auto_enrich=auto_enrich)
+        batch.stage(csv_rows, chunk_size=chunk_size)
+        batch.claim_for_apply()
+        batch.apply(chunk_size=chunk_size)
+        return batch
+    
+    def apply(self, import_method='csv', chunk_size=1000):
+        """
+        Applique le lot par identifiant de lot, en requêtes groupées
+        
+        - Archive en un seul UPDATE les certificats remplacés (action 'update')
+        - Crée par bulk_create, lot par lot, les certificats des lignes 'new'
+          et 'update' (days_remaining et status calculés comme dans save())
+        
+        En cas d'erreur, le lot passe en 'failed' et l'exception est propagée.
+        
+        Args:
+            import_method: Méthode d'import des certificats créés ('csv', 'api')
+            chunk_size: Nombre de lignes de staging lues et insérées par requête
+        
+        Returns:
+            Dict avec les compteurs created/updated/archived/ignored/errors
+        """
+        try:
+            return self._apply(import_method, chunk_size)
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+            self.save(update_fields=['status', 'error'])
+            raise
+    
+    def _apply(self, import_method, chunk_size):
+        from django.db import transaction
+        from .stats import invalidate_certificate_stats
+        
+        now = timezone.now()
+        today = now.date()
+        rows = self.rows.all()
+        to_create = rows.filter(
+            action__in=[ImportRow.ACTION_NEW, ImportRow.ACTION_UPDATE],
+            valid_until__isnull=False
+        ).order_by('line_number')
+        
+        counts = {
+            'created': 0,
+            'updated': 0,
+            'ignored': rows.filter(action__in=[ImportRow.ACTION_DUPLICATE, ImportRow.ACTION_CONFLICT]).count(),
+            'errors': rows.filter(action=ImportRow.ACTION_ERROR).count(),
+        }
+        
+        with transaction.atomic():
+            # Archiver les anciennes versions
+            counts['archived'] = Certificate.objects.filter(
+                id__in=rows.filter(
+                    action=ImportRow.ACTION_UPDATE,
+                    existing_certificate__isnull=False
+                ).values('existing_certificate_id'),
+                archived=False
+            ).update(
+                archived=True,
+                archived_at=now,
+                archived_reason=f"Remplacé par certificat plus récent (import {import_method.upper()} #{self.pk})"
+            )
+            
+            # Créer les nouveaux certificats depuis la table de staging, lot par lot
+            pending = []
+            for row in to_create.iterator(chunk_size=chunk_size):
+                pending.append(row.to_certificate(
+                    import_method=import_method,
+                    created_by_id=self.created_by_id,
+                    needs_enrichment=self.auto_enrich,
+                    today=today,
+                ))
+                counts['created' if row.action == ImportRow.ACTION_NEW else 'updated'] += 1
+                if len(pending) >= chunk_size:
+                    self._create_certificates(pending)
+                    pending = []
+            if pending:
+                self._create_certificates(pending)
+            
+            # La table de staging n'est plus utile une fois le lot appliqué
+            rows.delete()
+            self.status = 'applied'
+            self.applied_at = now
+            self.result = counts
+            self.save(update_fields=['status', 'applied_at', 'result'])
+        
+        invalidate_certificate_stats()
+        
+        return counts
+    
+    @staticmethod
+    def _create_certificates(certificates):
+        """Insère un lot de certificats et indexe leurs noms couverts (CN)"""
+        from .san import sync_certificate_names
+        
+        created = Certificate.objects.bulk_create(certificates)
+        sync_certificate_names([certificate.pk for certificate in created])
+
+
+class ImportRow(models.Model):
+    """
+    Ligne analysée d'un import CSV (table de staging)
+    """
+    
+    ACTION_NEW = 'new'
+    ACTION_UPDATE = 'update'
+    ACTION_DUPLICATE = 'duplicate'
+    ACTION_CONFLICT = 'conflict'
+    ACTION_ERROR = 'error'
+    
+    ACTION_CHOICES = [
+        (ACTION_NEW, 'Nouveau'),
+        (ACTION_UPDATE, 'Mise à jour'),
+        (ACTION_DUPLICATE, 'Doublon'),
+        (ACTION_CONFLICT, 'Conflit'),
+        (ACTION_ERROR, 'Erreur'),
+    ]
+    
+    batch = models.ForeignKey(
+        ImportBatch,
+        on_delete=models.CASCADE,
+        related_name='rows',
+        verbose_name="Lot d'import"
+    )
+    
+    line_number = models.IntegerField(verbose_name="Ligne")
+    
+    action = models.CharField(
+        max_length=10,
+        choices=ACTION_CHOICES,
+        verbose_name="Action"
+    )
+    
+    # === Données du CSV ===
+    common_name = models.CharField(max_length=255, blank=True)
+    issuer = models.CharField(max_length=255, blank=True)
+    valid_until = models.DateField(null=True, blank=True)
+    key_usage = models.CharField(max_length=255, blank=True, null=True)
+    friendly_name = models.CharField(max_length=255, blank=True, null=True)
+    template_name = models.CharField(max_length=100, blank=True, null=True)
+    environment = models.CharField(max_length=50, blank=True, null=True)
+    
+    # === Certificat existant (mise à jour, doublon, conflit) ===
+    existing_certificate = models.ForeignKey(
+        Certificate,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Certificat existant"
+    )
+    existing_valid_until = models.DateField(null=True, blank=True)
+    existing_created_at = models.DateTimeField(null=True, blank=True)
+    
+    # === Résultat de l'analyse ===
+    reason = models.TextField(blank=True)
+    recommendation = models.CharField(max_length=255, blank=True)
+    
+    class Meta:
+        ordering = ['batch', 'line_number']
+        verbose_name = "Ligne d'import"
+        verbose_name_plural = "Lignes d'import"
+        indexes = [
+            models.Index(fields=['batch', 'action']),
+            models.Index(fields=['batch', 'line_number']),
+        ]
+    
+    def __str__(self):
+        return f"Ligne {self.line_number}: {self.common_name} ({self.action})"
+    
+    @classmethod
+    def from_analysis(cls, batch, result):
+        """Construit une ligne de staging à partir d'un résultat de CSVAnalyzer"""
+        csv_data = result.get('csv_data') or {}
+        existing = result.get('existing_cert') or {}
+        
+        def truncate(value, max_length):
+            return value[:max_length] if value else value
+        
+        valid_until = csv_data.get('valid_until')
+        if hasattr(valid_until, 'date'):
+            valid_until = valid_until.date()
+        
+        return cls(
+            batch=batch,
+            line_number=csv_data.get('line_number') or 0,
+            action=result.get('action'),
+            common_name=truncate(csv_data.get('common_name'), 255) or '',
+            issuer=truncate(csv_data.get('issuer'), 255) or '',
+            valid_until=valid_until,
+            key_usage=truncate(csv_data.get('key_usage'), 255),
+            friendly_name=truncate(csv_data.get('friendly_name'), 255),
+            template_name=truncate(csv_data.get('template_name'), 100),
+            environment=truncate(csv_data.get('environment'), 50),
+            existing_certificate_id=existing.get('id'),
+            existing_valid_until=existing.get('valid_until'),
+            existing_created_at=existing.get('created_at'),
+            reason=result.get('reason') or '',
+            recommendation=result.get('recommendation') or '',
+        )
+    
+    def to_certificate(self, import_method, created_by_id=None, needs_enrichment=False, today=None):
+        """
+        Certificat (non enregistré) correspondant à cette ligne, pour bulk_create
+        
+        days_remaining et status sont calculés comme dans save(), que bulk_create contourne.
+        """
+        days_remaining, status = Certificate.compute_expiration(self.valid_until, today=today)
+        return Certificate(
+            common_name=self.common_name,
+            issuer=self.issuer,
+            valid_until=self.valid_until,
+            key_usage=self.key_usage,
+            friendly_name=self.friendly_name,
+            template_name=self.template_name,
+            environment=self.environment,
+            import_method=import_method,
+            needs_enrichment=needs_enrichment,
+            created_by_id=created_by_id,
+            days_remaining=days_remaining,
+            status=status,
+        )
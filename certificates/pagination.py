@@ -0,0 +1,105 @@
+"""
+Pagination par curseur (keyset) de la liste des certificats et de l'API
+
+Les pages sont délimitées par le dernier triplet (valid_until, common_name, id)
+affiché au lieu d'un OFFSET: une page profonde coûte autant que la première.
+"""
+import base64
+import json
+from datetime import date
+from typing import Optional, Tuple
+
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Ordre total et stable (id départage les doublons de common_name)
+KEYSET_ORDERING = ['valid_until', 'common_name', 'id']
+
+
+def encode_cursor(certificate) -> str:
+    """Curseur opaque pointant après ce certificat"""
+    payload = json.dumps([certificate.valid_until.isoformat(), certificate.common_name, certificate.pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple]:
+    """
+    Décode un curseur (None si absent ou invalide: retour à la première page)
+    """
+    if not token:
+        return None
+    
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        valid_until, common_name, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (
+            date.fromisoformat(valid_until),
+            str(common_name),
+            int(pk),
+        )
+    except (ValueError, TypeError):
+        return None
+
+
+def filter_after_cursor(queryset, cursor: Tuple):
+    """
+    Restreint le queryset (trié par KEYSET_ORDERING) aux lignes situées après le curseur
+    Équivaut à (valid_until, common_name, id) > curseur, servi par certificate_keyset_idx.
+    """
+    valid_until, common_name, pk = cursor
+    return queryset.filter(
+        Q(valid_until__gt=valid_until)
+        | Q(valid_until=valid_until, common_name__gt=common_name)
+        | Q(valid_until=valid_until, common_name=common_name, id__gt=pk)
+    )
+
+
+class CertificateCursorPagination(BasePagination):
+    """
+    Pagination par curseur de l'API, sur le même ordre keyset que la liste
+    
+    ?cursor=<jeton> pour la page suivante, ?page_size=N (borné à max_page_size)
+    """
+    
+    page_size = 100
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            page_size = self.page_size
+        return max(1, min(page_size, self.max_page_size))
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        
+        queryset = queryset.order_by(*KEYSET_ORDERING)
+        cursor = decode_cursor(request.query_params.get(self.cursor_query_param))
+        if cursor:
+            queryset = filter_after_cursor(queryset, cursor)
+        
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        certificates = list(queryset[:page_size + 1])
+        has_next = len(certificates) > page_size
+        certificates = certificates[:page_size]
+        
+        self.next_cursor = encode_cursor(certificates[-1]) if has_next else None
+        return certificates
+    
+    def get_next_link(self) -> Optional[str]:
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+    
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
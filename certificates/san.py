@@ -0,0 +1,160 @@
+"""
+Index des noms couverts par les certificats (CN + SAN)
+
+Chaque nom est stocké avec ses labels inversés (api.eid.local -> local.eid.api)
+dans CertificateSAN. Un wildcard (*.eid.local) est stocké sans son premier
+label (local.eid) avec is_wildcard=True. Ainsi:
+
+- "quels certificats couvrent api.eid.local ?" = égalité sur local.eid.api
+  (nom exact) OU sur local.eid (wildcard): une requête indexée
+- "quels noms sous eid.local ?" = préfixe local.eid. sur l'index B-tree
+"""
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+
+# Taille des lots d'insertion dans la table d'index
+SYNC_BATCH_SIZE = 1000
+
+
+def normalize_hostname(name) -> Optional[str]:
+    """Nom DNS en minuscules sans point final (None si ce n'est pas un nom d'hôte)"""
+    if not name:
+        return None
+    
+    name = str(name).strip().lower().rstrip('.')
+    # Adresses e-mail, URI, IPv6...: non indexés
+    if not name or any(char in name for char in '@/: '):
+        return None
+    return name
+
+
+def reverse_labels(name: str) -> str:
+    return '.'.join(reversed(name.split('.')))
+
+
+def split_name(name: str) -> Tuple[bool, str]:
+    """
+    Returns:
+        (is_wildcard, reversed_name) - le label '*' d'un wildcard est retiré
+    """
+    if name.startswith('*.'):
+        return True, reverse_labels(name[2:])
+    return False, reverse_labels(name)
+
+
+def iter_certificate_names(common_name, san_list) -> Iterator[Tuple[str, str]]:
+    """Noms distincts couverts par un certificat: (nom, source 'cn'|'san')"""
+    seen = set()
+    for source, names in (('cn', [common_name]), ('san', san_list or [])):
+        for raw_name in names:
+            name = normalize_hostname(raw_name)
+            if name and name not in seen:
+                seen.add(name)
+                yield name, source
+
+
+def build_entries(certificate_id, common_name, san_list) -> List:
+    """Lignes CertificateSAN (non sauvegardées) d'un certificat"""
+    from .models import CertificateSAN
+    
+    entries = []
+    for name, source in iter_certificate_names(common_name, san_list):
+        is_wildcard, reversed_name = split_name(name)
+        entries.append(CertificateSAN(
+            certificate_id=certificate_id,
+            name=name[:255],
+            reversed_name=reversed_name[:255],
+            is_wildcard=is_wildcard,
+            source=source,
+        ))
+    return entries
+
+
+def sync_certificate_names(certificate_ids: Iterable[int]) -> int:
+    """
+    Reconstruit l'index des noms pour ces certificats (suppression + bulk_create)
+    
+    Utilisé après les écritures groupées (import CSV, enrichissement par scan)
+    qui contournent Certificate.save().
+    
+    Returns:
+        Nombre de noms indexés
+    """
+    from .models import Certificate, CertificateSAN
+    
+    certificate_ids = list(certificate_ids)
+    indexed = 0
+    
+    for start in range(0, len(certificate_ids), SYNC_BATCH_SIZE):
+        chunk = certificate_ids[start:start + SYNC_BATCH_SIZE]
+        rows = Certificate.objects.filter(id__in=chunk).values_list('id', 'common_name', 'san_list')
+        
+        entries = []
+        for certificate_id, common_name, san_list in rows:
+            entries.extend(build_entries(certificate_id, common_name, san_list))
+        
+        with transaction.atomic():
+            CertificateSAN.objects.filter(certificate_id__in=chunk).delete()
+            CertificateSAN.objects.bulk_create(entries, batch_size=SYNC_BATCH_SIZE)
+        indexed += len(entries)
+    
+    return indexed
+
+
+def covering_filter(hostname: str) -> Optional[Q]:
+    """
+    Condition "le nom couvre hostname": nom exact ou wildcard sur le parent
+    (un wildcard ne couvre qu'un seul label: *.eid.local ne couvre pas a.b.eid.local)
+    """
+    name = normalize_hostname(hostname)
+    if not name:
+        return None
+    
+    # Nom exact: un wildcard demandé (*.eid.local) ne correspond qu'au même wildcard
+    is_wildcard, reversed_name = split_name(name)
+    condition = Q(is_wildcard=is_wildcard, reversed_name=reversed_name)
+    
+    # Le parent de api.eid.local est eid.local: reversed "local.eid"
+    if not is_wildcard and '.' in reversed_name:
+        parent = reversed_name.rsplit('.', 1)[0]
+        condition |= Q(is_wildcard=True, reversed_name=parent)
+    
+    return condition
+
+
+def find_covering_certificates(hostname: str, include_archived: bool = False):
+    """
+    Certificats couvrant hostname (CN ou SAN, exact ou wildcard), en une requête
+    
+    Returns:
+        QuerySet de CertificateSAN (avec le certificat) ou None si hostname invalide
+    """
+    from .models import CertificateSAN
+    
+    condition = covering_filter(hostname)
+    if condition is None:
+        return None
+    
+    entries = CertificateSAN.objects.filter(condition).select_related('certificate')
+    if not include_archived:
+        entries = entries.filter(certificate__archived=False)
+    return entries.order_by('certificate__valid_until', 'certificate_id')
+
+
+def find_names_under(domain: str, include_archived: bool = False):
+    """Noms indexés sous un domaine (recherche par suffixe, préfixe inversé)"""
+    from .models import CertificateSAN
+    
+    name = normalize_hostname(domain)
+    if not name:
+        return None
+    
+    reversed_domain = reverse_labels(name.removeprefix('*.'))
+    entries = CertificateSAN.objects.filter(
+        Q(reversed_name=reversed_domain) | Q(reversed_name__startswith=f'{reversed_domain}.')
+    ).select_related('certificate')
+    if not include_archived:
+        entries = entries.filter(certificate__archived=False)
+    return entries.order_by('reversed_name', 'certificate_id')
@@ -0,0 +1,45 @@
+"""
+Recherche classée dans les certificats (common_name, émetteur, template)
+
+- PostgreSQL: filtre icontains servi par des index GIN trigrammes
+  (pg_trgm, migration 0008) et classement par similarité trigramme
+- Autres bases (SQLite en dev): LIKE classique, classement exact > préfixe > contient
+"""
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+
+SEARCH_FIELDS = ['common_name', 'issuer', 'template_name']
+
+
+def search_certificates(queryset, term: str):
+    """
+    Filtre et classe les certificats correspondant à `term`
+    
+    Returns:
+        queryset annoté de search_rank et trié par pertinence décroissante
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+    
+    # UPPER(col::text) LIKE UPPER(...): expression indexée sur PostgreSQL
+    matches = Q()
+    for field in SEARCH_FIELDS:
+        matches |= Q(**{f'{field}__icontains': term})
+    queryset = queryset.filter(matches)
+    
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        from django.db.models.functions import Greatest
+        
+        rank = Greatest(*[TrigramSimilarity(field, term) for field in SEARCH_FIELDS])
+    else:
+        rank = Case(
+            When(common_name__iexact=term, then=Value(1.0)),
+            When(common_name__istartswith=term, then=Value(0.75)),
+            When(common_name__icontains=term, then=Value(0.5)),
+            default=Value(0.25),
+            output_field=FloatField(),
+        )
+    
+    return queryset.annotate(search_rank=rank).order_by('-search_rank', 'valid_until', 'common_name', 'id')
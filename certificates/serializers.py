@@ -0,0 +1,112 @@
+"""
+Sérialiseurs de l'API des certificats
+"""
+from rest_framework import serializers
+
+from .models import Certificate
+
+
+class SparseFieldsMixin:
+    """
+    Limite la représentation aux champs demandés: ?fields=id,common_name,valid_until
+    
+    Les noms inconnus sont ignorés; sans paramètre, tous les champs sont rendus.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = parse_fields_param(request.query_params.get('fields') if request else None)
+        if requested:
+            for field_name in set(self.fields) - requested:
+                self.fields.pop(field_name)
+
+
+def parse_fields_param(value):
+    """'id, common_name' -> {'id', 'common_name'} (None si absent ou vide)"""
+    if not value:
+        return None
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    return names or None
+
+
+class CertificateSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Représentation d'un certificat dans les listes (sans le PEM)"""
+    
+    environment_display = serializers.CharField(source='get_environment_display', read_only=True)
+    
+    class Meta:
+        model = Certificate
+        fields = [
+            'id',
+            'common_name',
+            'issuer',
+            'valid_from',
+            'valid_until',
+            'days_remaining',
+            'status',
+            'key_usage',
+            'friendly_name',
+            'template_name',
+            'san_list',
+            'serial_number',
+            'fingerprint_sha256',
+            'signature_algorithm',
+            'public_key_size',
+            'is_self_signed',
+            'is_ca_certificate',
+            'environment',
+            'environment_display',
+            'tags',
+            'notes',
+            'import_method',
+            'needs_enrichment',
+            'last_scanned',
+            'scan_port',
+            'archived',
+            'archived_at',
+            'archived_reason',
+            'created_at',
+            'updated_at',
+        ]
+        # Calculés par Certificate.save() ou gérés par l'import / l'archivage
+        read_only_fields = [
+            'days_remaining',
+            'status',
+            'import_method',
+            'last_scanned',
+            'archived',
+            'archived_at',
+            'archived_reason',
+            'created_at',
+            'updated_at',
+        ]
+
+
+class CertificateDetailSerializer(CertificateSerializer):
+    """Représentation complète d'un certificat (avec le PEM)"""
+    
+    class Meta(CertificateSerializer.Meta):
+        fields = CertificateSerializer.Meta.fields + ['pem_data']
+
+
+class CertificateBulkItemSerializer(serializers.Serializer):
+    """
+    Une ligne de l'import groupé, mêmes colonnes que l'import CSV
+    
+    Validée ligne par ligne: une ligne invalide est comptée en erreur,
+    comme une ligne CSV illisible, sans rejeter le reste du lot.
+    """
+    
+    common_name = serializers.CharField(max_length=255)
+    issuer = serializers.CharField(max_length=255)
+    valid_until = serializers.DateField()
+    key_usage = serializers.CharField(max_length=255, required=False, allow_null=True, allow_blank=True)
+    friendly_name = serializers.CharField(max_length=255, required=False, allow_null=True, allow_blank=True)
+    template_name = serializers.CharField(max_length=100, required=False, allow_null=True, allow_blank=True)
+    environment = serializers.ChoiceField(
+        choices=Certificate.ENVIRONMENT_CHOICES,
+        required=False,
+        allow_null=True,
+        allow_blank=True,
+    )
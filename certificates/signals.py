@@ -0,0 +1,24 @@
+"""
+Signaux de l'application certificates
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Certificate
+from .san import sync_certificate_names
+from .stats import invalidate_certificate_stats
+
+
+@receiver(post_save, sender=Certificate)
+@receiver(post_delete, sender=Certificate)
+def invalidate_stats_on_change(sender, **kwargs):
+    """Les compteurs en cache ne sont plus à jour après création/modification/suppression"""
+    invalidate_certificate_stats()
+
+
+@receiver(post_save, sender=Certificate)
+def sync_names_on_save(sender, instance, update_fields=None, **kwargs):
+    """Réindexe le CN et les SAN du certificat (sauf sauvegarde partielle sans ces champs)"""
+    if update_fields and not {'common_name', 'san_list'} & set(update_fields):
+        return
+    sync_certificate_names([instance.pk])
@@ -0,0 +1,116 @@
+"""
+Statistiques globales des certificats (liste, accueil, mur, résumé quotidien)
+
+Tous les compteurs sont calculés en une seule requête d'agrégation
+conditionnelle puis mis en cache. Le cache est invalidé par les signaux
+post_save / post_delete de Certificate et par les traitements groupés
+(import CSV, recalcul des jours restants, scan automatique, actions d'admin)
+qui contournent save().
+
+Le recalcul nocturne des jours restants ne touche pas updated_at et laisse
+souvent les compteurs inchangés: il pose un marqueur de rafraîchissement,
+repris dans la version des certificats et dans l'ETag du détail de l'API.
+"""
+import uuid
+from typing import Dict
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+
+STATS_CACHE_KEY = 'certificates:stats'
+STATS_CACHE_TIMEOUT = 300
+REFRESH_MARKER_CACHE_KEY = 'certificates:days_refresh'
+
+STATUSES = ['active', 'expiring_soon', 'expired']
+
+
+def compute_certificate_stats() -> Dict:
+    """
+    Calcule en une requête les compteurs, avec et sans les certificats archivés
+    
+    Returns:
+        {'all': {...}, 'unarchived': {...}} avec total/active/expiring_soon/expired,
+        'last_updated': dernière modification d'un certificat non archivé,
+        'all_last_updated': dernière modification d'un certificat quelconque
+    """
+    from .models import Certificate
+    
+    unarchived = Q(archived=False)
+    aggregates = {
+        'all_total': Count('id'),
+        'unarchived_total': Count('id', filter=unarchived),
+        'last_updated': Max('updated_at', filter=unarchived),
+        'all_last_updated': Max('updated_at'),
+    }
+    for status in STATUSES:
+        aggregates[f'all_{status}'] = Count('id', filter=Q(status=status))
+        aggregates[f'unarchived_{status}'] = Count('id', filter=unarchived & Q(status=status))
+    
+    counts = Certificate.objects.aggregate(**aggregates)
+    
+    stats = {
+        scope: {
+            key: counts[f'{scope}_{key}']
+            for key in ['total'] + STATUSES
+        }
+        for scope in ['all', 'unarchived']
+    }
+    stats['last_updated'] = counts['last_updated']
+    stats['all_last_updated'] = counts['all_last_updated']
+    return stats
+
+
+def _get_cached_stats() -> Dict:
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = compute_certificate_stats()
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def get_certificate_stats(include_archived: bool = True) -> Dict:
+    """
+    Compteurs total/active/expiring_soon/expired (au plus une requête)
+    
+    Args:
+        include_archived: Compter aussi les certificats archivés
+    """
+    stats = _get_cached_stats()
+    return dict(stats['all' if include_archived else 'unarchived'])
+
+
+def get_certificates_version(include_archived: bool = False) -> str:
+    """
+    Marqueur de version des certificats non archivés (sert d'ETag)
+    
+    Change à chaque modification (updated_at), à chaque variation des
+    compteurs (suppression, archivage, changement de statut en masse) et
+    à chaque recalcul des jours restants (marqueur de rafraîchissement).
+    Lu depuis le cache: aucune requête tant que rien n'a changé.
+    
+    Args:
+        include_archived: Version de l'ensemble des certificats, archivés compris
+    """
+    stats = _get_cached_stats()
+    last_updated = stats.get('all_last_updated' if include_archived else 'last_updated')
+    counts = stats['all' if include_archived else 'unarchived']
+    return '|'.join(
+        [last_updated.isoformat() if last_updated else '-']
+        + [str(counts[key]) for key in ['total'] + STATUSES]
+        + [get_refresh_marker()]
+    )
+
+
+def get_refresh_marker() -> str:
+    """Marqueur du dernier recalcul groupé des jours restants ('-' si aucun)"""
+    return cache.get(REFRESH_MARKER_CACHE_KEY) or '-'
+
+
+def mark_days_refreshed():
+    """À appeler après un UPDATE groupé de days_remaining / status (hors updated_at)"""
+    cache.set(REFRESH_MARKER_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate_certificate_stats():
+    """À appeler après toute écriture groupée sur les certificats"""
+    cache.delete(STATS_CACHE_KEY)
@@ -1,64 +1,154 @@
 """
 Tâches Celery pour les certificats
 """
+import logging
+import time
+
 from celery import shared_task
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
-from .models import Certificate
+from .models import Certificate, ImportBatch
+from .san import sync_certificate_names
+from .stats import invalidate_certificate_stats
 from .utils import CertificateScanner
 
+logger = logging.getLogger(__name__)
+
+
+# Champs écrits par l'enrichissement (scan réussi / échec du scan)
+ENRICHED_FIELDS = [
+    'valid_from', 'san_list', 'serial_number', 'fingerprint_sha256',
+    'signature_algorithm', 'public_key_size', 'pem_data', 'is_self_signed',
+    'is_ca_certificate', 'needs_enrichment', 'last_scanned', 'scan_error', 'updated_at',
+]
+SCAN_ERROR_FIELDS = ['last_scanned', 'scan_error', 'updated_at']
+
+
+def apply_scan_result(cert, result, now):
+    """
+    Reporte le résultat d'un scan sur l'instance (sans sauvegarder)
+    
+    Returns:
+        True si le scan a réussi
+    """
+    cert.last_scanned = now
+    cert.updated_at = now
+    
+    if not result.get('success'):
+        cert.scan_error = result.get('error')
+        return False
+    
+    cert.valid_from = result.get('valid_from')
+    cert.san_list = result.get('san_list', [])
+    cert.serial_number = result.get('serial_number')
+    cert.fingerprint_sha256 = result.get('fingerprint_sha256')
+    cert.signature_algorithm = result.get('signature_algorithm')
+    cert.public_key_size = result.get('public_key_size')
+    cert.pem_data = result.get('pem_data')
+    cert.is_self_signed = result.get('is_self_signed', False)
+    cert.is_ca_certificate = result.get('is_ca_certificate', False)
+    
+    cert.needs_enrichment = False
+    cert.scan_error = None
+    return True
+
+
+def bulk_write_scan_results(certs, fields, chunk_size=500):
+    """
+    Écrit les certificats enrichis par lots avec bulk_update
+    
+    bulk_update contourne Certificate.save(): valid_until n'étant pas modifié
+    par le scan, days_remaining et status restent valides.
+    Si un lot viole une contrainte (numéro de série déjà présent), il est
+    rejoué ligne par ligne et seules les lignes fautives passent en erreur.
+    
+    Returns:
+        Nombre de certificats n'ayant pas pu être écrits
+    """
+    failed = 0
+    
+    for i in range(0, len(certs), chunk_size):
+        chunk = certs[i:i + chunk_size]
+        try:
+            with transaction.atomic():
+                Certificate.objects.bulk_update(chunk, fields)
+        except IntegrityError:
+            for cert in chunk:
+                try:
+                    with transaction.atomic():
+                        Certificate.objects.filter(pk=cert.pk).update(
+                            **{field: getattr(cert, field) for field in fields}
+                        )
+                except IntegrityError as e:
+                    failed += 1
+                    Certificate.objects.filter(pk=cert.pk).update(
+                        scan_error=f'Erreur d\'enregistrement: {str(e)}',
+                        last_scanned=cert.last_scanned,
+                        updated_at=cert.updated_at,
+                    )
+    
+    return failed
+
 
 @shared_task(name='certificates.tasks.auto_scan_certificates')
-def auto_scan_certificates():
+def auto_scan_certificates(limit=50, chunk_size=500):
     """
     Tâche Celery pour scanner automatiquement les certificats
     qui nécessitent un enrichissement
+    
+    Les scans sont effectués en parallèle (asyncio), puis les résultats sont
+    écrits en base par lots de chunk_size avec bulk_update.
     """
-    # Récupérer les certificats à enrichir
-    certs_to_scan = Certificate.objects.filter(needs_enrichment=True)[:50]  # Max 50 par batch
+    db_time = 0.0
+    
+    # Récupérer les certificats à enrichir (seules les colonnes utiles au scan)
+    started = time.monotonic()
+    certs_to_scan = list(
+        Certificate.objects.filter(needs_enrichment=True)
+        .only('id', 'common_name', 'scan_port')[:limit]
+    )
+    db_time += time.monotonic() - started
     
-    if not certs_to_scan.exists():
+    if not certs_to_scan:
         return 'Aucun certificat à scanner'
     
     scanner = CertificateScanner(timeout=5, verify_ssl=False)
-    success_count = 0
-    error_count = 0
     
-    for cert in certs_to_scan:
-        try:
-            result = scanner.scan_host(cert.common_name, cert.scan_port or 443)
-            
-            if result.get('success'):
-                # Mettre à jour avec les données enrichies
-                cert.valid_from = result.get('valid_from')
-                cert.san_list = result.get('san_list', [])
-                cert.serial_number = result.get('serial_number')
-                cert.fingerprint_sha256 = result.get('fingerprint_sha256')
-                cert.signature_algorithm = result.get('signature_algorithm')
-                cert.public_key_size = result.get('public_key_size')
-                cert.pem_data = result.get('pem_data')
-                cert.is_self_signed = result.get('is_self_signed', False)
-                cert.is_ca_certificate = result.get('is_ca_certificate', False)
-                
-                cert.needs_enrichment = False
-                cert.last_scanned = timezone.now()
-                cert.scan_error = None
-                cert.save()
-                
-                success_count += 1
-            else:
-                cert.scan_error = result.get('error')
-                cert.last_scanned = timezone.now()
-                cert.save()
-                error_count += 1
-                
-        except Exception as e:
-            cert.scan_error = str(e)
-            cert.last_scanned = timezone.now()
-            cert.save()
-            error_count += 1
+    # Scanner tous les serveurs en parallèle avant la mise à jour en base
+    started = time.monotonic()
+    results = scanner.scan_targets_async(
+        [(cert.common_name, cert.scan_port or 443) for cert in certs_to_scan]
+    )
+    scan_time = time.monotonic() - started
+    
+    now = timezone.now()
+    enriched, failed = [], []
+    for cert, result in zip(certs_to_scan, results):
+        if apply_scan_result(cert, result, now):
+            enriched.append(cert)
+        else:
+            failed.append(cert)
     
-    return f'Scan terminé: {success_count} succès, {error_count} erreurs'
+    started = time.monotonic()
+    write_errors = bulk_write_scan_results(enriched, ENRICHED_FIELDS, chunk_size)
+    bulk_write_scan_results(failed, SCAN_ERROR_FIELDS, chunk_size)
+    # bulk_update contourne les signaux post_save: réindexer les SAN découverts
+    # et invalider les statistiques (updated_at a changé)
+    sync_certificate_names(cert.pk for cert in enriched)
+    invalidate_certificate_stats()
+    db_time += time.monotonic() - started
+    
+    success_count = len(enriched) - write_errors
+    error_count = len(failed) + write_errors
+    
+    timings = (
+        f'scan {scan_time:.2f}s (réseau cumulé {scanner.timings["network"]:.2f}s, '
+        f'parsing {scanner.timings["parse"]:.2f}s), base {db_time:.2f}s'
+    )
+    logger.info(f'auto_scan_certificates: {len(certs_to_scan)} certificat(s) - {timings}')
+    
+    return f'Scan terminé: {success_count} succès, {error_count} erreurs ({timings})'
 
 
 @shared_task(name='certificates.tasks.scan_certificate_async')
@@ -72,26 +162,10 @@ def scan_certificate_async(certificate_id, port=443):
         
         result = scanner.scan_host(cert.common_name, port)
         
-        if result.get('success'):
-            cert.valid_from = result.get('valid_from')
-            cert.san_list = result.get('san_list', [])
-            cert.serial_number = result.get('serial_number')
-            cert.fingerprint_sha256 = result.get('fingerprint_sha256')
-            cert.signature_algorithm = result.get('signature_algorithm')
-            cert.public_key_size = result.get('public_key_size')
-            cert.pem_data = result.get('pem_data')
-            cert.is_self_signed = result.get('is_self_signed', False)
-            cert.is_ca_certificate = result.get('is_ca_certificate', False)
-            
-            cert.needs_enrichment = False
-            cert.last_scanned = timezone.now()
-            cert.scan_error = None
+        if apply_scan_result(cert, result, timezone.now()):
             cert.save()
-            
             return f'Certificat {cert.common_name} scanné avec succès'
         else:
-            cert.scan_error = result.get('error')
-            cert.last_scanned = timezone.now()
             cert.save()
             return f'Erreur: {result.get("error")}'
             
@@ -114,3 +188,60 @@ def update_days_remaining():
         return 'Mise à jour des jours restants terminée avec succès'
     except Exception as e:
         return f'Erreur lors de la mise à jour: {str(e)}'
+
+
+@shared_task(name='certificates.tasks.analyze_import_batch')
+def analyze_import_batch(batch_id):
+    """
+    Analyse en arrière-plan un fichier CSV volumineux vers la table de staging
+    
+    Le lot passe en 'pending' (aperçu et confirmation) ou en 'failed'.
+    Le fichier stocké est supprimé une fois l'analyse terminée.
+    """
+    from .forms import CSVImportForm
+    
+    try:
+        batch = ImportBatch.objects.get(id=batch_id, status='queued')
+    except ImportBatch.DoesNotExist:
+        return f'Lot d\'import {batch_id} introuvable'
+    
+    batch.status = 'analyzing'
+    batch.started_at = timezone.now()
+    batch.save(update_fields=['status', 'started_at'])
+    
+    try:
+        with batch.csv_file.open('rb') as csv_file:
+            form = CSVImportForm.for_file(csv_file, **batch.options)
+            summary = batch.stage(form.iter_csv_rows())
+        batch.status = 'pending'
+        message = f'Lot {batch_id} analysé: {summary["total"]} ligne(s)'
+    except Exception as e:
+        logger.exception(f'analyze_import_batch: échec du lot {batch_id}')
+        batch.status = 'failed'
+        # ValidationError du parseur (encodage) ou erreur inattendue
+        batch.error = '; '.join(getattr(e, 'messages', [str(e)]))
+        message = f'Erreur: {batch.error}'
+    
+    batch.csv_file.delete(save=False)
+    batch.save(update_fields=['status', 'error', 'csv_file'])
+    return message
+
+
+@shared_task(name='certificates.tasks.apply_import_batch')
+def apply_import_batch(batch_id):
+    """
+    Applique en arrière-plan un lot d'import confirmé par l'utilisateur
+    """
+    try:
+        batch = ImportBatch.objects.get(id=batch_id, status='applying')
+    except ImportBatch.DoesNotExist:
+        return f'Lot d\'import {batch_id} introuvable'
+    
+    try:
+        counts = batch.apply()
+    except Exception as e:
+        # Le lot est passé en 'failed' par apply()
+        logger.exception(f'apply_import_batch: échec du lot {batch_id}')
+        return f'Erreur: {str(e)}'
+    
+    return f'Lot {batch_id} appliqué: {counts["created"]} créé(s), {counts["updated"]} mis à jour'
@@ -1,3 +1,335 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .csv_analyzer import CSVAnalyzer
+from .forms import CSVImportForm
+from .models import Certificate, ImportBatch, ImportRow
+from .san import find_covering_certificates
+from .tasks import auto_scan_certificates
+from .utils import CertificateScanner
+
+
+class CertificateListETagTests(TestCase):
+    """Les ETags de l'API changent après les écritures groupées"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('api', password='secret')
+        self.client.force_login(self.user)
+        self.certificate = Certificate.objects.create(
+            common_name='app.eid.local',
+            issuer='eid-CA-01-CA',
+            valid_until=timezone.now().date() + timedelta(days=90),
+            needs_enrichment=True,
+        )
+        self.url = reverse('api:certificate-list')
+    
+    def get_list(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(self.url, **headers)
+    
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.get_list()['ETag']
+        self.assertEqual(self.get_list(etag).status_code, 304)
+    
+    def test_scan_write_changes_etag(self):
+        etag = self.get_list()['ETag']
+        
+        scan_result = {
+            'success': True,
+            'serial_number': 'ABCDEF',
+            'fingerprint_sha256': '00' * 32,
+            'san_list': ['app.eid.local', 'www.eid.local'],
+        }
+        with mock.patch('certificates.tasks.CertificateScanner.scan_targets_async', return_value=[scan_result]):
+            auto_scan_certificates()
+        
+        response = self.get_list(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        [item] = response.json()['results']
+        self.assertEqual(item['serial_number'], 'ABCDEF')
+        self.assertFalse(item['needs_enrichment'])
+    
+    def test_days_refresh_changes_list_and_detail_etags(self):
+        detail_url = reverse('api:certificate-detail', args=[self.certificate.pk])
+        list_etag = self.get_list()['ETag']
+        detail_etag = self.client.get(detail_url)['ETag']
+        
+        # Le lendemain: days_remaining change, pas le statut ni updated_at
+        Certificate.refresh_days_remaining(today=timezone.now().date() + timedelta(days=1))
+        
+        response = self.get_list(list_etag)
+        self.assertEqual(response.status_code, 200)
+        [item] = response.json()['results']
+        self.assertEqual(item['days_remaining'], 89)
+        
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['days_remaining'], 89)
+
+
+class HostnameLookupTests(TestCase):
+    """Recherche des certificats couvrant un nom (CN/SAN, exact ou wildcard)"""
+    
+    def setUp(self):
+        valid_until = timezone.now().date() + timedelta(days=90)
+        self.apex = Certificate.objects.create(
+            common_name='eid.local',
+            issuer='eid-CA-01-CA',
+            valid_until=valid_until,
+        )
+        self.wildcard = Certificate.objects.create(
+            common_name='portal.eid.local',
+            issuer='eid-CA-01-CA',
+            valid_until=valid_until,
+            san_list=['portal.eid.local', '*.eid.local'],
+        )
+        self.api = Certificate.objects.create(
+            common_name='api.eid.local',
+            issuer='eid-CA-01-CA',
+            valid_until=valid_until,
+        )
+    
+    def covering(self, hostname):
+        return {entry.certificate_id for entry in find_covering_certificates(hostname)}
+    
+    def test_exact_name(self):
+        self.assertEqual(self.covering('eid.local'), {self.apex.pk})
+        self.assertEqual(self.covering('PORTAL.eid.local.'), {self.wildcard.pk})
+    
+    def test_wildcard_covers_child(self):
+        self.assertEqual(self.covering('api.eid.local'), {self.api.pk, self.wildcard.pk})
+        self.assertEqual(self.covering('www.eid.local'), {self.wildcard.pk})
+    
+    def test_wildcard_covers_one_label_only(self):
+        self.assertEqual(self.covering('a.b.eid.local'), set())
+    
+    def test_wildcard_query_matches_wildcard_entry(self):
+        self.assertEqual(self.covering('*.eid.local'), {self.wildcard.pk})
+    
+    def test_lookup_view(self):
+        self.client.force_login(User.objects.create_user('ops', password='secret'))
+        response = self.client.get(reverse('certificates:lookup'), {'hostname': 'www.eid.local'})
+        
+        self.assertEqual(response.status_code, 200)
+        [result] = response.json()['results']
+        self.assertEqual(result['id'], self.wildcard.pk)
+        self.assertEqual(result['matched_names'], ['*.eid.local'])
+
+
+class ImportConfirmationTests(TestCase):
+    """Confirmation d'un lot d'import analysé"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('ops', password='secret')
+        self.client.force_login(self.user)
+        self.batch = ImportBatch.objects.create(created_by=self.user)
+        ImportRow.objects.create(
+            batch=self.batch,
+            line_number=1,
+            action=ImportRow.ACTION_NEW,
+            common_name='app.eid.local',
+            issuer='eid-CA-01-CA',
+            valid_until=timezone.now().date() + timedelta(days=90),
+        )
+    
+    def confirm(self):
+        return self.client.post(reverse('certificates:import_csv'), {'confirm': '1', 'batch_id': self.batch.pk})
+    
+    def test_double_submit_applies_once(self):
+        self.confirm()
+        self.confirm()
+        
+        self.assertEqual(Certificate.objects.filter(common_name='app.eid.local').count(), 1)
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.status, 'applied')
+    
+    def test_claimed_batch_is_not_applied(self):
+        self.assertTrue(self.batch.claim_for_apply())
+        self.assertFalse(ImportBatch.objects.get(pk=self.batch.pk).claim_for_apply())
+        
+        self.confirm()
+        self.assertFalse(Certificate.objects.exists())
+    
+    def test_apply_creates_certificates_in_chunks(self):
+        for line_number in (2, 3):
+            ImportRow.objects.create(
+                batch=self.batch,
+                line_number=line_number,
+                action=ImportRow.ACTION_NEW,
+                common_name=f'app{line_number}.eid.local',
+                issuer='eid-CA-01-CA',
+                valid_until=timezone.now().date() + timedelta(days=20),
+            )
+        
+        self.batch.claim_for_apply()
+        counts = self.batch.apply(chunk_size=2)
+        
+        self.assertEqual(counts['created'], 3)
+        created = Certificate.objects.filter(import_method='csv', created_by=self.user)
+        self.assertEqual(created.count(), 3)
+        self.assertEqual(
+            set(created.values_list('status', flat=True)), {'active', 'expiring_soon'}
+        )
+        self.assertEqual(find_covering_certificates('app3.eid.local').count(), 1)
+        self.assertFalse(ImportRow.objects.filter(batch=self.batch).exists())
+
+
+class CertificateBulkImportTests(TestCase):
+    """POST bulk/ de l'API: même application que l'import CSV confirmé"""
+    
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('api', password='secret'))
+        self.today = timezone.now().date()
+        self.existing = Certificate.objects.create(
+            common_name='app.eid.local',
+            issuer='eid-CA-01-CA',
+            valid_until=self.today + timedelta(days=10),
+        )
+    
+    def post(self, items, **params):
+        url = reverse('api:certificate-bulk')
+        if params:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.post(url, items, content_type='application/json')
+    
+    def test_creates_and_archives_through_import_batch(self):
+        response = self.post([
+            {'common_name': 'app.eid.local', 'issuer': 'eid-CA-01-CA',
+             'valid_until': (self.today + timedelta(days=400)).isoformat()},
+            {'common_name': 'new.eid.local', 'issuer': 'eid-CA-01-CA',
+             'valid_until': (self.today + timedelta(days=20)).isoformat()},
+            {'common_name': 'broken.eid.local'},
+        ])
+        
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['counts']['created'], 1)
+        self.assertEqual(data['counts']['updated'], 1)
+        self.assertEqual(data['counts']['archived'], 1)
+        self.assertEqual([error['index'] for error in data['errors']], [2])
+        
+        batch = ImportBatch.objects.get()
+        self.assertEqual(batch.status, 'applied')
+        self.existing.refresh_from_db()
+        self.assertTrue(self.existing.archived)
+        self.assertEqual(self.existing.archived_reason, f'Remplacé par certificat plus récent (import API #{batch.pk})')
+        
+        new = Certificate.objects.get(common_name='new.eid.local')
+        self.assertEqual((new.days_remaining, new.status), (20, 'expiring_soon'))
+        self.assertEqual(new.import_method, 'api')
+    
+    def test_dry_run_writes_nothing(self):
+        response = self.post([
+            {'common_name': 'new.eid.local', 'issuer': 'eid-CA-01-CA',
+             'valid_until': (self.today + timedelta(days=20)).isoformat()},
+        ], dry_run=1)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['summary']['new_count'], 1)
+        self.assertFalse(ImportBatch.objects.exists())
+        self.assertEqual(Certificate.objects.count(), 1)
+
+
+class ScannerErrorTests(TestCase):
+    """Les erreurs d'un serveur restent locales à ce serveur"""
+    
+    def test_missing_peer_certificate_is_a_host_error(self):
+        scanner = CertificateScanner()
+        result = scanner._parse_der(None, 'example.com')
+        
+        self.assertFalse(result['success'])
+        self.assertIn('Erreur lors du parsing', result['error'])
+    
+    def test_unexpected_exception_does_not_abort_scan(self):
+        scanner = CertificateScanner()
+        
+        async def fake_scan(hostname, port=443, semaphore=None):
+            if hostname == 'broken.example.com':
+                raise RuntimeError('boom')
+            return {'success': False, 'error': 'Timeout'}
+        
+        with mock.patch.object(scanner, 'scan_host_async', side_effect=fake_scan):
+            results = scanner.scan_targets_async(
+                [('ok.example.com', 443), ('broken.example.com', 443)]
+            )
+        
+        self.assertEqual([r['hostname'] for r in results],
+                         ['ok.example.com', 'broken.example.com'])
+        self.assertIn('boom', results[1]['error'])
+
+
+class RefreshDaysRemainingTests(TestCase):
+    """Recalcul ensembliste de days_remaining et du statut"""
+    
+    def test_revoked_rows_are_left_untouched(self):
+        today = timezone.now().date()
+        revoked = Certificate.objects.create(
+            common_name='revoked.example.com', serial_number='REV1',
+            valid_until=timezone.now() + timedelta(days=10),
+        )
+        active = Certificate.objects.create(
+            common_name='active.example.com', serial_number='ACT1',
+            valid_until=timezone.now() + timedelta(days=10),
+        )
+        Certificate.objects.filter(pk=revoked.pk).update(status='revoked', days_remaining=99)
+        
+        Certificate.refresh_days_remaining(today=today + timedelta(days=20))
+        
+        revoked.refresh_from_db()
+        active.refresh_from_db()
+        self.assertEqual((revoked.status, revoked.days_remaining), ('revoked', 99))
+        self.assertEqual(active.status, 'expired')
+
+
+class CSVDecodingTests(TestCase):
+    """Décodage en flux: caractères non ASCII après le préfixe de détection"""
+    
+    def read_lines(self, content):
+        form = CSVImportForm.for_file(io.BytesIO(content))
+        return list(form.iter_lines(form.cleaned_data['csv_file']))
+    
+    def test_windows_1252_after_prefix(self):
+        padding = b'a' * CSVImportForm.ENCODING_PREFIX_SIZE
+        lines = self.read_lines(padding + b'\n' + 'café'.encode('windows-1252') + b'\n')
+        
+        self.assertEqual(lines[-1], 'café\n')
+    
+    def test_split_utf8_character_before_fallback(self):
+        # 'é' en UTF-8 coupé entre le préfixe et le bloc suivant, puis un octet windows-1252
+        padding = b'a' * (CSVImportForm.ENCODING_PREFIX_SIZE - 1)
+        content = padding + 'é\n'.encode('utf-8') + 'café'.encode('windows-1252') + b'\n'
+        
+        lines = self.read_lines(content)
+        
+        self.assertEqual(lines, ['a' * (CSVImportForm.ENCODING_PREFIX_SIZE - 1) + 'é\n', 'café\n'])
+
 
-# Create your tests here.
+class CSVAnalyzerChunkTests(TestCase):
+    """Analyse par lots: état limité au lot en cours, résultats inchangés"""
+    
+    def test_state_covers_current_chunk_only(self):
+        today = timezone.now().date()
+        Certificate.objects.create(common_name='app.eid.local', issuer='CA', valid_until=today + timedelta(days=10))
+        rows = [
+            {'line_number': index, 'common_name': name, 'issuer': 'CA', 'valid_until': today + timedelta(days=days)}
+            for index, (name, days) in enumerate([
+                ('app.eid.local', 100), ('a.eid.local', 5), ('b.eid.local', 5),
+                ('app.eid.local', 10), ('c.eid.local', 5),
+            ], start=1)
+        ]
+        analyzer = CSVAnalyzer()
+        summary = analyzer.empty_summary()
+        
+        actions = [result['action'] for result in analyzer.iter_analysis(rows, summary, chunk_size=2)]
+        
+        self.assertEqual(actions, ['update', 'new', 'new', 'duplicate', 'new'])
+        self.assertEqual(analyzer._loaded_names, {'c.eid.local'})
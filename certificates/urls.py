@@ -10,10 +10,14 @@ urlpatterns = [
     
     # Liste et détail
     path('', views.CertificateListView.as_view(), name='list'),
+    path('export/', views.CertificateExportView.as_view(), name='export'),
     path('<int:pk>/', views.CertificateDetailView.as_view(), name='detail'),
     path('<int:pk>/edit/', views.CertificateUpdateView.as_view(), name='edit'),
     path('<int:pk>/delete/', views.CertificateDeleteView.as_view(), name='delete'),
     
+    # Recherche par nom d'hôte (CN + SAN, wildcards)
+    path('lookup/', views.HostnameLookupView.as_view(), name='lookup'),
+    
     # Import - Page de choix
     path('import/', views.ImportChoiceView.as_view(), name='import_choice'),
     
@@ -22,6 +26,7 @@ urlpatterns = [
     
     # Méthode 2: Import CSV
     path('import/csv/', views.CSVImportView.as_view(), name='import_csv'),
+    path('import/csv/<int:pk>/progress/', views.CSVImportProgressView.as_view(), name='import_csv_progress'),
     
     # Méthode 3: Scan domaine
     path('import/scan/', views.DomainScanView.as_view(), name='import_scan'),
@@ -1,13 +1,17 @@
 """
 Utilitaires pour la gestion des certificats
 """
+import asyncio
 import ssl
 import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from cryptography import x509
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes, serialization
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,11 +20,65 @@ logger = logging.getLogger(__name__)
 class CertificateScanner:
     """
     Scanner pour récupérer les certificats SSL/TLS depuis les serveurs
+    
+    Le timeout est une échéance par serveur (connexion + handshake).
+    Les scans multiples sont exécutés en parallèle par max_workers threads,
+    avec une échéance globale optionnelle (overall_timeout).
+    
+    Le temps cumulé passé en réseau (connexion + handshake) et en parsing
+    est accumulé dans self.timings.
     """
     
-    def __init__(self, timeout: int = 5, verify_ssl: bool = False):
+    DEFAULT_MAX_WORKERS = 10
+    DEFAULT_MAX_IN_FLIGHT = 500
+    
+    def __init__(self, timeout: int = 5, verify_ssl: bool = False,
+                 max_workers: int = DEFAULT_MAX_WORKERS, overall_timeout: Optional[float] = None):
         self.timeout = timeout
         self.verify_ssl = verify_ssl
+        self.max_workers = max(1, max_workers)
+        self.overall_timeout = overall_timeout
+        self._ssl_context = None
+        self.timings = {'network': 0.0, 'parse': 0.0}
+        self._timings_lock = threading.Lock()
+    
+    def _record_timing(self, phase: str, seconds: float):
+        """Ajoute une durée à la phase donnée (thread-safe)"""
+        with self._timings_lock:
+            self.timings[phase] += seconds
+    
+    def _parse_der(self, cert_bin: bytes, hostname: str) -> Dict:
+        """Charge un certificat DER et le parse, en mesurant la durée"""
+        started = time.monotonic()
+        try:
+            cert = x509.load_der_x509_certificate(cert_bin, default_backend())
+            return self.parse_certificate(cert, hostname)
+        except Exception as e:
+            # getpeercert() peut renvoyer None (TypeError): l'erreur reste propre au serveur
+            return {
+                'success': False,
+                'error': f'Erreur lors du parsing: {str(e)}'
+            }
+        finally:
+            self._record_timing('parse', time.monotonic() - started)
+    
+    def _create_ssl_context(self) -> ssl.SSLContext:
+        """
+        Crée le contexte SSL selon verify_ssl
+        
+        Le contexte est construit une seule fois par scanner et partagé entre
+        les scans (le chargement du magasin de CA coûte plusieurs ms).
+        """
+        if self._ssl_context is None:
+            context = ssl.create_default_context()
+            
+            if not self.verify_ssl:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            
+            self._ssl_context = context
+        
+        return self._ssl_context
     
     def scan_host(self, hostname: str, port: int = 443) -> Dict:
         """
@@ -33,22 +91,24 @@ class CertificateScanner:
         Returns:
             Dict avec les informations du certificat ou une erreur
         """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        
         try:
             # Créer le contexte SSL
-            context = ssl.create_default_context()
-            
-            if not self.verify_ssl:
-                context.check_hostname = False
-                context.verify_mode = ssl.CERT_NONE
+            context = self._create_ssl_context()
             
             # Se connecter au serveur
             with socket.create_connection((hostname, port), timeout=self.timeout) as sock:
+                # Le handshake ne dispose que du temps restant avant l'échéance
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout()
+                sock.settimeout(remaining)
+                
                 with context.wrap_socket(sock, server_hostname=hostname) as ssock:
                     # Récupérer le certificat
                     cert_bin = ssock.getpeercert(binary_form=True)
-                    cert = x509.load_der_x509_certificate(cert_bin, default_backend())
-                    
-                    return self.parse_certificate(cert, hostname)
                     
         except socket.timeout:
             return {
@@ -76,6 +136,131 @@ class CertificateScanner:
                 'success': False,
                 'error': f'Erreur inattendue: {str(e)}'
             }
+        finally:
+            self._record_timing('network', time.monotonic() - started)
+        
+        return self._parse_der(cert_bin, hostname)
+    
+    async def scan_host_async(self, hostname: str, port: int = 443,
+                              semaphore: Optional[asyncio.Semaphore] = None) -> Dict:
+        """
+        Variante asyncio de scan_host: même format de retour
+        
+        Args:
+            hostname: FQDN du serveur
+            port: Port SSL/TLS
+            semaphore: Limite optionnelle des handshakes en vol
+        """
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(1)
+        
+        async with semaphore:
+            started = time.monotonic()
+            writer = None
+            try:
+                context = self._create_ssl_context()
+                
+                # Échéance unique pour la résolution, la connexion et le handshake
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(
+                        hostname, port, ssl=context, server_hostname=hostname
+                    ),
+                    timeout=self.timeout
+                )
+                
+                ssl_object = writer.get_extra_info('ssl_object')
+                cert_bin = ssl_object.getpeercert(binary_form=True)
+                
+            except asyncio.TimeoutError:
+                return {
+                    'success': False,
+                    'error': f'Timeout: impossible de se connecter à {hostname}:{port} dans les {self.timeout}s'
+                }
+            except socket.gaierror:
+                return {
+                    'success': False,
+                    'error': f'Erreur DNS: impossible de résoudre {hostname}'
+                }
+            except ConnectionRefusedError:
+                return {
+                    'success': False,
+                    'error': f'Connexion refusée sur {hostname}:{port}. Le port est-il ouvert?'
+                }
+            except ssl.SSLError as e:
+                return {
+                    'success': False,
+                    'error': f'Erreur SSL: {str(e)}'
+                }
+            except Exception as e:
+                logger.exception(f"Erreur lors du scan de {hostname}:{port}")
+                return {
+                    'success': False,
+                    'error': f'Erreur inattendue: {str(e)}'
+                }
+            finally:
+                if writer is not None:
+                    writer.close()
+                self._record_timing('network', time.monotonic() - started)
+        
+        # Le parsing est fait hors du sémaphore pour libérer la place au plus tôt
+        return self._parse_der(cert_bin, hostname)
+    
+    async def _scan_targets_async(self, targets: List[Tuple[str, int]], max_in_flight: int,
+                                  progress_callback: Optional[Callable[[int, int], None]]) -> list:
+        semaphore = asyncio.Semaphore(max_in_flight)
+        total = len(targets)
+        done = 0
+        
+        async def scan_one(hostname, port):
+            nonlocal done
+            result = await self.scan_host_async(hostname, port, semaphore)
+            result['hostname'] = hostname
+            done += 1
+            if progress_callback:
+                progress_callback(done, total)
+            return result
+        
+        results = await asyncio.gather(
+            *(scan_one(hostname, port) for hostname, port in targets),
+            return_exceptions=True
+        )
+        
+        # Une exception imprévue ne doit pas interrompre tout le scan
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                hostname, port = targets[index]
+                logger.error(f"Erreur lors du scan de {hostname}:{port}: {result}")
+                results[index] = {
+                    'success': False,
+                    'error': f'Erreur inattendue: {str(result)}',
+                    'hostname': hostname,
+                }
+        return results
+    
+    def scan_targets_async(self, targets: List[Tuple[str, int]],
+                           max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                           progress_callback: Optional[Callable[[int, int], None]] = None) -> list:
+        """
+        Scanne une liste de couples (hostname, port) avec asyncio
+        
+        Permet plusieurs milliers de connexions dans une même boucle d'événements,
+        le nombre de handshakes simultanés étant borné par max_in_flight.
+        
+        Args:
+            targets: Liste de (hostname, port)
+            max_in_flight: Nombre maximal de handshakes en vol
+            progress_callback: Appelé avec (terminés, total) après chaque serveur
+        
+        Returns:
+            Liste de dicts au format de scan_host (même ordre que targets),
+            chacun complété par la clé 'hostname'
+        """
+        if not targets:
+            return []
+        
+        return asyncio.run(
+            self._scan_targets_async(targets, max(1, max_in_flight), progress_callback)
+        )
     
     def parse_certificate(self, cert: x509.Certificate, hostname: str = None) -> Dict:
         """
@@ -194,18 +379,54 @@ class CertificateScanner:
     
     def scan_multiple_hosts(self, hostnames: list, port: int = 443) -> list:
         """
-        Scanne plusieurs serveurs
+        Scanne plusieurs serveurs en parallèle
         
         Args:
             hostnames: Liste de FQDNs
             port: Port SSL/TLS
         
         Returns:
-            Liste de dicts avec les résultats
+            Liste de dicts avec les résultats (même ordre que hostnames)
+        """
+        return self.scan_targets([(hostname, port) for hostname in hostnames])
+    
+    def scan_targets(self, targets: List[Tuple[str, int]]) -> list:
+        """
+        Scanne une liste de couples (hostname, port) avec un pool de threads
+        
+        Chaque serveur dispose de self.timeout secondes. Si overall_timeout est
+        défini, les serveurs non terminés à l'échéance globale sont renvoyés
+        en erreur de timeout sans bloquer l'appelant.
+        
+        Returns:
+            Liste de dicts avec les résultats (même ordre que targets),
+            chacun complété par la clé 'hostname'
         """
+        if not targets:
+            return []
+        
+        workers = min(self.max_workers, len(targets))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cert-scan')
+        
+        try:
+            futures = [
+                executor.submit(self.scan_host, hostname, port)
+                for hostname, port in targets
+            ]
+            wait(futures, timeout=self.overall_timeout)
+        finally:
+            # Ne pas attendre les scans encore en vol au-delà de l'échéance globale
+            executor.shutdown(wait=False, cancel_futures=True)
+        
         results = []
-        for hostname in hostnames:
-            result = self.scan_host(hostname, port)
+        for (hostname, port), future in zip(targets, futures):
+            if future.done() and not future.cancelled():
+                result = future.result()
+            else:
+                result = {
+                    'success': False,
+                    'error': f'Timeout global: scan de {hostname}:{port} non terminé dans les {self.overall_timeout}s'
+                }
             result['hostname'] = hostname
             results.append(result)
         return results
@@ -1,12 +1,19 @@
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.urls import reverse_lazy
-from django.db.models import Q
+from django.urls import reverse, reverse_lazy
+from django.core.paginator import Paginator
 from django.utils import timezone
 
-from .models import Certificate
+from .models import Certificate, ImportBatch
+from .san import find_covering_certificates, find_names_under
+from .exporter import EXPORT_FORMATS, get_export_rows, iter_export
+from .filters import filter_certificates
+from .pagination import KEYSET_ORDERING, decode_cursor, encode_cursor, filter_after_cursor
+from .stats import get_certificate_stats
 from .forms import ManualCertificateForm, CSVImportForm, DomainScanForm, BulkScanForm
 from .utils import CertificateScanner
 
@@ -16,97 +23,91 @@ class CertificateListView(LoginRequiredMixin, ListView):
     template_name = 'certificates/certificate_list.html'
     context_object_name = 'certificates'
     paginate_by = 20
+    max_paginate_by = 100
+    
+    # Colonnes lourdes non affichées dans la liste
+    deferred_fields = ['pem_data', 'san_list', 'tags', 'notes', 'scan_error']
     
     def get_paginate_by(self, queryset):
-        """Gérer le nombre d'éléments par page"""
-        return self.request.GET.get('per_page', self.paginate_by)
+        """Gérer le nombre d'éléments par page (borné à max_paginate_by)"""
+        try:
+            per_page = int(self.request.GET.get('per_page', self.paginate_by))
+        except (TypeError, ValueError):
+            per_page = self.paginate_by
+        return max(1, min(per_page, self.max_paginate_by))
+    
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Pagination par curseur (keyset) sur (valid_until, common_name, id)
+        
+        Les liens ?page=N existants et la recherche gardent la pagination OFFSET.
+        """
+        # Résultats classés par pertinence: l'ordre keyset ne s'applique pas
+        if self.request.GET.get('page') or self.request.GET.get('search', '').strip():
+            return super().paginate_queryset(queryset, page_size)
+        
+        cursor = decode_cursor(self.request.GET.get('cursor'))
+        if cursor:
+            queryset = filter_after_cursor(queryset, cursor)
+        
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        certificates = list(queryset[:page_size + 1])
+        has_next = len(certificates) > page_size
+        certificates = certificates[:page_size]
+        
+        self.next_cursor = encode_cursor(certificates[-1]) if has_next else None
+        self.is_first_page = cursor is None
+        return (None, None, certificates, has_next or not self.is_first_page)
     
     def get_queryset(self):
         # Exclure les certificats archivés par défaut
-        queryset = Certificate.objects.filter(archived=False)
-        
-        # Filtre par statut
-        status = self.request.GET.get('status')
-        if status:
-            queryset = queryset.filter(status=status)
-        
-        # Filtre par environnement
-        environment = self.request.GET.get('environment')
-        if environment:
-            queryset = queryset.filter(environment=environment)
-        
-        # Filtre par émetteur
-        issuer = self.request.GET.get('issuer')
-        if issuer:
-            queryset = queryset.filter(issuer__icontains=issuer)
-        
-        # Filtre par jours restants (utilise le champ DB pour performance)
-        days = self.request.GET.get('days')
-        if days:
-            try:
-                if days == 'expired':
-                    queryset = queryset.filter(days_remaining__lt=0)
-                elif days == 'critical':
-                    queryset = queryset.filter(days_remaining__gte=0, days_remaining__lte=7)
-                elif days == 'warning':
-                    queryset = queryset.filter(days_remaining__gt=7, days_remaining__lte=30)
-                elif days == 'safe':
-                    queryset = queryset.filter(days_remaining__gt=30)
-                else:
-                    days_int = int(days)
-                    queryset = queryset.filter(days_remaining=days_int)
-            except ValueError:
-                pass
-        
-        # Filtre par date d'expiration
-        expiration_date = self.request.GET.get('expiration_date')
-        if expiration_date:
-            try:
-                from datetime import datetime
-                date_obj = datetime.strptime(expiration_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(valid_until=date_obj)
-            except ValueError:
-                pass
-        
-        # Filtre par période d'expiration
-        expiration_period = self.request.GET.get('expiration_period')
-        if expiration_period:
-            today = timezone.now().date()
-            if expiration_period == 'today':
-                queryset = queryset.filter(valid_until=today)
-            elif expiration_period == 'week':
-                from datetime import timedelta
-                week_end = today + timedelta(days=7)
-                queryset = queryset.filter(valid_until__range=[today, week_end])
-            elif expiration_period == 'month':
-                from datetime import timedelta
-                month_end = today + timedelta(days=30)
-                queryset = queryset.filter(valid_until__range=[today, month_end])
-            elif expiration_period == 'quarter':
-                from datetime import timedelta
-                quarter_end = today + timedelta(days=90)
-                queryset = queryset.filter(valid_until__range=[today, quarter_end])
-        
-        # Recherche générale
-        search = self.request.GET.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(common_name__icontains=search) | Q(issuer__icontains=search) | Q(template_name__icontains=search)
-            )
+        queryset = Certificate.objects.filter(archived=False).defer(
+            *self.deferred_fields
+        ).order_by(*KEYSET_ORDERING)
         
-        return queryset
+        return filter_certificates(queryset, self.request.GET)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['stats'] = {
-            'total': Certificate.objects.count(),
-            'active': Certificate.objects.filter(status='active').count(),
-            'expiring_soon': Certificate.objects.filter(status='expiring_soon').count(),
-            'expired': Certificate.objects.filter(status='expired').count(),
-        }
+        context['stats'] = get_certificate_stats()
+        
+        # Filtres courants, conservés par les liens de pagination
+        query = self.request.GET.copy()
+        query.pop('page', None)
+        query.pop('cursor', None)
+        context['pagination_query'] = query.urlencode()
+        context['next_cursor'] = getattr(self, 'next_cursor', None)
+        context['is_first_page'] = getattr(self, 'is_first_page', True)
         return context
 
 
+class CertificateExportView(LoginRequiredMixin, View):
+    """
+    Export en flux (CSV ou JSON) des certificats, avec les filtres de la liste
+    
+    ?format=csv (défaut, réimportable via l'import CSV) ou ?format=json
+    """
+    
+    content_types = {
+        'csv': 'text/csv; charset=utf-8',
+        'json': 'application/json',
+    }
+    
+    def get(self, request):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            export_format = 'csv'
+        
+        rows = get_export_rows(request.GET, include_archived=request.GET.get('archived') == 'all')
+        response = StreamingHttpResponse(
+            iter_export(export_format, rows),
+            content_type=self.content_types[export_format],
+        )
+        filename = f"certificats_{timezone.now():%Y%m%d_%H%M}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
 class CertificateDetailView(LoginRequiredMixin, DetailView):
     model = Certificate
     template_name = 'certificates/certificate_detail.html'
@@ -130,6 +131,34 @@ class CSVImportView(LoginRequiredMixin, FormView):
     form_class = CSVImportForm
     success_url = reverse_lazy('certificates:list')
     
+    # Lignes de staging insérées par requête et affichées par page d'aperçu
+    staging_chunk_size = 1000
+    preview_paginate_by = 100
+    
+    # Au-delà de cette taille, analyse et application passent par Celery
+    # (évite de bloquer un worker gunicorn pendant l'import)
+    async_threshold = 512 * 1024
+    
+    def get(self, request, *args, **kwargs):
+        # Suivi ou aperçu paginé d'un lot
+        if request.GET.get('batch'):
+            batch = self.get_batch(request.GET.get('batch'), statuses=None)
+            if batch is None or (batch.status == 'applied' and not batch.is_async):
+                messages.error(request, 'Import introuvable ou déjà appliqué. Veuillez recommencer l\'upload.')
+                return redirect('certificates:import_csv')
+            
+            if batch.is_running:
+                return self.render_to_response(
+                    self.get_context_data(batch=batch, progress=batch.progress(), progress_mode=True)
+                )
+            if batch.status == 'failed':
+                messages.error(request, f'❌ Import échoué: {batch.error}')
+                return redirect('certificates:import_csv')
+            if batch.status == 'applied':
+                return self.report_result(batch.result)
+            return self.render_preview(batch)
+        return super().get(request, *args, **kwargs)
+    
     def post(self, request, *args, **kwargs):
         # Si c'est une confirmation, ne pas valider le formulaire (pas de fichier)
         if 'confirm' in request.POST:
@@ -137,96 +166,54 @@ class CSVImportView(LoginRequiredMixin, FormView):
         # Sinon, traiter normalement (preview)
         return super().post(request, *args, **kwargs)
     
+    def get_batch(self, batch_id, statuses=('pending',)):
+        """Lot appartenant à l'utilisateur courant (par défaut: en attente)"""
+        batches = ImportBatch.objects.filter(created_by=self.request.user)
+        if statuses:
+            batches = batches.filter(status__in=statuses)
+        try:
+            return batches.get(pk=int(batch_id))
+        except (ImportBatch.DoesNotExist, TypeError, ValueError):
+            return None
+    
+    def get_batch_url(self, batch):
+        return f"{reverse('certificates:import_csv')}?batch={batch.pk}"
+    
     def handle_confirmation(self):
-        """Gérer la confirmation de l'import depuis la session avec gestion intelligente"""
-        from datetime import datetime
-        from django.utils import timezone as django_timezone
-        from django.db import transaction
+        """Appliquer un lot d'import analysé (requêtes ensemblistes sur la table de staging)"""
+        from .tasks import apply_import_batch
         
-        analysis_results = self.request.session.get('csv_analysis_results', [])
+        batch = self.get_batch(self.request.POST.get('batch_id'))
         
-        if not analysis_results:
+        if batch is None:
             messages.error(self.request, 'Aucune donnée à importer. Veuillez recommencer l\'upload.')
             return redirect('certificates:import_csv')
         
-        created_count, updated_count, ignored_count, archived_count, error_count = 0, 0, 0, 0, 0
+        # Un seul envoi du formulaire applique le lot (double clic, rechargement)
+        if not batch.claim_for_apply():
+            messages.warning(self.request, '⚠️ Ce lot est déjà en cours d\'application.')
+            return redirect(self.get_batch_url(batch))
         
-        # Utiliser une transaction atomique
-        with transaction.atomic():
-            for result in analysis_results:
-                action = result.get('action')
-                csv_data = result.get('csv_data', {})
-                existing_cert = result.get('existing_cert')
-                
-                # Ignorer les erreurs et doublons
-                if action == 'error':
-                    error_count += 1
-                    continue
-                
-                if action == 'duplicate':
-                    ignored_count += 1
-                    continue
-                
-                try:
-                    # Reconvertir la date ISO string en date
-                    valid_until = csv_data.get('valid_until')
-                    if valid_until and isinstance(valid_until, str):
-                        naive_dt = datetime.fromisoformat(valid_until)
-                        valid_until = naive_dt.date()
-                    
-                    # Préparer les données du certificat
-                    cert_defaults = {
-                        'issuer': csv_data.get('issuer', ''),
-                        'valid_until': valid_until,
-                        'key_usage': csv_data.get('key_usage'),
-                        'friendly_name': csv_data.get('friendly_name'),
-                        'template_name': csv_data.get('template_name'),
-                        'environment': csv_data.get('environment'),
-                        'import_method': 'csv',
-                        'needs_enrichment': self.request.session.get('csv_auto_enrich', False),
-                        'created_by': self.request.user if self.request.user.is_authenticated else None,
-                    }
-                    
-                    # Action: NOUVEAU - créer directement
-                    if action == 'new':
-                        Certificate.objects.create(
-                            common_name=csv_data['common_name'],
-                            **cert_defaults
-                        )
-                        created_count += 1
-                    
-                    # Action: MISE À JOUR - archiver l'ancien, créer le nouveau
-                    elif action == 'update':
-                        if existing_cert and existing_cert.get('id'):
-                            # Archiver l'ancien certificat
-                            old_cert = Certificate.objects.get(id=existing_cert['id'])
-                            old_cert.archived = True
-                            old_cert.archived_at = django_timezone.now()
-                            old_cert.archived_reason = f"Remplacé par certificat plus récent (exp: {valid_until.strftime('%d/%m/%Y')})"
-                            old_cert.save()
-                            archived_count += 1
-                        
-                        # Créer le nouveau certificat
-                        Certificate.objects.create(
-                            common_name=csv_data['common_name'],
-                            **cert_defaults
-                        )
-                        updated_count += 1
-                    
-                    # Action: CONFLIT - pour l'instant, ignorer (peut être amélioré)
-                    elif action == 'conflict':
-                        # Option future: laisser l'utilisateur décider
-                        # Pour l'instant, on ignore les versions antérieures
-                        ignored_count += 1
-                        
-                except Exception as e:
-                    error_count += 1
-                    print(f"Erreur import CSV - {csv_data.get('common_name', 'Unknown')}: {str(e)}")
+        # Gros lot: application en arrière-plan, suivie par la page de progression
+        if batch.is_async:
+            self.enqueue(apply_import_batch, batch)
+            return redirect(self.get_batch_url(batch))
         
-        # Nettoyer la session
-        for key in ['csv_analysis_results', 'csv_analysis_summary', 'csv_auto_enrich']:
-            if key in self.request.session:
-                del self.request.session[key]
+        try:
+            counts = batch.apply()
+        except Exception as e:
+            messages.error(self.request, f'❌ Import échoué: {str(e)}')
+            return redirect('certificates:import_csv')
+        
+        return self.report_result(counts)
+    
+    def report_result(self, counts):
+        """Message de fin d'import selon les compteurs de ImportBatch.apply()"""
+        created_count = counts.get('created', 0)
+        updated_count = counts.get('updated', 0)
+        archived_count = counts.get('archived', 0)
+        ignored_count = counts.get('ignored', 0)
+        error_count = counts.get('errors', 0)
         
         # Messages selon le résultat
         message_parts = []
@@ -250,56 +237,151 @@ class CSVImportView(LoginRequiredMixin, FormView):
         
         return redirect(self.success_url)
     
+    def enqueue(self, task, batch):
+        """
+        Lance la tâche Celery du lot
+        Si le broker est indisponible, la tâche est exécutée dans la requête.
+        """
+        try:
+            task.delay(batch.pk)
+        except Exception:
+            task(batch.pk)
+    
     def form_valid(self, form):
         # Gérer uniquement le preview ici
-        from .csv_analyzer import CSVAnalyzer
+        from .tasks import analyze_import_batch
+        
+        # Un seul lot en attente par utilisateur
+        for old_batch in ImportBatch.objects.filter(created_by=self.request.user, status='pending'):
+            old_batch.csv_file.delete(save=False)
+            old_batch.delete()
         
-        certificates_data = form.parse_csv()
+        csv_file = form.cleaned_data['csv_file']
+        batch = ImportBatch(
+            auto_enrich=form.cleaned_data.get('auto_enrich', False),
+            created_by=self.request.user
+        )
         
-        # Analyser les certificats avec détection intelligente
-        analyzer = CSVAnalyzer()
-        analysis_result = analyzer.analyze_batch(certificates_data)
+        # Gros fichier: stocké puis analysé par Celery, la page suit la progression
+        if csv_file.size > self.async_threshold:
+            batch.is_async = True
+            batch.status = 'queued'
+            batch.options = {
+                'skip_header': form.cleaned_data['skip_header'],
+                'delimiter': form.cleaned_data['delimiter'],
+                'default_environment': form.cleaned_data.get('default_environment') or None,
+            }
+            batch.total_rows = self.estimate_rows(csv_file, form.cleaned_data['skip_header'])
+            batch.csv_file.save(csv_file.name, csv_file, save=False)
+            batch.save()
+            self.enqueue(analyze_import_batch, batch)
+            return redirect(self.get_batch_url(batch))
         
-        # Convertir les dates en chaînes pour la sérialisation JSON
-        serializable_results = []
-        for result in analysis_result['results']:
-            serializable_result = result.copy()
-            
-            # Convertir les dates du CSV
-            if 'csv_data' in serializable_result and serializable_result['csv_data']:
-                csv_copy = serializable_result['csv_data'].copy()
-                if 'valid_until' in csv_copy and csv_copy['valid_until']:
-                    csv_copy['valid_until'] = csv_copy['valid_until'].isoformat()
-                serializable_result['csv_data'] = csv_copy
-            
-            # Convertir les dates du certificat existant
-            if 'existing_cert' in serializable_result and serializable_result['existing_cert']:
-                existing_copy = serializable_result['existing_cert'].copy()
-                if 'valid_until' in existing_copy and existing_copy['valid_until']:
-                    existing_copy['valid_until'] = existing_copy['valid_until'].isoformat()
-                if 'created_at' in existing_copy and existing_copy['created_at']:
-                    existing_copy['created_at'] = existing_copy['created_at'].isoformat()
-                serializable_result['existing_cert'] = existing_copy
-            
-            serializable_results.append(serializable_result)
+        # Analyser les certificats avec détection intelligente, en flux:
+        # les lignes du fichier passent du parseur à l'analyseur puis à la
+        # table de staging par insertions groupées
+        batch.save()
+        batch.stage(form.iter_csv_rows(), self.staging_chunk_size)
         
-        # Stocker en session pour la confirmation
-        self.request.session['csv_analysis_results'] = serializable_results
-        self.request.session['csv_analysis_summary'] = analysis_result['summary']
-        self.request.session['csv_auto_enrich'] = form.cleaned_data.get('auto_enrich', False)
+        # Redirection vers l'aperçu paginé (évite de renvoyer le fichier)
+        return redirect(self.get_batch_url(batch))
+    
+    @staticmethod
+    def estimate_rows(csv_file, skip_header):
+        """Nombre de lignes du fichier (sert d'estimation pour la progression)"""
+        total = 0
+        last_chunk = b''
+        for chunk in csv_file.chunks():
+            total += chunk.count(b'\n')
+            last_chunk = chunk
+        if last_chunk and not last_chunk.endswith(b'\n'):
+            total += 1
+        csv_file.seek(0)
+        return max(total - (1 if skip_header else 0), 0)
+    
+    def render_preview(self, batch):
+        """Aperçu paginé d'un lot, lu depuis la table de staging"""
+        paginator = Paginator(
+            batch.rows.order_by('line_number'),
+            self.preview_paginate_by
+        )
+        page_obj = paginator.get_page(self.request.GET.get('page'))
         
-        # Créer le contexte avec l'analyse
         context = self.get_context_data(
-            form=form,
-            analysis_results=analysis_result['results'],
-            analysis_summary=analysis_result['summary'],
-            analyzer=analyzer,
-            preview_mode=True
+            batch=batch,
+            analysis_rows=page_obj.object_list,
+            analysis_summary=batch.summary,
+            page_obj=page_obj,
+            is_paginated=page_obj.has_other_pages(),
+            preview_mode=True,
         )
-        
         return self.render_to_response(context)
 
 
+class CSVImportProgressView(LoginRequiredMixin, View):
+    """Suivi JSON d'un import CSV en arrière-plan (interrogé par la page de progression)"""
+    
+    def get(self, request, pk):
+        batch = get_object_or_404(
+            ImportBatch.objects.defer('summary', 'result'),
+            pk=pk,
+            created_by=request.user
+        )
+        return JsonResponse(batch.progress())
+
+
+class HostnameLookupView(LoginRequiredMixin, View):
+    """
+    Certificats couvrant un nom d'hôte (CN ou SAN, exact ou wildcard), en JSON
+    
+    ?hostname=api.eid.local      -> certificats qui couvrent ce nom
+    ?domain=eid.local            -> certificats dont un nom est sous ce domaine
+    &include_archived=1          -> inclure les certificats archivés
+    """
+    
+    max_results = 200
+    
+    def get(self, request):
+        include_archived = request.GET.get('include_archived') in ('1', 'true')
+        hostname = request.GET.get('hostname', '').strip()
+        domain = request.GET.get('domain', '').strip()
+        
+        if hostname:
+            entries = find_covering_certificates(hostname, include_archived=include_archived)
+        elif domain:
+            entries = find_names_under(domain, include_archived=include_archived)
+        else:
+            return JsonResponse({'error': 'Paramètre hostname ou domain requis'}, status=400)
+        
+        if entries is None:
+            return JsonResponse({'error': 'Nom d\'hôte invalide'}, status=400)
+        
+        # Un certificat peut correspondre par plusieurs noms: une seule ligne par certificat
+        results = {}
+        for entry in entries.defer('certificate__pem_data')[:self.max_results]:
+            cert = entry.certificate
+            result = results.get(cert.pk)
+            if result is None:
+                result = results[cert.pk] = {
+                    'id': cert.pk,
+                    'common_name': cert.common_name,
+                    'matched_names': [],
+                    'valid_until': cert.valid_until.isoformat(),
+                    'days_remaining': cert.days_remaining,
+                    'status': cert.status,
+                    'environment': cert.environment,
+                    'archived': cert.archived,
+                    'url': reverse('certificates:detail', args=[cert.pk]),
+                }
+            result['matched_names'].append(entry.name)
+        
+        return JsonResponse({
+            'query': hostname or domain,
+            'count': len(results),
+            'results': list(results.values()),
+        })
+
+
 class DomainScanView(LoginRequiredMixin, FormView):
     template_name = 'certificates/certificate_scan_domain.html'
     form_class = DomainScanForm
@@ -364,8 +446,15 @@ class BulkScanView(LoginRequiredMixin, FormView):
     form_class = BulkScanForm
     success_url = reverse_lazy('certificates:list')
     
+    # Échéance globale du scan pour ne pas bloquer un worker gunicorn
+    scan_overall_timeout = 30
+    
     def form_valid(self, form):
-        scanner = CertificateScanner(timeout=5, verify_ssl=False)
+        scanner = CertificateScanner(
+            timeout=5,
+            verify_ssl=False,
+            overall_timeout=self.scan_overall_timeout
+        )
         results = scanner.scan_multiple_hosts(
             form.cleaned_data['hostnames'],
             form.cleaned_data['port']
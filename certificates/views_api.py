@@ -0,0 +1,208 @@
+"""
+API REST des certificats
+
+- Pagination par curseur (keyset), mêmes filtres que la liste HTML
+- ?fields= pour ne lire et ne rendre que les colonnes demandées
+- ETag / If-None-Match (304) et If-Match (412) pour les écritures concurrentes
+- POST bulk/: import groupé avec la sémantique de l'import CSV
+  (nouveau / mise à jour / doublon / conflit)
+"""
+import hashlib
+
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .csv_analyzer import CSVAnalyzer
+from .filters import filter_certificates
+from .models import Certificate, ImportBatch, ImportRow
+from .pagination import KEYSET_ORDERING, CertificateCursorPagination
+from .serializers import (
+    CertificateBulkItemSerializer,
+    CertificateDetailSerializer,
+    CertificateSerializer,
+    parse_fields_param,
+)
+from .stats import get_certificates_version, get_refresh_marker
+
+
+def _etag(*parts) -> str:
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def certificate_list_etag(request, *args, **kwargs):
+    """
+    ETag de la liste: version globale (en cache) + URL complète (filtres, curseur, fields)
+    
+    La version inclut le marqueur du recalcul des jours restants; la date du
+    jour reste incluse si ce recalcul n'a pas encore eu lieu.
+    """
+    return _etag(
+        get_certificates_version(include_archived=True),
+        timezone.now().date(),
+        request.get_full_path(),
+    )
+
+
+def certificate_detail_etag(request, pk=None, *args, **kwargs):
+    """
+    ETag d'un certificat: une requête sur updated_at (None si inexistant)
+    
+    Le marqueur de rafraîchissement couvre le recalcul nocturne des jours
+    restants, qui ne modifie pas updated_at.
+    """
+    updated_at = Certificate.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return _etag(
+        pk,
+        updated_at.isoformat(),
+        get_refresh_marker(),
+        timezone.now().date(),
+        request.GET.get('fields', ''),
+    )
+
+
+@method_decorator(condition(etag_func=certificate_list_etag), name='list')
+@method_decorator(condition(etag_func=certificate_detail_etag), name='retrieve')
+@method_decorator(condition(etag_func=certificate_detail_etag), name='update')
+@method_decorator(condition(etag_func=certificate_detail_etag), name='partial_update')
+@method_decorator(condition(etag_func=certificate_detail_etag), name='destroy')
+class CertificateViewSet(viewsets.ModelViewSet):
+    """
+    Certificats: GET liste/détail, POST, PUT/PATCH, DELETE
+    
+    Filtres de liste: status, environment, issuer, days, expiration_date,
+    expiration_period, search (comme la liste HTML) et archived=true|all
+    (par défaut, seuls les certificats non archivés sont listés).
+    """
+    
+    permission_classes = [IsAuthenticated]
+    pagination_class = CertificateCursorPagination
+    
+    # Taille maximale d'un lot POST bulk/
+    max_bulk_items = 5000
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CertificateSerializer
+        return CertificateDetailSerializer
+    
+    def get_queryset(self):
+        queryset = Certificate.objects.all()
+        
+        if self.action != 'list':
+            return queryset
+        
+        archived = self.request.query_params.get('archived')
+        if archived == 'true':
+            queryset = queryset.filter(archived=True)
+        elif archived != 'all':
+            queryset = queryset.filter(archived=False)
+        
+        queryset = filter_certificates(queryset, self.request.query_params)
+        
+        # Ne lire que les colonnes rendues (plus les colonnes du curseur)
+        requested = parse_fields_param(self.request.query_params.get('fields'))
+        if requested:
+            model_fields = {field.name for field in Certificate._meta.concrete_fields}
+            columns = (requested & model_fields) | set(KEYSET_ORDERING)
+            if 'environment_display' in requested:
+                columns.add('environment')
+            queryset = queryset.only(*columns)
+        
+        return queryset.order_by(*KEYSET_ORDERING)
+    
+    def perform_create(self, serializer):
+        serializer.save(import_method='manual', created_by=self.request.user)
+    
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Import groupé: liste d'objets {common_name, issuer, valid_until, ...}
+        
+        Chaque ligne est analysée comme une ligne CSV: les nouveaux certificats
+        sont créés, une date plus récente archive l'ancienne version, les doublons
+        et conflits sont ignorés. ?dry_run=1 analyse sans rien enregistrer.
+        """
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get('certificates')
+        if not isinstance(items, list):
+            raise ValidationError({'certificates': 'Une liste de certificats est attendue'})
+        if len(items) > self.max_bulk_items:
+            raise ValidationError({
+                'certificates': f'Au plus {self.max_bulk_items} certificats par requête ({len(items)} reçus)'
+            })
+        
+        errors = []
+        conflicts = []
+        rows = self.iter_bulk_rows(items, errors)
+        
+        dry_run = request.query_params.get('dry_run') in ('1', 'true')
+        if dry_run:
+            analyzer = CSVAnalyzer()
+            summary = analyzer.empty_summary()
+            for result in analyzer.iter_analysis(rows, summary):
+                if result['action'] == CSVAnalyzer.ACTION_CONFLICT:
+                    conflicts.append({
+                        'index': result['csv_data']['line_number'],
+                        'common_name': result['csv_data']['common_name'],
+                        'reason': result['reason'],
+                    })
+            counts = None
+        else:
+            # Même chemin que l'import CSV: table de staging puis application ensembliste
+            batch = ImportBatch.objects.create(created_by=request.user)
+            summary = batch.stage(rows)
+            conflicts = [
+                {'index': line_number, 'common_name': common_name, 'reason': reason}
+                for line_number, common_name, reason in batch.rows.filter(
+                    action=ImportRow.ACTION_CONFLICT
+                ).order_by('line_number').values_list('line_number', 'common_name', 'reason')
+            ]
+            batch.claim_for_apply()
+            counts = batch.apply(import_method='api')
+        
+        return Response({
+            'dry_run': dry_run,
+            'summary': summary,
+            'counts': counts,
+            'errors': errors,
+            'conflicts': conflicts,
+        }, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+    
+    def iter_bulk_rows(self, items, errors):
+        """
+        Lignes au format de CSVImportForm.iter_csv_rows() (index dans line_number)
+        Les erreurs de validation détaillées sont ajoutées à errors.
+        """
+        item_serializer = CertificateBulkItemSerializer()
+        
+        for index, item in enumerate(items):
+            try:
+                data = item_serializer.run_validation(item)
+            except ValidationError as e:
+                errors.append({'index': index, 'errors': e.detail})
+                yield {
+                    'error': f'Élément {index}: données invalides',
+                    'line_number': index,
+                    'raw_data': item,
+                }
+                continue
+            
+            yield {
+                'common_name': data['common_name'].strip(),
+                'issuer': data['issuer'].strip(),
+                'valid_until': data['valid_until'],
+                'key_usage': data.get('key_usage') or None,
+                'friendly_name': data.get('friendly_name') or None,
+                'template_name': data.get('template_name') or None,
+                'environment': data.get('environment') or None,
+                'line_number': index,
+            }
@@ -3,7 +3,7 @@ from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
 
-from .models import Certificate
+from .stats import get_certificate_stats
 from notifications.models import NotificationRule
 
 
@@ -15,18 +15,11 @@ class HomeView(TemplateView):
         context = super().get_context_data(**kwargs)
         
         # Statistiques globales (publiques, sans détails)
-        total = Certificate.objects.count()
-        
-        context['stats'] = {
-            'total': total,
-            'active': Certificate.objects.filter(status='active').count(),
-            'expiring_soon': Certificate.objects.filter(status='expiring_soon').count(),
-            'expired': Certificate.objects.filter(status='expired').count(),
-        }
+        context['stats'] = get_certificate_stats()
         
         # Informations système
         context['active_rules'] = NotificationRule.objects.filter(is_active=True).count()
-        context['has_certificates'] = total > 0
+        context['has_certificates'] = context['stats']['total'] > 0
         
         return context
 
@@ -117,6 +117,22 @@ else:
         }
     }
 
+# Cache: Redis si disponible (Docker, partagé entre gunicorn et Celery),
+# sinon cache mémoire local (dev)
+if os.getenv('REDIS_CACHE_URL'):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv('REDIS_CACHE_URL'),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -173,6 +189,8 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 20,
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.SessionAuthentication",
+        # Intégrations (scripts, synchronisation): jeton obtenu via /api/token/
+        "rest_framework_simplejwt.authentication.JWTAuthentication",
     ],
 }
 
@@ -183,6 +201,21 @@ EMAIL_USE_LOCALTIME = False
 # Backend email par défaut (décommentez pour tester en console)
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Rétention du journal des notifications (jours); les compteurs quotidiens sont conservés
+NOTIFICATION_LOG_RETENTION_DAYS = int(os.getenv('NOTIFICATION_LOG_RETENTION_DAYS', '180'))
+
+# Webhooks: délai par requête (s), envois simultanés, tentatives par envoi
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', '10'))
+WEBHOOK_MAX_WORKERS = int(os.getenv('WEBHOOK_MAX_WORKERS', '8'))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '3'))
+
+# File d'attente des emails: messages par lot, débit maximal (messages/s, 0 = illimité),
+# tentatives par message et délai de base entre deux tentatives (s, doublé à chaque échec)
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_RATE_LIMIT = float(os.getenv('OUTBOX_RATE_LIMIT', '5'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_RETRY_BACKOFF = int(os.getenv('OUTBOX_RETRY_BACKOFF', '60'))
+
 # Celery Configuration
 CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_RESULT_BACKEND = "redis://localhost:6379/0"
@@ -36,4 +36,7 @@ urlpatterns = [
     path("certificates/", include("certificates.urls")),
     path("notifications/", include("notifications.urls")),
     path("dashboard/", include("dashboard.urls")),
+    
+    # API REST
+    path("api/", include("certificates.api_urls")),
 ]
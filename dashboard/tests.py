@@ -1,3 +1,43 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from certificates.models import Certificate
+
 
-# Create your tests here.
+class WallFeedETagTests(TestCase):
+    """L'ETag du flux mural suit le recalcul des jours restants"""
+    
+    def setUp(self):
+        cache.clear()
+        self.certificate = Certificate.objects.create(
+            common_name='wall.eid.local',
+            valid_until=timezone.now().date() + timedelta(days=90),
+        )
+        self.url = reverse('dashboard:wall_feed')
+    
+    def get_feed(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(self.url, **headers)
+    
+    def test_unchanged_feed_is_not_modified(self):
+        etag = self.get_feed()['ETag']
+        self.assertEqual(self.get_feed(etag).status_code, 304)
+    
+    def test_days_refresh_changes_etag(self):
+        etag = self.get_feed()['ETag']
+        
+        # Le lendemain: days_remaining change, pas le statut ni updated_at
+        updated = Certificate.refresh_days_remaining(
+            today=timezone.now().date() + timedelta(days=1)
+        )
+        self.assertEqual(updated, 1)
+        
+        response = self.get_feed(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        [row] = response.json()['certificates']
+        self.assertEqual(row['days'], 89)
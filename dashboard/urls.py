@@ -5,5 +5,6 @@ app_name = 'dashboard'
 
 urlpatterns = [
     path('wall/', views.WallDashboardView.as_view(), name='wall_display'),
+    path('wall/feed/', views.WallFeedView.as_view(), name='wall_feed'),
 ]
 
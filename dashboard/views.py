@@ -1,10 +1,80 @@
+import hashlib
+from collections import Counter, namedtuple
+
 from django.shortcuts import render
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.http import condition
 from django.views.generic import TemplateView
 from certificates.models import Certificate
-from django.db.models import Count, Q
+from certificates.stats import get_certificate_stats, get_certificates_version
+from django.db.models import F
 from django.utils import timezone
 
 
+def wall_feed_etag(request, *args, **kwargs):
+    """
+    ETag du flux mural: version des certificats (dont le marqueur du recalcul
+    des jours restants, qui ne touche pas updated_at) + date du jour
+    Calculé depuis le cache des statistiques: aucune requête si rien n'a changé.
+    """
+    version = f'{get_certificates_version()}|{timezone.now().date().isoformat()}'
+    return hashlib.md5(version.encode()).hexdigest()
+
+
+def wall_bucket(days_remaining):
+    """Carte du mur où s'affiche un certificat"""
+    if days_remaining < 0:
+        return 'expired'
+    if days_remaining <= 7:
+        return 'critical'
+    if days_remaining <= 30:
+        return 'warning'
+    return 'active'
+
+
+# Ligne légère du mur: uniquement les colonnes affichées (pas de pem_data, san_list, notes...)
+WallRow = namedtuple('WallRow', [
+    'pk', 'common_name', 'environment', 'environment_display',
+    'valid_until', 'days_remaining', 'bucket',
+])
+
+
+def load_wall_data():
+    """
+    Charge les certificats non archivés du mur en une requête et un seul passage
+    
+    Returns:
+        (rows, buckets, env_counts)
+        - rows: WallRow triées par jours restants (sans date d'expiration exclus)
+        - buckets: {'critical'|'warning'|'active'|'expired': [WallRow]}
+        - env_counts: Counter des environnements (tous les non archivés)
+    """
+    env_labels = dict(Certificate.ENVIRONMENT_CHOICES)
+    rows = []
+    buckets = {'critical': [], 'warning': [], 'active': [], 'expired': []}
+    env_counts = Counter()
+    
+    queryset = Certificate.objects.filter(archived=False).order_by(
+        F('days_remaining').asc(nulls_last=True)
+    ).values_list('id', 'common_name', 'environment', 'valid_until', 'days_remaining')
+    
+    for pk, common_name, environment, valid_until, days_remaining in queryset.iterator(chunk_size=2000):
+        env_counts[environment] += 1
+        if days_remaining is None:
+            continue
+        
+        row = WallRow(
+            pk, common_name, environment, env_labels.get(environment, environment),
+            valid_until, days_remaining, wall_bucket(days_remaining),
+        )
+        rows.append(row)
+        buckets[row.bucket].append(row)
+    
+    return rows, buckets, env_counts
+
+
 class WallDashboardView(TemplateView):
     """Dashboard pour affichage mural (wall display)"""
     template_name = 'dashboard/wall_display.html'
@@ -13,47 +83,28 @@ class WallDashboardView(TemplateView):
         context = super().get_context_data(**kwargs)
         
         # Statistiques globales (exclure les archivés)
-        all_certs = Certificate.objects.filter(archived=False)
-        context['stats'] = {
-            'total': all_certs.count(),
-            'active': all_certs.filter(status='active').count(),
-            'expiring_soon': all_certs.filter(status='expiring_soon').count(),
-            'expired': all_certs.filter(status='expired').count(),
-        }
+        context['stats'] = get_certificate_stats(include_archived=False)
         
         # Récupérer TOUS les certificats non archivés et les trier par urgence
         # Ordre de priorité : Critiques (<=7j) > Orange (8-30j) > Vert (>30j) > Expirés
-        
-        all_active_certs = Certificate.objects.filter(archived=False).exclude(
-            days_remaining__isnull=True
-        ).order_by('days_remaining')
-        
-        # Convertir en liste pour division en 2 colonnes
-        all_certs_list = list(all_active_certs)
+        all_certs_list, buckets, env_counts = load_wall_data()
         
         # Remplir la colonne de gauche d'abord (max ~30 certificats par colonne)
-        # Calculer dynamiquement selon le nombre de certificats
         max_per_column = 30
-        
-        if len(all_certs_list) <= max_per_column:
-            # Tous dans la colonne 1
-            context['column1_certs'] = all_certs_list
-            context['column2_certs'] = []
-        else:
-            # Remplir colonne 1, puis le reste dans colonne 2
-            context['column1_certs'] = all_certs_list[:max_per_column]
-            context['column2_certs'] = all_certs_list[max_per_column:]
+        context['column1_certs'] = all_certs_list[:max_per_column]
+        context['column2_certs'] = all_certs_list[max_per_column:]
         
         # Catégoriser les certificats pour les 3 cartes
-        context['critical_certs'] = [c for c in all_certs_list if c.days_remaining is not None and 0 <= c.days_remaining <= 7]
-        context['warning_certs'] = [c for c in all_certs_list if c.days_remaining is not None and 7 < c.days_remaining <= 30]
-        context['active_certs'] = [c for c in all_certs_list if c.days_remaining is not None and c.days_remaining > 30]
-        context['expired_certs'] = [c for c in all_certs_list if c.days_remaining is not None and c.days_remaining < 0]
+        context['critical_certs'] = buckets['critical']
+        context['warning_certs'] = buckets['warning']
+        context['active_certs'] = buckets['active']
+        context['expired_certs'] = buckets['expired']
         
-        # Statistiques par environnement (exclure les archivés)
-        context['env_stats'] = Certificate.objects.filter(archived=False).values('environment').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        # Statistiques par environnement, depuis le même résultat
+        context['env_stats'] = [
+            {'environment': environment, 'count': count}
+            for environment, count in env_counts.most_common()
+        ]
         
         # Heure actuelle
         context['current_time'] = timezone.now()
@@ -61,4 +112,39 @@ class WallDashboardView(TemplateView):
         # Auto-refresh en secondes (défaut: 60s)
         context['refresh_interval'] = self.request.GET.get('refresh', 60)
         
+        # Version affichée, pour les requêtes conditionnelles du flux JSON
+        context['feed_etag'] = wall_feed_etag(self.request)
+        
         return context
+
+
+@method_decorator(condition(etag_func=wall_feed_etag), name='dispatch')
+class WallFeedView(View):
+    """
+    Flux JSON compact du mur (If-None-Match → 304 sans requête ORM)
+    La page murale interroge ce flux et ne met à jour que les lignes modifiées.
+    """
+    
+    def get(self, request):
+        rows, _, _ = load_wall_data()
+        
+        certificates = [
+            {
+                'id': row.pk,
+                'cn': row.common_name,
+                'env': row.environment_display or '',
+                'exp': row.valid_until.strftime('%d/%m/%Y') if row.valid_until else '',
+                'days': row.days_remaining,
+                'bucket': row.bucket,
+            }
+            for row in rows
+        ]
+        
+        response = JsonResponse({
+            'stats': get_certificate_stats(include_archived=False),
+            'generated_at': timezone.now().strftime('%d/%m/%Y %H:%M'),
+            'certificates': certificates,
+        })
+        # Toujours revalider auprès du serveur (304 si inchangé)
+        response['Cache-Control'] = 'no-cache'
+        return response
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django import forms
-from .models import NotificationRule, NotificationLog, EmailSettings
+from .models import NotificationRule, NotificationDigest, NotificationLog, NotificationDailyStat, OutboundEmail, EmailSettings
 
 
 @admin.register(NotificationRule)
@@ -56,6 +56,43 @@ class NotificationRuleAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+@admin.register(NotificationDigest)
+class NotificationDigestAdmin(admin.ModelAdmin):
+    list_display = [
+        'subject',
+        'rule',
+        'status',
+        'certificate_count',
+        'sent_at'
+    ]
+    
+    list_filter = [
+        'status',
+        'notification_type',
+        'sent_at'
+    ]
+    
+    search_fields = [
+        'subject',
+        'recipients'
+    ]
+    
+    readonly_fields = [
+        'rule',
+        'notification_type',
+        'status',
+        'recipients',
+        'subject',
+        'message',
+        'error_message',
+        'certificate_count',
+        'sent_at'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(NotificationLog)
 class NotificationLogAdmin(admin.ModelAdmin):
     list_display = [
@@ -75,12 +112,16 @@ class NotificationLogAdmin(admin.ModelAdmin):
     search_fields = [
         'certificate__common_name',
         'recipients',
-        'subject'
+        'subject',
+        'digest__subject'
     ]
     
+    list_select_related = ['certificate', 'digest']
+    
     readonly_fields = [
         'certificate',
         'rule',
+        'digest',
         'notification_type',
         'status',
         'recipients',
@@ -91,7 +132,7 @@ class NotificationLogAdmin(admin.ModelAdmin):
     ]
     
     def recipients_short(self, obj):
-        recipients = obj.recipients.split('\n')
+        recipients = obj.display_recipients.split('\n')
         if len(recipients) > 1:
             return f"{recipients[0]} (+{len(recipients)-1})"
         return recipients[0] if recipients else ''
@@ -104,6 +145,85 @@ class NotificationLogAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(NotificationDailyStat)
+class NotificationDailyStatAdmin(admin.ModelAdmin):
+    list_display = [
+        'day',
+        'rule',
+        'sent_count',
+        'failed_count'
+    ]
+    
+    list_filter = [
+        'day',
+        'rule'
+    ]
+    
+    list_select_related = ['rule']
+    
+    readonly_fields = [
+        'day',
+        'rule',
+        'sent_count',
+        'failed_count'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = [
+        'subject',
+        'status',
+        'attempts',
+        'next_attempt_at',
+        'created_at',
+        'sent_at'
+    ]
+    
+    list_filter = [
+        'status',
+        'created_at'
+    ]
+    
+    search_fields = [
+        'subject',
+        'recipients'
+    ]
+    
+    readonly_fields = [
+        'subject',
+        'body',
+        'from_email',
+        'recipients',
+        'digest',
+        'status',
+        'attempts',
+        'next_attempt_at',
+        'last_error',
+        'created_at',
+        'sent_at'
+    ]
+    
+    actions = ['requeue']
+    
+    @admin.action(description='Remettre en file les emails en échec')
+    def requeue(self, request, queryset):
+        from django.utils import timezone
+        
+        count = queryset.filter(status='failed').update(
+            status='pending',
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f'{count} email(s) remis en file')
+    
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(EmailSettings)
 class EmailSettingsAdmin(admin.ModelAdmin):
     fieldsets = (
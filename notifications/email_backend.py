@@ -1,6 +1,9 @@
 """
 Backend email dynamique utilisant les paramètres de EmailSettings
 """
+import smtplib
+import socket
+
 from django.core.mail.backends.smtp import EmailBackend as DjangoEmailBackend
 from django.conf import settings
 
@@ -16,7 +19,7 @@ class DynamicEmailBackend(DjangoEmailBackend):
         from .models import EmailSettings
         
         # Récupérer les paramètres de la base de données
-        email_settings = EmailSettings.get_settings()
+        email_settings = EmailSettings.get_cached()
         
         # Surcharger les paramètres avec ceux de la base
         kwargs['host'] = email_settings.smtp_host or settings.EMAIL_HOST
@@ -37,7 +40,7 @@ def get_connection():
     from .models import EmailSettings
     from django.core.mail import get_connection as django_get_connection
     
-    email_settings = EmailSettings.get_settings()
+    email_settings = EmailSettings.get_cached()
     
     connection = django_get_connection(
         backend='django.core.mail.backends.smtp.EmailBackend',
@@ -52,3 +55,73 @@ def get_connection():
     
     return connection
 
+
+
+class EmailSession:
+    """
+    Une seule session SMTP pour tout un traitement (connexion, STARTTLS et
+    authentification une fois, au premier envoi)
+    
+    Usage:
+        with EmailSession() as session:
+            for email in emails:
+                session.send(email)
+    
+    Si le serveur coupe la connexion en cours de route, elle est rouverte
+    et l'envoi retenté (max_retries fois) avant de lever l'erreur.
+    """
+    
+    # Erreurs après lesquelles une nouvelle connexion peut réussir
+    RETRYABLE_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, socket.timeout)
+    
+    def __init__(self, connection=None, max_retries: int = 1):
+        self.connection = connection
+        self.max_retries = max_retries
+        # Nombre de connexions ouvertes (reconnexions comprises)
+        self.connections_opened = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+    
+    def open(self):
+        if self.connection is None:
+            self.connection = get_connection()
+        # open() retourne False si la connexion est déjà ouverte
+        if self.connection.open():
+            self.connections_opened += 1
+    
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                # Connexion déjà rompue: rien à fermer proprement
+                pass
+    
+    def send(self, email) -> int:
+        """
+        Envoie un message sur la session (ouverte au premier appel)
+        
+        Returns:
+            1 si le message a été accepté par le serveur
+        """
+        attempt = 0
+        while True:
+            try:
+                self.open()
+                email.connection = self.connection
+                return self.connection.send_messages([email]) or 0
+            except self.RETRYABLE_ERRORS:
+                # Connexion perdue: fermer puis rouvrir au prochain essai
+                self.close()
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+    
+    def send_messages(self, emails) -> int:
+        """Envoie les messages un par un sur la session (nombre de messages envoyés)"""
+        return sum(self.send(email) for email in emails)
@@ -1,17 +1,15 @@
 """
 Commande pour vérifier les certificats expirant et envoyer des alertes groupées
-Usage: python manage.py check_expirations [--dry-run] [--force]
+Usage: python manage.py check_expirations [--dry-run] [--force] [--send-now]
 """
 from django.core.management.base import BaseCommand
-from django.core.mail import EmailMessage
-from django.template.loader import render_to_string
+from django.db import transaction
 from django.utils import timezone
-from django.conf import settings
-from datetime import timedelta
-from urllib.parse import urlencode
 
-from certificates.models import Certificate
-from notifications.models import NotificationRule, NotificationLog, EmailSettings
+from notifications.models import NotificationRule, NotificationDigest, OutboundEmail, EmailSettings
+from notifications.outbox import drain_outbox
+from notifications.rules import RuleEngine
+from notifications.webhooks import WebhookJob, build_digest_payload, deliver_webhook_jobs
 
 
 class Command(BaseCommand):
@@ -28,13 +26,18 @@ class Command(BaseCommand):
             action='store_true',
             help='Force l\'envoi même si déjà envoyé aujourd\'hui',
         )
+        parser.add_argument(
+            '--send-now',
+            action='store_true',
+            help='Vide la file d\'attente des emails à la fin (sinon: tâche drain_email_outbox)',
+        )
     
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         force = options['force']
         
         # Récupérer les paramètres
-        email_settings = EmailSettings.get_settings()
+        email_settings = EmailSettings.get_cached()
         
         if not email_settings.enable_notifications and not dry_run:
             self.stdout.write(self.style.WARNING(
@@ -42,67 +45,71 @@ class Command(BaseCommand):
             ))
             return
         
-        # Récupérer les règles actives
-        rules = NotificationRule.objects.filter(is_active=True)
+        # Règles actives (une requête), puis évaluation de toutes les règles
+        # en un seul passage sur les certificats candidats
+        rules = list(NotificationRule.objects.filter(is_active=True))
         
-        if not rules.exists():
+        if not rules:
             self.stdout.write(self.style.WARNING(
                 '⚠️  Aucune règle de notification active'
             ))
             return
         
         self.stdout.write(self.style.SUCCESS(
-            f'🔍 Vérification des certificats avec {rules.count()} règle(s) active(s)...'
+            f'🔍 Vérification des certificats avec {len(rules)} règle(s) active(s)...'
         ))
         
+        engine = RuleEngine(rules)
+        matches = engine.evaluate()
+        
+        # Registre des envois: clés (règle, canal, empreinte) déjà réservées aujourd'hui,
+        # en une requête indexée pour toutes les règles (ignoré avec --force)
+        run_date = None if force else timezone.now().date()
+        claimed_keys = NotificationDigest.claimed_keys(rules, run_date) if run_date else set()
+        
         total_sent = 0
+        total_queued = 0
         total_errors = 0
+        # Webhooks réservés, envoyés en parallèle après les emails
+        webhook_jobs = []
         
         # Pour chaque règle
-        for rule in rules:
+        for rule, certificates in matches:
             self.stdout.write(f'\n📋 Règle: {rule.name} ({rule.days_before_expiration} jours)')
             
-            # Utiliser le champ days_remaining en base de données pour des requêtes performantes
-            # Inclure tous les certificats qui expirent dans X jours OU MOINS
-            certificates = Certificate.objects.filter(
-                status__in=['active', 'expiring_soon'],
-                days_remaining__lte=rule.days_before_expiration,
-                days_remaining__gte=0  # Exclure les certificats déjà expirés
-            )
-            
-            # Appliquer les filtres de la règle
-            if rule.filter_by_environment:
-                certificates = certificates.filter(environment=rule.filter_by_environment)
-            
-            if rule.filter_by_issuer:
-                certificates = certificates.filter(issuer__icontains=rule.filter_by_issuer)
-            
-            if not certificates.exists():
+            if not certificates:
                 self.stdout.write(self.style.SUCCESS(
                     f'   ✓ Aucun certificat trouvé pour cette règle'
                 ))
                 continue
             
             self.stdout.write(self.style.WARNING(
-                f'   ⚠️  {certificates.count()} certificat(s) trouvé(s)'
+                f'   ⚠️  {len(certificates)} certificat(s) trouvé(s)'
             ))
             
-            # Vérifier si une notification groupée n'a pas déjà été envoyée aujourd'hui pour cette règle
-            if not force:
-                today = timezone.now().date()
-                # On vérifie si au moins un certificat de cette règle a déjà été notifié aujourd'hui
-                already_sent_today = NotificationLog.objects.filter(
-                    rule=rule,
-                    sent_at__date=today,
-                    status='sent',
-                    certificate__in=certificates
-                ).exists()
-                
-                if already_sent_today:
-                    self.stdout.write(
-                        f'   → Notification groupée déjà envoyée aujourd\'hui pour cette règle'
-                    )
-                    continue
+            digest_hash = NotificationDigest.compute_digest_hash(cert.pk for cert in certificates)
+            
+            # Subject personnalisé avec le nombre de certificats
+            if len(certificates) == 1:
+                subject = rule.email_subject
+            else:
+                subject = f"{rule.email_subject} - {len(certificates)} certificats"
+            
+            if rule.sends_webhook:
+                job = self.claim_webhook(rule, certificates, subject, run_date, digest_hash,
+                                         claimed_keys, dry_run)
+                if job:
+                    webhook_jobs.append(job)
+            
+            if not rule.sends_email:
+                continue
+            
+            # Vérifier si ce même envoi groupé n'a pas déjà été effectué aujourd'hui
+            if (rule.pk, 'email', digest_hash) in claimed_keys:
+                self.stdout.write(
+                    f'   → Notification groupée déjà envoyée aujourd\'hui pour cette règle'
+                )
+                continue
             
             # Préparer les destinataires
             recipients = rule.get_recipients_list()
@@ -116,57 +123,23 @@ class Command(BaseCommand):
                 ))
                 continue
             
-            # Base URL
-            base_url = f'http://{settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost:8000"}'
-            
-            # Construire l'URL filtrée pour la liste des certificats
-            filter_params = {'days': rule.days_before_expiration}
-            if rule.filter_by_environment:
-                filter_params['environment'] = rule.filter_by_environment
-            if rule.filter_by_issuer:
-                filter_params['issuer'] = rule.filter_by_issuer
-            
-            certificates_list_url = f'{base_url}/certificates/?{urlencode(filter_params)}'
-            
-            # Contexte pour le template d'email groupé
-            context = {
-                'certificates': list(certificates),
-                'days_before_expiration': rule.days_before_expiration,
-                'rule': rule,
-                'current_date': timezone.now(),
-                'base_url': base_url,
-                'certificates_list_url': certificates_list_url,
-            }
-            
             if dry_run:
                 self.stdout.write(self.style.SUCCESS(
-                    f'   [DRY-RUN] Email groupé pour {certificates.count()} certificat(s) → {", ".join(recipients)}'
+                    f'   [DRY-RUN] Email groupé pour {len(certificates)} certificat(s) → {", ".join(recipients)}'
                 ))
                 for cert in certificates:
                     self.stdout.write(f'      - {cert.common_name}')
                 continue
             
-            # Envoyer l'email groupé
-            try:
-                # Utiliser la connexion avec les paramètres de la base
-                from notifications.email_backend import get_connection
-                connection = get_connection()
-                
-                # Créer l'email
-                from_email = f'{email_settings.from_name} <{email_settings.from_email}>'
-                
-                # Subject personnalisé avec le nombre de certificats
-                if certificates.count() == 1:
-                    subject = rule.email_subject
-                else:
-                    subject = f"{rule.email_subject} - {certificates.count()} certificats"
-                
-                # Créer le contenu email directement avec formatage forcé
-                cert_list = ""
-                for cert in certificates:
-                    cert_list += f"- {cert.common_name} (Expire le {cert.valid_until.strftime('%d/%m/%Y')})\n"
-                
-                body_content = f"""Bonjour,
+            # Créer l'email
+            from_email = f'{email_settings.from_name} <{email_settings.from_email}>'
+            
+            # Créer le contenu email directement avec formatage forcé
+            cert_list = ""
+            for cert in certificates:
+                cert_list += f"- {cert.common_name} (Expire le {cert.valid_until.strftime('%d/%m/%Y')})\n"
+            
+            body_content = f"""Bonjour,
 
 Voici la liste des certificats arrivant à échéance dans les prochains jours :
 
@@ -177,56 +150,62 @@ Message automatique – merci de ne pas répondre.
 
 Cordialement,
 CertiTrack"""
+            
+            # Réserver l'envoi dans le registre (sûr entre workers concurrents) et
+            # mettre l'email en file: le journal est complété une fois l'email envoyé
+            with transaction.atomic():
+                digest = NotificationDigest.claim(
+                    certificates,
+                    recipients=recipients,
+                    subject=subject,
+                    rule=rule,
+                    run_date=run_date,
+                )
+                if digest is None:
+                    self.stdout.write(
+                        '   → Notification groupée déjà en cours ou envoyée par un autre processus'
+                    )
+                    continue
                 
-                # Envoyer seulement du texte simple avec encodage UTF-8 explicite
-                email = EmailMessage(
+                OutboundEmail.enqueue(
                     subject=subject,
                     body=body_content,
+                    recipients=recipients,
                     from_email=from_email,
-                    to=recipients,
-                    connection=connection
+                    digest=digest,
                 )
-                # Forcer l'encodage UTF-8 et le type de contenu
-                email.encoding = 'utf-8'
-                email.content_subtype = 'plain'
-                
-                # Envoyer
-                email.send(fail_silently=False)
-                
-                # Logger le succès pour chaque certificat
-                for cert in certificates:
-                    NotificationLog.objects.create(
-                        certificate=cert,
-                        rule=rule,
-                        notification_type='email',
-                        status='sent',
-                        recipients='\n'.join(recipients),
-                        subject=subject,
-                        message=f"Email groupé avec {certificates.count()} certificat(s)"
-                    )
-                
-                self.stdout.write(self.style.SUCCESS(
-                    f'   ✓ Email groupé envoyé pour {certificates.count()} certificat(s) à {len(recipients)} destinataire(s)'
-                ))
-                total_sent += 1
-                
-            except Exception as e:
-                # Logger l'erreur pour chaque certificat
-                for cert in certificates:
-                    NotificationLog.objects.create(
-                        certificate=cert,
-                        rule=rule,
-                        notification_type='email',
-                        status='failed',
-                        recipients='\n'.join(recipients),
-                        subject=subject if 'subject' in locals() else rule.email_subject,
-                        error_message=str(e)
-                    )
-                
-                self.stdout.write(self.style.ERROR(
-                    f'   ✗ Erreur lors de l\'envoi groupé - {str(e)}'
-                ))
-                total_errors += 1
+            
+            self.stdout.write(self.style.SUCCESS(
+                f'   ✓ Email groupé mis en file pour {len(certificates)} certificat(s) à {len(recipients)} destinataire(s)'
+            ))
+            total_queued += 1
+    
+        # Webhooks: requêtes parallèles sur des connexions réutilisées
+        if webhook_jobs:
+            self.stdout.write(f'\n🔗 Envoi de {len(webhook_jobs)} webhook(s)...')
+            for job, result in zip(webhook_jobs, deliver_webhook_jobs(webhook_jobs)):
+                if result.ok:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'   ✓ Webhook {job.digest.rule.name} → {job.url} '
+                        f'(HTTP {result.status}, {result.elapsed:.2f}s, {result.attempts} essai(s))'
+                    ))
+                    total_sent += 1
+                else:
+                    self.stdout.write(self.style.ERROR(
+                        f'   ✗ Webhook {job.digest.rule.name} → {job.url} - {result.error} '
+                        f'({result.attempts} essai(s))'
+                    ))
+                    total_errors += 1
+        
+        # Emails: envoyés par lots depuis la file d'attente
+        if total_queued and options['send_now']:
+            self.stdout.write('\n📤 Envoi de la file d\'attente des emails...')
+            result = drain_outbox()
+            self.stdout.write(
+                f'   {result["sent"]} envoyé(s), {result["retried"]} à retenter, {result["failed"]} en échec'
+            )
+            total_sent += result['sent']
+            total_errors += result['failed']
         
         # Résumé
         self.stdout.write('\n' + '='*60)
@@ -236,9 +215,35 @@ CertiTrack"""
             ))
         else:
             self.stdout.write(self.style.SUCCESS(
-                f'✅ {total_sent} notification(s) groupée(s) envoyée(s)'
+                f'✅ {total_sent} notification(s) groupée(s) envoyée(s), {total_queued} email(s) mis en file'
             ))
             if total_errors:
                 self.stdout.write(self.style.ERROR(
                     f'❌ {total_errors} erreur(s)'
                 ))
+    
+    def claim_webhook(self, rule, certificates, subject, run_date, digest_hash, claimed_keys, dry_run):
+        """Réserve le webhook d'une règle (None si déjà envoyé, réservé ailleurs ou en dry-run)"""
+        if (rule.pk, 'webhook', digest_hash) in claimed_keys:
+            self.stdout.write('   → Webhook déjà envoyé aujourd\'hui pour cette règle')
+            return None
+        
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f'   [DRY-RUN] Webhook pour {len(certificates)} certificat(s) → {rule.webhook_url}'
+            ))
+            return None
+        
+        digest = NotificationDigest.claim(
+            certificates,
+            recipients=[rule.webhook_url],
+            subject=subject,
+            rule=rule,
+            run_date=run_date,
+            notification_type='webhook',
+        )
+        if digest is None:
+            self.stdout.write('   → Webhook déjà en cours ou envoyé par un autre processus')
+            return None
+        
+        return WebhookJob(digest, rule.webhook_url, build_digest_payload(rule, certificates, subject))
@@ -0,0 +1,56 @@
+"""
+Commande pour envoyer les emails en file d'attente
+Usage: python manage.py drain_outbox [--batch-size 100] [--rate 5] [--max-batches N]
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications.models import OutboundEmail
+from notifications.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Envoie par lots, à débit limité, les emails en file d\'attente'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.OUTBOX_BATCH_SIZE,
+            help=f'Nombre de messages par lot (défaut: {settings.OUTBOX_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=settings.OUTBOX_RATE_LIMIT,
+            help=f'Messages par seconde au maximum, 0 = illimité (défaut: {settings.OUTBOX_RATE_LIMIT})',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Nombre maximal de lots (défaut: jusqu\'à épuisement de la file)',
+        )
+    
+    def handle(self, *args, **options):
+        pending = OutboundEmail.objects.filter(status='pending').count()
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('✓ Aucun email en file d\'attente'))
+            return
+        
+        self.stdout.write(f'📤 {pending} email(s) en file d\'attente...')
+        
+        result = drain_outbox(
+            batch_size=options['batch_size'],
+            rate_limit=options['rate'],
+            max_batches=options['max_batches'],
+        )
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result["sent"]} email(s) envoyé(s) en {result["batches"]} lot(s) '
+            f'sur {result["connections"]} connexion(s) SMTP'
+        ))
+        if result['retried']:
+            self.stdout.write(self.style.WARNING(f'⚠️  {result["retried"]} email(s) à retenter plus tard'))
+        if result['failed']:
+            self.stdout.write(self.style.ERROR(f'❌ {result["failed"]} email(s) en échec définitif'))
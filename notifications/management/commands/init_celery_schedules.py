@@ -20,6 +20,8 @@ class Command(BaseCommand):
             'daily_summary': self._get_or_create_schedule(hour=9, minute=0),
             'auto_scan': self._get_or_create_schedule(hour=2, minute=0, day_of_week='0'),  # Dimanche
             'update_days': self._get_or_create_schedule(hour=0, minute=30),  # Tous les jours à 00:30 UTC
+            'purge_logs': self._get_or_create_schedule(hour=3, minute=0),  # Tous les jours à 03:00 UTC
+            'drain_outbox': self._get_or_create_schedule(hour='*', minute='*'),  # Chaque minute
         }
         
         # Créer ou mettre à jour les tâches périodiques
@@ -59,6 +61,20 @@ class Command(BaseCommand):
                 'enabled': True,
                 'description': 'Met à jour quotidiennement le champ days_remaining de tous les certificats'
             },
+            {
+                'name': 'Purge du journal des notifications',
+                'task': 'notifications.tasks.purge_notification_history',
+                'schedule': schedules['purge_logs'],
+                'enabled': True,
+                'description': 'Supprime par lots le journal des notifications plus ancien que NOTIFICATION_LOG_RETENTION_DAYS'
+            },
+            {
+                'name': 'Envoi de la file d\'attente des emails',
+                'task': 'notifications.tasks.drain_email_outbox',
+                'schedule': schedules['drain_outbox'],
+                'enabled': True,
+                'description': 'Envoie par lots les emails en file d\'attente (débit limité par OUTBOX_RATE_LIMIT)'
+            },
         ]
         
         for task_data in tasks:
@@ -0,0 +1,65 @@
+"""
+Commande pour purger l'historique des notifications au-delà de la durée de rétention
+Usage: python manage.py prune_notifications [--days 180] [--chunk-size 1000] [--dry-run] [--rebuild-stats]
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications.models import NotificationDailyStat
+from notifications.retention import DEFAULT_CHUNK_SIZE, get_retention_cutoff, prune_notification_history
+
+
+class Command(BaseCommand):
+    help = 'Supprime par lots le journal des notifications plus ancien que la durée de rétention'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.NOTIFICATION_LOG_RETENTION_DAYS,
+            help=f'Durée de rétention en jours (défaut: {settings.NOTIFICATION_LOG_RETENTION_DAYS})',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Nombre de lignes supprimées par requête (défaut: {DEFAULT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Affiche ce qui serait supprimé sans rien supprimer',
+        )
+        parser.add_argument(
+            '--rebuild-stats',
+            action='store_true',
+            help='Recalcule les compteurs quotidiens des jours encore couverts par le journal',
+        )
+    
+    def handle(self, *args, **options):
+        if options['rebuild_stats'] and not options['dry_run']:
+            # Le jour de la date limite est incomplet: seuls les jours suivants sont recalculés
+            since = get_retention_cutoff(options['days']).date() + timedelta(days=1)
+            rows = NotificationDailyStat.rebuild(since=since)
+            self.stdout.write(self.style.SUCCESS(f'🔄 {rows} compteur(s) quotidien(s) recalculé(s)'))
+        
+        result = prune_notification_history(
+            retention_days=options['days'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+        
+        cutoff = result['cutoff'].strftime('%d/%m/%Y %H:%M')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  Mode dry-run: {result["logs"]} ligne(s) de journal et {result["digests"]} '
+                f'envoi(s) groupé(s) antérieurs au {cutoff} seraient supprimés'
+            ))
+            return
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result["logs"]} ligne(s) de journal et {result["digests"]} envoi(s) groupé(s) '
+            f'antérieurs au {cutoff} supprimés'
+        ))
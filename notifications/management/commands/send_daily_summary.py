@@ -3,13 +3,13 @@ Commande pour envoyer le résumé quotidien
 Usage: python manage.py send_daily_summary [--dry-run]
 """
 from django.core.management.base import BaseCommand
-from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.conf import settings
 
 from certificates.models import Certificate
-from notifications.models import EmailSettings
+from certificates.stats import get_certificate_stats
+from notifications.models import EmailSettings, OutboundEmail
 
 
 class Command(BaseCommand):
@@ -26,7 +26,7 @@ class Command(BaseCommand):
         dry_run = options['dry_run']
         
         # Récupérer les paramètres
-        email_settings = EmailSettings.get_settings()
+        email_settings = EmailSettings.get_cached()
         
         if not email_settings.daily_summary_enabled and not dry_run:
             self.stdout.write(self.style.WARNING(
@@ -41,12 +41,7 @@ class Command(BaseCommand):
             return
         
         # Statistiques
-        stats = {
-            'total': Certificate.objects.count(),
-            'active': Certificate.objects.filter(status='active').count(),
-            'expiring_soon': Certificate.objects.filter(status='expiring_soon').count(),
-            'expired': Certificate.objects.filter(status='expired').count(),
-        }
+        stats = get_certificate_stats()
         
         # Certificats expirant bientôt (30 jours)
         expiring_certs = Certificate.objects.filter(
@@ -102,10 +97,6 @@ class Command(BaseCommand):
             return
         
         try:
-            # Utiliser la connexion avec les paramètres de la base
-            from notifications.email_backend import get_connection
-            connection = get_connection()
-            
             # Créer l'email
             from_email = f'{email_settings.from_name} <{email_settings.from_email}>'
             subject = f'CertiTrack - Résumé Quotidien ({timezone.now().strftime("%d/%m/%Y")})'
@@ -127,27 +118,20 @@ Message automatique – merci de ne pas répondre.
 Cordialement,
 CertiTrack"""
             
-            # Envoyer seulement du texte simple avec encodage UTF-8 explicite
-            email = EmailMessage(
+            # Mettre en file (envoyé par drain_email_outbox)
+            OutboundEmail.enqueue(
                 subject=subject,
                 body=body_content,
+                recipients=recipients,
                 from_email=from_email,
-                to=recipients,
-                connection=connection
             )
-            # Forcer l'encodage UTF-8 et le type de contenu
-            email.encoding = 'utf-8'
-            email.content_subtype = 'plain'
-            
-            # Envoyer
-            email.send(fail_silently=False)
             
             self.stdout.write(self.style.SUCCESS(
-                f'✅ Résumé quotidien envoyé à {len(recipients)} destinataire(s)'
+                f'✅ Résumé quotidien mis en file pour {len(recipients)} destinataire(s)'
             ))
             
         except Exception as e:
             self.stdout.write(self.style.ERROR(
-                f'❌ Erreur lors de l\'envoi: {str(e)}'
+                f'❌ Erreur lors de la mise en file: {str(e)}'
             ))
 
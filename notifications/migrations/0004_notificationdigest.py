@@ -0,0 +1,107 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0003_notificationrule_celery_task_name_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notificationlog",
+            name="recipients",
+            field=models.TextField(blank=True, verbose_name="Destinataires"),
+        ),
+        migrations.AlterField(
+            model_name="notificationlog",
+            name="subject",
+            field=models.CharField(blank=True, max_length=200, verbose_name="Sujet"),
+        ),
+        migrations.CreateModel(
+            name="NotificationDigest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "notification_type",
+                    models.CharField(
+                        default="email", max_length=10, verbose_name="Type"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("sent", "Envoyée"),
+                            ("failed", "Échec"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "recipients",
+                    models.TextField(blank=True, verbose_name="Destinataires"),
+                ),
+                ("subject", models.CharField(max_length=200, verbose_name="Sujet")),
+                ("message", models.TextField(blank=True, verbose_name="Message")),
+                (
+                    "error_message",
+                    models.TextField(
+                        blank=True, null=True, verbose_name="Message d'erreur"
+                    ),
+                ),
+                (
+                    "certificate_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre de certificats"
+                    ),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Envoyé le"),
+                ),
+                (
+                    "rule",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="digests",
+                        to="notifications.notificationrule",
+                        verbose_name="Règle appliquée",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Envoi groupé",
+                "verbose_name_plural": "Envois groupés",
+                "ordering": ["-sent_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="notificationlog",
+            name="digest",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="logs",
+                to="notifications.notificationdigest",
+                verbose_name="Envoi groupé",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0004_notificationdigest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationdigest",
+            name="digest_hash",
+            field=models.CharField(
+                blank=True, max_length=64, verbose_name="Empreinte des certificats"
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificationdigest",
+            name="run_date",
+            field=models.DateField(
+                blank=True, null=True, verbose_name="Date d'exécution"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="notificationdigest",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["pending", "sent"])),
+                fields=("rule", "run_date", "digest_hash"),
+                name="unique_claimed_dispatch",
+            ),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_daily_stats(apps, schema_editor):
+    """Initialise les compteurs quotidiens depuis le journal existant"""
+    from django.db.models import Count, Q
+    from django.db.models.functions import TruncDate
+    
+    NotificationLog = apps.get_model("notifications", "NotificationLog")
+    NotificationDailyStat = apps.get_model("notifications", "NotificationDailyStat")
+    
+    rows = (
+        NotificationLog.objects.annotate(day=TruncDate("sent_at"))
+        .values("day", "rule_id")
+        .annotate(
+            sent_count=Count("id", filter=Q(status="sent")),
+            failed_count=Count("id", filter=Q(status="failed")),
+        )
+        .order_by()
+    )
+    NotificationDailyStat.objects.bulk_create(
+        [NotificationDailyStat(**row) for row in rows if row["sent_count"] or row["failed_count"]],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0005_notificationdigest_ledger"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationDailyStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="Jour")),
+                (
+                    "sent_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Envoyées"),
+                ),
+                (
+                    "failed_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Échecs"),
+                ),
+            ],
+            options={
+                "verbose_name": "Statistique quotidienne",
+                "verbose_name_plural": "Statistiques quotidiennes",
+                "ordering": ["-day"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="notificationlog",
+            index=models.Index(
+                fields=["status", "sent_at"], name="notiflog_status_sent_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificationdailystat",
+            name="rule",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="daily_stats",
+                to="notifications.notificationrule",
+                verbose_name="Règle",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="notificationdailystat",
+            constraint=models.UniqueConstraint(
+                fields=("day", "rule"), name="unique_daily_stat_per_rule"
+            ),
+        ),
+        migrations.RunPython(build_daily_stats, migrations.RunPython.noop),
+    ]
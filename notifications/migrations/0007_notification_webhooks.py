@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0006_notification_retention_rollups"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="notificationdigest",
+            name="unique_claimed_dispatch",
+        ),
+        migrations.AlterField(
+            model_name="notificationrule",
+            name="webhook_url",
+            field=models.URLField(
+                blank=True,
+                help_text="Reçoit un POST JSON par envoi groupé (types Webhook et Email + Webhook)",
+                null=True,
+                verbose_name="URL du Webhook",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="notificationdigest",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["pending", "sent"])),
+                fields=("rule", "notification_type", "run_date", "digest_hash"),
+                name="unique_claimed_dispatch",
+            ),
+        ),
+    ]
@@ -1,3 +1,9 @@
+import copy
+import time
+import uuid
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
 from django.db import models
 from django.contrib.auth.models import User
 from certificates.models import Certificate
@@ -45,11 +51,12 @@ class NotificationRule(models.Model):
         verbose_name="Sujet de l'email"
     )
     
-    # Webhook (futur)
+    # Webhook
     webhook_url = models.URLField(
         blank=True,
         null=True,
-        verbose_name="URL du Webhook"
+        verbose_name="URL du Webhook",
+        help_text="Reçoit un POST JSON par envoi groupé (types Webhook et Email + Webhook)"
     )
     
     # Filtres
@@ -121,6 +128,14 @@ class NotificationRule(models.Model):
             return []
         return [email.strip() for email in self.email_recipients.split('\n') if email.strip()]
     
+    @property
+    def sends_email(self):
+        return self.notification_type in ('email', 'both')
+    
+    @property
+    def sends_webhook(self):
+        return self.notification_type in ('webhook', 'both') and bool(self.webhook_url)
+    
     def send_notification(self):
         """Envoie la notification selon la règle"""
         from .tasks import send_rule_alert
@@ -160,6 +175,226 @@ class NotificationRule(models.Model):
         return None
 
 
+class NotificationDigest(models.Model):
+    """
+    Envoi groupé (un email pour N certificats) et registre d'idempotence
+    
+    Le sujet, le message et les destinataires, communs à tous les certificats
+    de l'envoi, sont stockés une seule fois ici; chaque certificat n'a qu'une
+    ligne légère dans NotificationLog.
+    
+    Les envois planifiés portent une clé (règle, canal, date d'exécution,
+    empreinte des certificats) unique tant que l'envoi est en cours ou réussi:
+    un même envoi ne peut être réservé qu'une fois par jour, même par des
+    workers concurrents. Un échec libère la clé.
+    
+    Les lignes de journal sont créées 'pending' à la réservation et passent au
+    statut final avec l'envoi: complete() peut être appelé par un autre
+    processus (vidage de la file d'emails).
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('sent', 'Envoyée'),
+        ('failed', 'Échec'),
+    ]
+    
+    # Statuts qui réservent la clé d'idempotence
+    CLAIMED_STATUSES = ['pending', 'sent']
+    
+    # Taille des lots d'insertion des lignes de journal
+    LOG_BATCH_SIZE = 1000
+    
+    rule = models.ForeignKey(
+        NotificationRule,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='digests',
+        verbose_name="Règle appliquée"
+    )
+    
+    # Clé d'idempotence (vide pour les envois manuels ou forcés)
+    run_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name="Date d'exécution"
+    )
+    
+    digest_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name="Empreinte des certificats"
+    )
+    
+    notification_type = models.CharField(
+        max_length=10,
+        default='email',
+        verbose_name="Type"
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name="Statut"
+    )
+    
+    recipients = models.TextField(
+        blank=True,
+        verbose_name="Destinataires"
+    )
+    
+    subject = models.CharField(
+        max_length=200,
+        verbose_name="Sujet"
+    )
+    
+    message = models.TextField(
+        blank=True,
+        verbose_name="Message"
+    )
+    
+    error_message = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name="Message d'erreur"
+    )
+    
+    certificate_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Nombre de certificats"
+    )
+    
+    sent_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Envoyé le"
+    )
+    
+    class Meta:
+        ordering = ['-sent_at']
+        verbose_name = "Envoi groupé"
+        verbose_name_plural = "Envois groupés"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['rule', 'notification_type', 'run_date', 'digest_hash'],
+                condition=models.Q(status__in=['pending', 'sent']),
+                name='unique_claimed_dispatch',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} - {self.certificate_count} certificat(s) ({self.get_status_display()})"
+    
+    @staticmethod
+    def compute_digest_hash(certificate_ids) -> str:
+        """Empreinte SHA-256 de l'ensemble des certificats (indépendante de l'ordre)"""
+        import hashlib
+        
+        payload = ','.join(str(pk) for pk in sorted(certificate_ids))
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    @classmethod
+    def claimed_keys(cls, rules, run_date):
+        """
+        Clés (rule_id, notification_type, digest_hash) déjà réservées ce jour-là
+        (une requête indexée)
+        """
+        return set(
+            cls.objects.filter(
+                rule__in=rules,
+                run_date=run_date,
+                status__in=cls.CLAIMED_STATUSES,
+            ).values_list('rule_id', 'notification_type', 'digest_hash')
+        )
+    
+    @classmethod
+    def claim(cls, certificates, recipients, subject, rule=None, run_date=None,
+              notification_type='email'):
+        """
+        Réserve un envoi avant de l'effectuer
+        
+        Args:
+            certificates: Certificats concernés (objets ou identifiants)
+            recipients: Liste des destinataires
+            run_date: Date d'exécution; None pour un envoi hors registre (manuel, forcé)
+        
+        Returns:
+            NotificationDigest 'pending', ou None si cet envoi est déjà réservé
+        """
+        from django.db import IntegrityError, transaction
+        
+        certificate_ids = [getattr(cert, 'pk', cert) for cert in certificates]
+        digest = cls(
+            rule=rule,
+            run_date=run_date,
+            digest_hash=cls.compute_digest_hash(certificate_ids) if run_date else '',
+            notification_type=notification_type,
+            status='pending',
+            recipients='\n'.join(recipients),
+            subject=subject[:200],
+            certificate_count=len(certificate_ids),
+        )
+        
+        try:
+            with transaction.atomic():
+                digest.save()
+                NotificationLog.objects.bulk_create(
+                    [
+                        NotificationLog(
+                            certificate_id=certificate_id,
+                            rule=rule,
+                            digest=digest,
+                            notification_type=notification_type,
+                            status='pending',
+                        )
+                        for certificate_id in certificate_ids
+                    ],
+                    batch_size=cls.LOG_BATCH_SIZE,
+                )
+        except IntegrityError:
+            # Un autre worker a déjà réservé (ou effectué) cet envoi
+            return None
+        
+        return digest
+    
+    def complete(self, status, message='', error_message=None):
+        """
+        Enregistre le résultat de l'envoi: une mise à jour de l'envoi et une
+        mise à jour de ses lignes de journal
+        """
+        from django.db import transaction
+        
+        self.status = status
+        self.message = message
+        self.error_message = error_message
+        
+        with transaction.atomic():
+            self.save(update_fields=['status', 'message', 'error_message'])
+            self.logs.update(status=status)
+            NotificationDailyStat.increment(self.rule_id, status, self.certificate_count)
+        
+        return self
+    
+    @classmethod
+    def record(cls, certificates, status, recipients, subject, rule=None, message='',
+               error_message=None, notification_type='email'):
+        """
+        Journalise un envoi déjà effectué, hors registre d'idempotence
+        
+        Returns:
+            NotificationDigest créé
+        """
+        digest = cls.claim(
+            certificates,
+            recipients,
+            subject,
+            rule=rule,
+            notification_type=notification_type,
+        )
+        return digest.complete(status, message=message, error_message=error_message)
+
+
 class NotificationLog(models.Model):
     """
     Historique des notifications envoyées
@@ -187,6 +422,16 @@ class NotificationLog(models.Model):
         verbose_name="Règle appliquée"
     )
     
+    # Envoi groupé: sujet, message et destinataires partagés
+    digest = models.ForeignKey(
+        NotificationDigest,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='logs',
+        verbose_name="Envoi groupé"
+    )
+    
     notification_type = models.CharField(
         max_length=10,
         verbose_name="Type"
@@ -199,12 +444,15 @@ class NotificationLog(models.Model):
         verbose_name="Statut"
     )
     
+    # Vides pour les lignes d'un envoi groupé (portés par digest)
     recipients = models.TextField(
+        blank=True,
         verbose_name="Destinataires"
     )
     
     subject = models.CharField(
         max_length=200,
+        blank=True,
         verbose_name="Sujet"
     )
     
@@ -228,9 +476,300 @@ class NotificationLog(models.Model):
         ordering = ['-sent_at']
         verbose_name = "Journal de notification"
         verbose_name_plural = "Journal des notifications"
+        indexes = [
+            models.Index(fields=['status', 'sent_at'], name='notiflog_status_sent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.certificate.common_name} - {self.get_status_display()} ({self.sent_at.strftime('%d/%m/%Y %H:%M')})"
+    
+    def _shared(self, field):
+        """Valeur propre à la ligne, sinon celle de l'envoi groupé"""
+        value = getattr(self, field)
+        if not value and self.digest_id:
+            return getattr(self.digest, field)
+        return value
+    
+    @property
+    def display_recipients(self):
+        return self._shared('recipients') or ''
+    
+    @property
+    def display_subject(self):
+        return self._shared('subject') or ''
+    
+    @property
+    def display_message(self):
+        return self._shared('message') or ''
+    
+    @property
+    def display_error_message(self):
+        return self._shared('error_message') or ''
+
+
+class NotificationDailyStat(models.Model):
+    """
+    Compteurs quotidiens des notifications par règle (agrégat du journal)
+    
+    Tenus à jour à chaque envoi et conservés après la purge du journal:
+    les tableaux de bord lisent ces quelques lignes au lieu de compter
+    NotificationLog, dont le coût croît avec l'historique.
+    """
+    
+    # Statut du journal -> colonne de compteur
+    COUNT_FIELDS = {
+        'sent': 'sent_count',
+        'failed': 'failed_count',
+    }
+    
+    day = models.DateField(
+        verbose_name="Jour"
+    )
+    
+    rule = models.ForeignKey(
+        NotificationRule,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='daily_stats',
+        verbose_name="Règle"
+    )
+    
+    sent_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Envoyées"
+    )
+    
+    failed_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Échecs"
+    )
+    
+    class Meta:
+        ordering = ['-day']
+        verbose_name = "Statistique quotidienne"
+        verbose_name_plural = "Statistiques quotidiennes"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'rule'], name='unique_daily_stat_per_rule'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} - {self.rule or 'Sans règle'}: {self.sent_count} envoyée(s), {self.failed_count} échec(s)"
+    
+    @classmethod
+    def increment(cls, rule_id, status, count=1, day=None):
+        """Ajoute count lignes de journal au statut donné (UPDATE, INSERT si absent)"""
+        from django.db import IntegrityError, transaction
+        from django.db.models import F
+        from django.utils import timezone
+        
+        field = cls.COUNT_FIELDS.get(status)
+        if not field or not count:
+            return
+        
+        day = day or timezone.localdate()
+        rows = cls.objects.filter(day=day, rule_id=rule_id)
+        if rows.update(**{field: F(field) + count}):
+            return
+        
+        try:
+            with transaction.atomic():
+                cls.objects.create(day=day, rule_id=rule_id, **{field: count})
+        except IntegrityError:
+            # Créée entre-temps par un autre processus
+            rows.update(**{field: F(field) + count})
+    
+    @classmethod
+    def totals(cls, today=None):
+        """
+        Compteurs des tableaux de bord en une requête
+        
+        Returns:
+            Dict today_sent / week_sent (7 derniers jours) / total_sent / total_failed
+        """
+        from datetime import timedelta
+        from django.db.models import Q, Sum
+        from django.utils import timezone
+        
+        today = today or timezone.localdate()
+        totals = cls.objects.aggregate(
+            today_sent=Sum('sent_count', filter=Q(day=today)),
+            week_sent=Sum('sent_count', filter=Q(day__gt=today - timedelta(days=7))),
+            total_sent=Sum('sent_count'),
+            total_failed=Sum('failed_count'),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+    
+    @classmethod
+    def rebuild(cls, since=None):
+        """
+        Recalcule les compteurs depuis le journal (jours >= since, ou tout le journal)
+        
+        À n'utiliser que sur des jours dont le journal n'a pas été purgé.
+        
+        Returns:
+            Nombre de lignes de compteurs écrites
+        """
+        from django.db import transaction
+        from django.db.models import Count, Q
+        from django.db.models.functions import TruncDate
+        
+        logs = NotificationLog.objects.all()
+        stats = cls.objects.all()
+        if since:
+            logs = logs.filter(sent_at__date__gte=since)
+            stats = stats.filter(day__gte=since)
+        
+        rows = (
+            logs.annotate(day=TruncDate('sent_at'))
+            .values('day', 'rule_id')
+            .annotate(
+                sent_count=Count('id', filter=Q(status='sent')),
+                failed_count=Count('id', filter=Q(status='failed')),
+            )
+            .order_by()
+        )
+        
+        with transaction.atomic():
+            stats.delete()
+            created = cls.objects.bulk_create(
+                [cls(**row) for row in rows if row['sent_count'] or row['failed_count']],
+                batch_size=1000,
+            )
+        return len(created)
+
+
+class OutboundEmail(models.Model):
+    """
+    File d'attente des emails sortants (message déjà rendu)
+    
+    Les alertes sont mises en file au lieu d'être envoyées pendant leur
+    génération; la tâche de vidage (notifications.outbox) les envoie par lots
+    sur une seule session SMTP, à débit limité, avec nouveaux essais espacés.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('sent', 'Envoyé'),
+        ('failed', 'Échec'),
+    ]
+    
+    subject = models.CharField(
+        max_length=255,
+        verbose_name="Sujet"
+    )
+    
+    body = models.TextField(
+        verbose_name="Message"
+    )
+    
+    from_email = models.CharField(
+        max_length=255,
+        verbose_name="Expéditeur"
+    )
+    
+    recipients = models.TextField(
+        verbose_name="Destinataires",
+        help_text="Un email par ligne"
+    )
+    
+    # Envoi groupé à compléter (journal, registre) une fois l'email envoyé
+    digest = models.ForeignKey(
+        NotificationDigest,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='outbound_emails',
+        verbose_name="Envoi groupé"
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name="Statut"
+    )
+    
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Tentatives"
+    )
+    
+    # Prochain envoi possible (nouvel essai, ou fin de réservation par un worker)
+    next_attempt_at = models.DateTimeField(
+        verbose_name="Prochaine tentative"
+    )
+    
+    last_error = models.TextField(
+        blank=True,
+        verbose_name="Dernière erreur"
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Créé le"
+    )
+    
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Envoyé le"
+    )
+    
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        verbose_name = "Email en file d'attente"
+        verbose_name_plural = "File d'attente des emails"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} ({self.get_status_display()})"
+    
+    @classmethod
+    def enqueue(cls, subject, body, recipients, from_email=None, digest=None):
+        """
+        Met un email en file (envoyé par la prochaine exécution de drain_outbox)
+        
+        Args:
+            recipients: Liste des destinataires
+            from_email: Expéditeur; par défaut celui des paramètres email
+        
+        Returns:
+            OutboundEmail créé
+        """
+        from django.utils import timezone
+        
+        if from_email is None:
+            email_settings = EmailSettings.get_cached()
+            from_email = f'{email_settings.from_name} <{email_settings.from_email}>'
+        
+        return cls.objects.create(
+            subject=subject[:255],
+            body=body,
+            from_email=from_email,
+            recipients='\n'.join(recipients),
+            digest=digest,
+            next_attempt_at=timezone.now(),
+        )
+    
+    def get_recipients_list(self):
+        return [email.strip() for email in self.recipients.split('\n') if email.strip()]
+    
+    def to_email_message(self):
+        """EmailMessage texte simple, encodé en UTF-8"""
+        from django.core.mail import EmailMessage
+        
+        email = EmailMessage(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=self.get_recipients_list(),
+        )
+        email.encoding = 'utf-8'
+        email.content_subtype = 'plain'
+        return email
 
 
 class EmailSettings(models.Model):
@@ -238,6 +777,16 @@ class EmailSettings(models.Model):
     Configuration globale des emails (singleton)
     """
     
+    # Version partagée (cache Django, Redis en production), changée à chaque save()
+    VERSION_CACHE_KEY = 'notifications:email_settings:version'
+    
+    # Durée maximale de la copie locale si le cache n'est pas partagé (LocMem):
+    # la version changée par save() n'est alors vue que par le processus courant
+    LOCAL_MAX_AGE = 300
+    
+    # Copie locale au processus: (version, instance, chargée à)
+    _local_copy = None
+    
     from_email = models.EmailField(
         default='noreply@certitrack.local',
         verbose_name="Email expéditeur"
@@ -326,9 +875,55 @@ class EmailSettings(models.Model):
         # Singleton pattern
         self.pk = 1
         super().save(*args, **kwargs)
+        self.bump_version()
     
     @classmethod
     def get_settings(cls):
-        """Récupère ou crée les paramètres (singleton)"""
+        """Récupère ou crée les paramètres (singleton) - à utiliser pour les modifier"""
         obj, created = cls.objects.get_or_create(pk=1)
         return obj
+    
+    @classmethod
+    def bump_version(cls):
+        """Invalide la copie locale de tous les processus (web et workers)"""
+        cache.set(cls.VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        cls._local_copy = None
+    
+    @staticmethod
+    def cache_is_process_local():
+        """Le cache par défaut n'est-il pas partagé entre processus (LocMem)?"""
+        return isinstance(caches['default'], LocMemCache)
+    
+    @classmethod
+    def get_cached(cls):
+        """
+        Paramètres en lecture seule, depuis la mémoire du processus
+        
+        Seule la clé de version est lue dans le cache partagé: la base n'est
+        interrogée qu'au premier appel et après une modification (save()).
+        Avec un cache propre au processus (LocMem), la copie est en plus
+        rechargée après LOCAL_MAX_AGE secondes.
+        Retourne une copie: la modifier n'affecte pas les autres lecteurs.
+        """
+        version = cache.get(cls.VERSION_CACHE_KEY)
+        local_copy = cls._local_copy
+        
+        if (
+            local_copy is not None
+            and version is not None
+            and local_copy[0] == version
+            and not (
+                cls.cache_is_process_local()
+                and time.monotonic() - local_copy[2] >= cls.LOCAL_MAX_AGE
+            )
+        ):
+            return copy.copy(local_copy[1])
+        
+        obj = cls.get_settings()
+        if version is None:
+            # Cache vide (démarrage, éviction): publier une version
+            cache.add(cls.VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+            version = cache.get(cls.VERSION_CACHE_KEY)
+        
+        cls._local_copy = (version, obj, time.monotonic())
+        return copy.copy(obj)
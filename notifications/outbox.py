@@ -0,0 +1,199 @@
+"""
+Vidage de la file d'attente des emails (OutboundEmail)
+
+Les messages dus sont réservés par lots (verrou SKIP LOCKED sur PostgreSQL,
+puis bail sur next_attempt_at: deux workers ne prennent pas le même lot),
+envoyés sur une seule session SMTP à débit limité, puis marqués envoyés ou
+en échec en quelques requêtes par lot. Un échec temporaire est retenté avec
+un délai doublé à chaque tentative; les envois groupés liés sont complétés
+(journal, registre) une fois le statut final connu.
+"""
+import random
+import smtplib
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .email_backend import EmailSession
+from .models import NotificationDigest, OutboundEmail
+
+# Durée minimale de réservation d'un lot par un worker (s)
+LEASE_SECONDS = 300
+
+# Délai maximal entre deux tentatives (s)
+MAX_RETRY_DELAY = 6 * 3600
+
+
+class RateLimiter:
+    """Espace les envois pour ne pas dépasser rate messages par seconde (0 = illimité)"""
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = 0.0
+    
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+def retry_delay(attempts: int, backoff: Optional[int] = None) -> timedelta:
+    """Délai avant la tentative suivante: backoff * 2^(attempts-1), plafonné, dont une moitié aléatoire"""
+    if backoff is None:
+        backoff = settings.OUTBOX_RETRY_BACKOFF
+    delay = min(MAX_RETRY_DELAY, backoff * 2 ** max(0, attempts - 1))
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Refus définitif du serveur (destinataires refusés, code 5xx): inutile de retenter"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+def claim_batch(batch_size: int, lease_seconds: float) -> List[OutboundEmail]:
+    """Réserve les batch_size messages dus les plus anciens pour lease_seconds"""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if rows:
+            OutboundEmail.objects.filter(pk__in=[row.pk for row in rows]).update(
+                next_attempt_at=now + timedelta(seconds=lease_seconds)
+            )
+    return rows
+
+
+def send_batch(rows: List[OutboundEmail], session: EmailSession, limiter: RateLimiter):
+    """
+    Envoie un lot sur la session
+    
+    Returns:
+        (envoyés, échecs [(message, erreur, définitif)], reportés, relais injoignable)
+        Si le relais est injoignable, le reste du lot est reporté sans être tenté.
+    """
+    sent = []
+    failures = []
+    
+    for index, row in enumerate(rows):
+        limiter.wait()
+        try:
+            session.send(row.to_email_message())
+        except EmailSession.RETRYABLE_ERRORS as e:
+            # Déjà retenté sur une nouvelle connexion par la session
+            failures.append((row, str(e), False))
+            return sent, failures, rows[index + 1:], True
+        except Exception as e:
+            failures.append((row, str(e), is_permanent_error(e)))
+        else:
+            sent.append(row)
+    
+    return sent, failures, [], False
+
+
+def record_batch(sent, failures, deferred, max_attempts: int) -> Dict:
+    """Statuts du lot en quelques requêtes groupées, puis complétion des envois groupés liés"""
+    now = timezone.now()
+    failed = []
+    retried = []
+    
+    for row, error, permanent in failures:
+        row.attempts += 1
+        row.last_error = error
+        if permanent or row.attempts >= max_attempts:
+            row.status = 'failed'
+            row.next_attempt_at = now
+            failed.append(row)
+        else:
+            row.next_attempt_at = now + retry_delay(row.attempts)
+            retried.append(row)
+    
+    with transaction.atomic():
+        if sent:
+            OutboundEmail.objects.filter(pk__in=[row.pk for row in sent]).update(
+                status='sent',
+                sent_at=now,
+                attempts=F('attempts') + 1,
+                last_error='',
+            )
+        if failures:
+            OutboundEmail.objects.bulk_update(
+                [row for row, _, _ in failures],
+                ['status', 'attempts', 'last_error', 'next_attempt_at'],
+            )
+        if deferred:
+            OutboundEmail.objects.filter(pk__in=[row.pk for row in deferred]).update(
+                next_attempt_at=now + retry_delay(1)
+            )
+        
+        # Journal et registre: seulement au statut final (un message retenté reste réservé)
+        finished = [(row, 'sent') for row in sent] + [(row, 'failed') for row in failed]
+        digests = NotificationDigest.objects.in_bulk([row.digest_id for row, _ in finished if row.digest_id])
+        for row, status in finished:
+            digest = digests.get(row.digest_id)
+            if digest is not None and digest.status == 'pending':
+                digest.complete(status, message=row.body, error_message=row.last_error or None)
+    
+    return {
+        'sent': len(sent),
+        'retried': len(retried) + len(deferred),
+        'failed': len(failed),
+    }
+
+
+def drain_outbox(batch_size: Optional[int] = None, rate_limit: Optional[float] = None,
+                 max_batches: Optional[int] = None, max_attempts: Optional[int] = None) -> Dict:
+    """
+    Envoie les messages dus de la file, lot par lot, sur une seule session SMTP
+    
+    Args:
+        batch_size: Messages réservés par lot (défaut: OUTBOX_BATCH_SIZE)
+        rate_limit: Messages par seconde au maximum (défaut: OUTBOX_RATE_LIMIT, 0 = illimité)
+        max_batches: Nombre maximal de lots (défaut: jusqu'à épuisement de la file)
+        max_attempts: Tentatives par message avant échec définitif (défaut: OUTBOX_MAX_ATTEMPTS)
+    
+    Returns:
+        Dict sent / retried / failed / batches / connections
+    """
+    batch_size = max(1, batch_size or settings.OUTBOX_BATCH_SIZE)
+    rate_limit = settings.OUTBOX_RATE_LIMIT if rate_limit is None else rate_limit
+    max_attempts = max(1, max_attempts or settings.OUTBOX_MAX_ATTEMPTS)
+    
+    # Le bail couvre largement le temps d'envoi d'un lot au débit maximal
+    lease_seconds = max(LEASE_SECONDS, 2 * batch_size / rate_limit if rate_limit else 0)
+    limiter = RateLimiter(rate_limit)
+    totals = {'sent': 0, 'retried': 0, 'failed': 0, 'batches': 0}
+    
+    with EmailSession() as session:
+        while max_batches is None or totals['batches'] < max_batches:
+            rows = claim_batch(batch_size, lease_seconds)
+            if not rows:
+                break
+            
+            sent, failures, deferred, relay_down = send_batch(rows, session, limiter)
+            counts = record_batch(sent, failures, deferred, max_attempts=max_attempts)
+            for key, value in counts.items():
+                totals[key] += value
+            totals['batches'] += 1
+            
+            # Relais injoignable: inutile de réserver le lot suivant
+            if relay_down:
+                break
+    
+    totals['connections'] = session.connections_opened
+    return totals
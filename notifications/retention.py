@@ -0,0 +1,64 @@
+"""
+Rétention de l'historique des notifications
+
+Le journal (NotificationLog) et les envois groupés (NotificationDigest) plus
+anciens que la durée de rétention sont supprimés par lots de clés primaires:
+chaque DELETE est court et ne verrouille qu'un lot. Les compteurs quotidiens
+(NotificationDailyStat) sont conservés.
+"""
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import NotificationDigest, NotificationLog
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def get_retention_cutoff(retention_days: Optional[int] = None):
+    """Date limite: tout ce qui a été envoyé avant est supprimé (au moins 1 jour conservé)"""
+    if retention_days is None:
+        retention_days = settings.NOTIFICATION_LOG_RETENTION_DAYS
+    return timezone.now() - timedelta(days=max(1, retention_days))
+
+
+def delete_in_chunks(queryset, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Supprime les lignes du queryset par lots de chunk_size clés primaires
+    (les plus anciennes d'abord)
+    
+    Returns:
+        Nombre de lignes supprimées
+    """
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        count, _ = queryset.model.objects.filter(pk__in=ids).delete()
+        deleted += count
+
+
+def prune_notification_history(retention_days: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                               dry_run: bool = False) -> Dict:
+    """
+    Purge le journal et les envois groupés plus anciens que retention_days
+    
+    Returns:
+        Dict avec cutoff et les nombres de logs / digests supprimés (ou à supprimer)
+    """
+    cutoff = get_retention_cutoff(retention_days)
+    logs = NotificationLog.objects.filter(sent_at__lt=cutoff)
+    digests = NotificationDigest.objects.filter(sent_at__lt=cutoff)
+    
+    if dry_run:
+        return {'cutoff': cutoff, 'logs': logs.count(), 'digests': digests.count()}
+    
+    # Les lignes de journal d'abord: les digests n'ont alors plus rien à cascader
+    return {
+        'cutoff': cutoff,
+        'logs': delete_in_chunks(logs, chunk_size),
+        'digests': delete_in_chunks(digests, chunk_size),
+    }
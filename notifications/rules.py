@@ -0,0 +1,81 @@
+"""
+Moteur d'évaluation des règles de notification
+
+Les certificats candidats sont lus en une seule requête (fenêtre la plus large
+parmi les règles), puis chaque règle est appliquée en mémoire: le nombre de
+requêtes ne dépend plus du nombre de règles.
+"""
+from typing import Iterable, List, NamedTuple, Optional
+
+from certificates.models import Certificate
+from .models import NotificationRule
+
+# Statuts des certificats pouvant déclencher une alerte
+ALERT_STATUSES = ['active', 'expiring_soon']
+
+# Colonnes utiles aux filtres des règles et au contenu des emails
+CANDIDATE_FIELDS = ['id', 'common_name', 'issuer', 'valid_until', 'days_remaining', 'environment', 'status']
+
+
+class RuleMatch(NamedTuple):
+    """Certificats correspondant à une règle (triés par jours restants)"""
+    rule: NotificationRule
+    certificates: List[Certificate]
+
+
+class RuleEngine:
+    """
+    Évalue un ensemble de règles sur les certificats en un seul passage
+    
+    Usage:
+        engine = RuleEngine(NotificationRule.objects.filter(is_active=True))
+        for match in engine.evaluate():
+            ...
+    """
+    
+    def __init__(self, rules: Iterable[NotificationRule]):
+        self.rules = list(rules)
+    
+    @property
+    def max_days(self) -> Optional[int]:
+        """Fenêtre la plus large parmi les règles"""
+        if not self.rules:
+            return None
+        return max(rule.days_before_expiration for rule in self.rules)
+    
+    def fetch_candidates(self) -> List[Certificate]:
+        """Union des certificats pouvant correspondre à au moins une règle (une requête)"""
+        max_days = self.max_days
+        if max_days is None or max_days < 0:
+            return []
+        
+        return list(
+            Certificate.objects.filter(
+                status__in=ALERT_STATUSES,
+                days_remaining__lte=max_days,
+                days_remaining__gte=0  # Exclure les certificats déjà expirés
+            ).only(*CANDIDATE_FIELDS).order_by('days_remaining', 'common_name')
+        )
+    
+    @staticmethod
+    def matches(rule: NotificationRule, certificate: Certificate) -> bool:
+        """Équivalent en mémoire des filtres days/environment/issuer de la règle"""
+        if certificate.days_remaining is None or not 0 <= certificate.days_remaining <= rule.days_before_expiration:
+            return False
+        
+        if rule.filter_by_environment and certificate.environment != rule.filter_by_environment:
+            return False
+        
+        # issuer__icontains
+        if rule.filter_by_issuer and rule.filter_by_issuer.casefold() not in (certificate.issuer or '').casefold():
+            return False
+        
+        return True
+    
+    def evaluate(self) -> List[RuleMatch]:
+        """Certificats correspondant à chaque règle, dans l'ordre des règles"""
+        candidates = self.fetch_candidates()
+        return [
+            RuleMatch(rule, [cert for cert in candidates if self.matches(rule, cert)])
+            for rule in self.rules
+        ]
@@ -3,14 +3,16 @@ Tâches Celery pour les notifications
 """
 from celery import shared_task
 from django.core.management import call_command
-from django.core.mail import EmailMessage
-from django.template.loader import render_to_string
+from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
-from datetime import timedelta
 
 from certificates.models import Certificate
-from .models import NotificationRule, NotificationLog, EmailSettings
+from .models import NotificationRule, NotificationDigest, OutboundEmail, EmailSettings
+from .outbox import drain_outbox
+from .retention import prune_notification_history
+from .rules import RuleEngine
+from .webhooks import WebhookJob, build_digest_payload, deliver_webhook_jobs
 
 
 @shared_task(name='notifications.tasks.check_certificate_expirations')
@@ -40,20 +42,47 @@ def send_daily_summary_task():
         return f'Erreur lors de l\'envoi du résumé: {str(e)}'
 
 
+@shared_task(name='notifications.tasks.purge_notification_history')
+def purge_notification_history():
+    """
+    Tâche Celery pour purger le journal des notifications au-delà de la rétention
+    Appelée quotidiennement par Celery Beat
+    """
+    try:
+        result = prune_notification_history()
+        return f'{result["logs"]} log(s) et {result["digests"]} envoi(s) groupé(s) purgés'
+    except Exception as e:
+        return f'Erreur lors de la purge: {str(e)}'
+
+
+@shared_task(name='notifications.tasks.drain_email_outbox')
+def drain_email_outbox():
+    """
+    Tâche Celery pour envoyer les emails en file d'attente
+    Appelée chaque minute par Celery Beat
+    """
+    try:
+        result = drain_outbox()
+        return (
+            f'{result["sent"]} email(s) envoyé(s), {result["retried"]} à retenter, '
+            f'{result["failed"]} en échec'
+        )
+    except Exception as e:
+        return f'Erreur lors de l\'envoi de la file d\'attente: {str(e)}'
+
+
 @shared_task(name='notifications.tasks.monthly_alert_30_days')
 def monthly_alert_30_days():
     """
     Tâche Celery pour l'alerte mensuelle des certificats expirant dans 30 jours ou moins
     Exécutée le 1er de chaque mois
     """
-    from django.core.mail import EmailMessage
-    from .email_backend import get_connection
     from certificates.models import Certificate
     from .models import EmailSettings
     from django.utils import timezone
     
     try:
-        email_settings = EmailSettings.get_settings()
+        email_settings = EmailSettings.get_cached()
         
         # Récupérer tous les certificats expirant dans 30 jours ou moins
         certificates = Certificate.objects.filter(
@@ -89,20 +118,15 @@ Message automatique – merci de ne pas répondre.
 Cordialement,
 CertiTrack"""
         
-        # Envoyer l'email
-        connection = get_connection()
-        email = EmailMessage(
+        # Mettre l'email en file (envoyé par drain_email_outbox)
+        OutboundEmail.enqueue(
             subject='Alerte Mensuelle - Certificats expirant dans 30 jours',
             body=body_content,
+            recipients=recipients,
             from_email=f'{email_settings.from_name} <{email_settings.from_email}>',
-            to=recipients,
-            connection=connection
         )
-        email.encoding = 'utf-8'
-        email.content_subtype = 'plain'
-        email.send(fail_silently=False)
         
-        return f'Alerte mensuelle 30 jours envoyée pour {certificates.count()} certificat(s)'
+        return f'Alerte mensuelle 30 jours mise en file pour {certificates.count()} certificat(s)'
         
     except Exception as e:
         return f'Erreur lors de l\'envoi de l\'alerte mensuelle 30 jours: {str(e)}'
@@ -114,14 +138,12 @@ def monthly_alert_7_days():
     Tâche Celery pour l'alerte mensuelle des certificats expirant dans 7 jours ou moins
     Exécutée 7 jours avant la fin du mois
     """
-    from django.core.mail import EmailMessage
-    from .email_backend import get_connection
     from certificates.models import Certificate
     from .models import EmailSettings
     from django.utils import timezone
     
     try:
-        email_settings = EmailSettings.get_settings()
+        email_settings = EmailSettings.get_cached()
         
         # Récupérer tous les certificats expirant dans 7 jours ou moins
         certificates = Certificate.objects.filter(
@@ -157,20 +179,15 @@ Message automatique – merci de ne pas répondre.
 Cordialement,
 CertiTrack"""
         
-        # Envoyer l'email
-        connection = get_connection()
-        email = EmailMessage(
+        # Mettre l'email en file (envoyé par drain_email_outbox)
+        OutboundEmail.enqueue(
             subject='Alerte Mensuelle - Certificats expirant dans 7 jours',
             body=body_content,
+            recipients=recipients,
             from_email=f'{email_settings.from_name} <{email_settings.from_email}>',
-            to=recipients,
-            connection=connection
         )
-        email.encoding = 'utf-8'
-        email.content_subtype = 'plain'
-        email.send(fail_silently=False)
         
-        return f'Alerte mensuelle 7 jours envoyée pour {certificates.count()} certificat(s)'
+        return f'Alerte mensuelle 7 jours mise en file pour {certificates.count()} certificat(s)'
         
     except Exception as e:
         return f'Erreur lors de l\'envoi de l\'alerte mensuelle 7 jours: {str(e)}'
@@ -183,24 +200,30 @@ def send_rule_alert(rule_id):
     """
     try:
         rule = NotificationRule.objects.get(id=rule_id)
-        email_settings = EmailSettings.get_settings()
+        email_settings = EmailSettings.get_cached()
         
-        # Récupérer les certificats selon la règle
-        certificates = Certificate.objects.filter(
-            status__in=['active', 'expiring_soon'],
-            days_remaining__lte=rule.days_before_expiration,
-            days_remaining__gte=0
-        )
+        # Récupérer les certificats selon la règle (mêmes filtres que check_expirations)
+        [(_, certificates)] = RuleEngine([rule]).evaluate()
         
-        # Appliquer les filtres de la règle
-        if rule.filter_by_environment:
-            certificates = certificates.filter(environment=rule.filter_by_environment)
+        if not certificates:
+            return f'Aucun certificat trouvé pour la règle {rule.name}'
         
-        if rule.filter_by_issuer:
-            certificates = certificates.filter(issuer__icontains=rule.filter_by_issuer)
+        # Webhook (envoi manuel: hors registre d'idempotence)
+        webhook_status = ''
+        if rule.sends_webhook:
+            digest = NotificationDigest.claim(
+                certificates,
+                recipients=[rule.webhook_url],
+                subject=rule.email_subject,
+                rule=rule,
+                notification_type='webhook',
+            )
+            job = WebhookJob(digest, rule.webhook_url, build_digest_payload(rule, certificates, rule.email_subject))
+            [result] = deliver_webhook_jobs([job])
+            webhook_status = ' (webhook envoyé)' if result.ok else f' (échec du webhook: {result.error})'
         
-        if not certificates.exists():
-            return f'Aucun certificat trouvé pour la règle {rule.name}'
+        if not rule.sends_email:
+            return f'Webhook de la règle {rule.name} pour {len(certificates)} certificat(s){webhook_status}'
         
         # Préparer les destinataires
         recipients = rule.get_recipients_list()
@@ -209,7 +232,7 @@ def send_rule_alert(rule_id):
             recipients = [email.strip() for email in recipients if email.strip()]
         
         if not recipients:
-            return 'Aucun destinataire configuré'
+            return f'Aucun destinataire configuré{webhook_status}'
         
         # Créer le contenu email
         cert_list = ""
@@ -228,41 +251,26 @@ Message automatique – merci de ne pas répondre.
 Cordialement,
 CertiTrack"""
         
-        # Envoyer l'email
-        connection = get_connection()
-        email = EmailMessage(
-            subject=rule.email_subject,
-            body=body_content,
-            from_email=f'{email_settings.from_name} <{email_settings.from_email}>',
-            to=recipients,
-            connection=connection
-        )
-        email.encoding = 'utf-8'
-        email.content_subtype = 'plain'
-        email.send(fail_silently=False)
-        
-        # Logger le succès pour chaque certificat
-        for cert in certificates:
-            NotificationLog.objects.create(
-                certificate=cert,
+        # Réserver l'envoi groupé et mettre l'email en file: le journal est
+        # complété par drain_email_outbox une fois l'email envoyé
+        with transaction.atomic():
+            digest = NotificationDigest.claim(
+                certificates,
+                recipients=recipients,
+                subject=rule.email_subject,
                 rule=rule,
-                status='sent',
-                message=f'Alerte groupée envoyée pour {certificates.count()} certificat(s)'
+            )
+            OutboundEmail.enqueue(
+                subject=rule.email_subject,
+                body=body_content,
+                recipients=recipients,
+                from_email=f'{email_settings.from_name} <{email_settings.from_email}>',
+                digest=digest,
             )
         
-        return f'Alerte de la règle {rule.name} envoyée pour {certificates.count()} certificat(s)'
+        return f'Alerte de la règle {rule.name} mise en file pour {len(certificates)} certificat(s){webhook_status}'
         
     except Exception as e:
-        # Logger l'erreur
-        try:
-            NotificationLog.objects.create(
-                rule=rule,
-                status='error',
-                message=str(e)
-            )
-        except:
-            pass
-        
         return f'Erreur lors de l\'envoi de la règle {rule_id}: {str(e)}'
 
 
@@ -274,7 +282,7 @@ def send_certificate_alert(certificate_id, rule_id):
     try:
         certificate = Certificate.objects.get(id=certificate_id)
         rule = NotificationRule.objects.get(id=rule_id)
-        email_settings = EmailSettings.get_settings()
+        email_settings = EmailSettings.get_cached()
         
         # Préparer les destinataires
         recipients = rule.get_recipients_list()
@@ -305,10 +313,6 @@ def send_certificate_alert(certificate_id, rule_id):
             'other_expiring_certs': other_expiring,
         }
         
-        # Utiliser la connexion avec les paramètres de la base
-        from .email_backend import get_connection
-        connection = get_connection()
-        
         # Créer le contenu email directement avec formatage forcé
         from_email = f'{email_settings.from_name} <{email_settings.from_email}>'
         
@@ -329,48 +333,29 @@ Message automatique – merci de ne pas répondre.
 Cordialement,
 CertiTrack"""
         
-        # Envoyer seulement du texte simple avec encodage UTF-8 explicite
-        email = EmailMessage(
-            subject=rule.email_subject,
-            body=body_content,
-            from_email=from_email,
-            to=recipients,
-            connection=connection
-        )
-        # Forcer l'encodage UTF-8 et le type de contenu
-        email.encoding = 'utf-8'
-        email.content_subtype = 'plain'
-        email.send(fail_silently=False)
-        
-        # Logger le succès
-        NotificationLog.objects.create(
-            certificate=certificate,
-            rule=rule,
-            notification_type='email',
-            status='sent',
-            recipients='\n'.join(recipients),
-            subject=rule.email_subject,
-            message=text_content
-        )
+        # Réserver l'envoi (journal 'pending') et mettre l'email en file
+        with transaction.atomic():
+            digest = NotificationDigest.claim(
+                [certificate],
+                recipients=recipients,
+                subject=rule.email_subject,
+                rule=rule,
+            )
+            OutboundEmail.enqueue(
+                subject=rule.email_subject,
+                body=body_content,
+                recipients=recipients,
+                from_email=from_email,
+                digest=digest,
+            )
         
-        return f'Alerte envoyée pour {certificate.common_name}'
+        return f'Alerte mise en file pour {certificate.common_name}'
         
     except Certificate.DoesNotExist:
         return f'Certificat {certificate_id} introuvable'
     except NotificationRule.DoesNotExist:
         return f'Règle {rule_id} introuvable'
     except Exception as e:
-        # Logger l'erreur
-        if 'certificate' in locals() and 'rule' in locals():
-            NotificationLog.objects.create(
-                certificate=certificate,
-                rule=rule,
-                notification_type='email',
-                status='failed',
-                recipients='\n'.join(recipients) if 'recipients' in locals() else '',
-                subject=rule.email_subject if 'rule' in locals() else '',
-                error_message=str(e)
-            )
         return f'Erreur: {str(e)}'
 
 
@@ -381,7 +366,7 @@ def test_email_configuration(recipient_email):
     """
     try:
         from .email_backend import get_connection
-        email_settings = EmailSettings.get_settings()
+        email_settings = EmailSettings.get_cached()
         connection = get_connection()
         from_email = f'{email_settings.from_name} <{email_settings.from_email}>'
         
@@ -1,3 +1,620 @@
-from django.test import TestCase
+import importlib
+import json
+import socketserver
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from certificates.models import Certificate
+from .models import (
+    EmailSettings,
+    NotificationDailyStat,
+    NotificationDigest,
+    NotificationLog,
+    NotificationRule,
+    OutboundEmail,
+)
+from .outbox import drain_outbox
+from .retention import delete_in_chunks, prune_notification_history
+from .webhooks import WebhookDispatcher
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    """Serveur SMTP minimal: accepte tout, compte connexions et messages"""
+    
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+    
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        
+        self.reply('220 localhost ESMTP stand-in')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+            
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command.startswith('RCPT') and server.reject_recipients:
+                self.reply('550 No such user')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                self.reply('250 OK')
+                # Simule un relais qui coupe la session après chaque message
+                if server.drop_after_message:
+                    return
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, drop_after_message=False, reject_recipients=False):
+        super().__init__(('127.0.0.1', 0), SMTPStandInHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self.drop_after_message = drop_after_message
+        self.reject_recipients = reject_recipients
+    
+    @property
+    def port(self):
+        return self.server_address[1]
+    
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+    
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+def configure_smtp(server):
+    """Pointe la configuration email vers le serveur de test"""
+    email_settings = EmailSettings.get_settings()
+    email_settings.smtp_host = '127.0.0.1'
+    email_settings.smtp_port = server.port
+    email_settings.smtp_use_tls = False
+    email_settings.smtp_use_ssl = False
+    email_settings.smtp_username = ''
+    email_settings.smtp_password = ''
+    email_settings.smtp_timeout = 5
+    email_settings.enable_notifications = True
+    email_settings.save()
+
+
+@override_settings(OUTBOX_RATE_LIMIT=0)
+class CheckExpirationsSMTPSessionTests(TestCase):
+    """Une exécution de check_expirations réutilise une seule connexion SMTP"""
+    
+    rule_count = 3
+    
+    def setUp(self):
+        today = timezone.now().date()
+        for i in range(5):
+            Certificate.objects.create(
+                common_name=f'app{i}.eid.local',
+                issuer='eid-CA-01-CA',
+                valid_until=today + timedelta(days=5),
+            )
+        for i in range(self.rule_count):
+            NotificationRule.objects.create(
+                name=f'Alerte {i}',
+                days_before_expiration=30,
+                email_recipients='ops@example.com',
+            )
+    
+    def run_check(self):
+        call_command('check_expirations', '--force', '--send-now', stdout=StringIO())
+    
+    def test_one_connection_per_run(self):
+        with SMTPStandIn() as server:
+            configure_smtp(server)
+            self.run_check()
+        
+        self.assertEqual(server.messages, self.rule_count)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(NotificationDigest.objects.filter(status='sent').count(), self.rule_count)
+    
+    def test_reconnects_when_server_drops_session(self):
+        with SMTPStandIn(drop_after_message=True) as server:
+            configure_smtp(server)
+            self.run_check()
+        
+        # Une reconnexion par message après le premier, aucun message perdu
+        self.assertEqual(server.messages, self.rule_count)
+        self.assertEqual(server.connections, self.rule_count)
+        self.assertFalse(NotificationDigest.objects.filter(status='failed').exists())
+    
+    def test_dry_run_opens_no_connection(self):
+        with SMTPStandIn() as server:
+            configure_smtp(server)
+            call_command('check_expirations', '--dry-run', stdout=StringIO())
+        
+        self.assertEqual(server.connections, 0)
+
+
+class NotificationDigestLedgerTests(TestCase):
+    """Registre d'idempotence des envois groupés"""
+    
+    def setUp(self):
+        self.rule = NotificationRule.objects.create(
+            name='Alerte',
+            days_before_expiration=30,
+            email_recipients='ops@example.com',
+        )
+        self.certificate = Certificate.objects.create(
+            common_name='app.eid.local',
+            issuer='eid-CA-01-CA',
+            valid_until=timezone.now().date() + timedelta(days=5),
+        )
+        self.today = timezone.now().date()
+    
+    def claim(self):
+        return NotificationDigest.claim(
+            [self.certificate],
+            recipients=['ops@example.com'],
+            subject='Alerte',
+            rule=self.rule,
+            run_date=self.today,
+        )
+    
+    def test_same_dispatch_is_claimed_once(self):
+        self.assertIsNotNone(self.claim())
+        self.assertIsNone(self.claim())
+    
+    def test_failed_dispatch_releases_the_key(self):
+        self.claim().complete('failed', error_message='relais indisponible')
+        self.assertIsNotNone(self.claim())
+    
+    def test_check_expirations_sends_once_per_day(self):
+        with SMTPStandIn() as server:
+            configure_smtp(server)
+            call_command('check_expirations', '--send-now', stdout=StringIO())
+            call_command('check_expirations', '--send-now', stdout=StringIO())
+        
+        self.assertEqual(server.messages, 1)
+        self.assertEqual(NotificationDigest.objects.filter(status='sent').count(), 1)
+
+
+class WebhookStandInHandler(BaseHTTPRequestHandler):
+    """Serveur HTTP keep-alive: compte connexions, requêtes, latence et concurrence"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+    
+    def do_POST(self):
+        server = self.server
+        started = time.monotonic()
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            # Les premières requêtes échouent (serveur surchargé)
+            status = server.error_status if server.requests <= server.fail_first else 200
+        
+        time.sleep(server.delay)
+        
+        with server.lock:
+            server.in_flight -= 1
+            server.payloads.append(json.loads(body))
+            server.latencies.append(time.monotonic() - started)
+        
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+    
+    def log_message(self, *args):
+        pass
+
+
+class WebhookStandIn(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, delay=0.0, fail_first=0, error_status=503):
+        super().__init__(('127.0.0.1', 0), WebhookStandInHandler)
+        self.lock = threading.Lock()
+        self.delay = delay
+        self.fail_first = fail_first
+        self.error_status = error_status
+        self.connections = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.payloads = []
+        self.latencies = []
+    
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/hooks/certificates'
+    
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+    
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class WebhookDispatcherTests(TestCase):
+    """Envois parallèles, connexions réutilisées, nouveaux essais et délais"""
+    
+    def test_reuses_keep_alive_connections(self):
+        with WebhookStandIn() as server, WebhookDispatcher(max_workers=2, max_per_host=2) as dispatcher:
+            results = dispatcher.dispatch([(server.url, {'n': i}) for i in range(20)])
+        
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(server.requests, 20)
+        self.assertLessEqual(server.connections, 2)
+        self.assertEqual(dispatcher.pool.connections_opened, server.connections)
+    
+    def test_concurrency_is_bounded(self):
+        with WebhookStandIn(delay=0.2) as server, WebhookDispatcher(max_workers=3) as dispatcher:
+            started = time.monotonic()
+            results = dispatcher.dispatch([(server.url, {'n': i}) for i in range(6)])
+            elapsed = time.monotonic() - started
+        
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(server.max_in_flight, 3)
+        # Deux vagues de 3 requêtes au lieu de 6 requêtes successives
+        self.assertLess(elapsed, 6 * 0.2)
+        self.assertTrue(all(latency >= 0.2 for latency in server.latencies))
+    
+    def test_retries_server_errors_with_backoff(self):
+        with WebhookStandIn(fail_first=2) as server, \
+                WebhookDispatcher(max_attempts=3, backoff=0.01) as dispatcher:
+            [result] = dispatcher.dispatch([(server.url, {})])
+        
+        self.assertTrue(result.ok)
+        self.assertEqual(result.attempts, 3)
+        self.assertEqual(server.requests, 3)
+    
+    def test_client_errors_are_not_retried(self):
+        with WebhookStandIn(fail_first=1, error_status=404) as server, \
+                WebhookDispatcher(max_attempts=3, backoff=0.01) as dispatcher:
+            [result] = dispatcher.dispatch([(server.url, {})])
+        
+        self.assertFalse(result.ok)
+        self.assertEqual(result.status, 404)
+        self.assertEqual(server.requests, 1)
+    
+    def test_timeout(self):
+        with WebhookStandIn(delay=1.0) as server, \
+                WebhookDispatcher(timeout=0.2, max_attempts=2, backoff=0.01) as dispatcher:
+            [result] = dispatcher.dispatch([(server.url, {})])
+        
+        self.assertFalse(result.ok)
+        self.assertEqual(result.attempts, 2)
+        self.assertLess(result.elapsed, 1.0)
+    
+    def test_backoff_delay_is_capped(self):
+        dispatcher = WebhookDispatcher(backoff=1.0, max_backoff=4.0)
+        for attempt in range(1, 10):
+            self.assertLessEqual(dispatcher.backoff_delay(attempt), min(4.0, 2 ** (attempt - 1)))
+
+
+class CheckExpirationsWebhookTests(TestCase):
+    """check_expirations envoie un webhook par envoi groupé des règles webhook"""
+    
+    def setUp(self):
+        today = timezone.now().date()
+        for i in range(3):
+            Certificate.objects.create(
+                common_name=f'app{i}.eid.local',
+                issuer='eid-CA-01-CA',
+                valid_until=today + timedelta(days=5),
+            )
+        EmailSettings.get_settings().save()
+    
+    def create_rule(self, url, notification_type='webhook'):
+        return NotificationRule.objects.create(
+            name=f'Alerte {notification_type}',
+            days_before_expiration=30,
+            notification_type=notification_type,
+            email_recipients='ops@example.com',
+            webhook_url=url,
+        )
+    
+    def test_webhook_sent_once_per_day(self):
+        with WebhookStandIn() as server:
+            self.create_rule(server.url)
+            call_command('check_expirations', stdout=StringIO())
+            call_command('check_expirations', stdout=StringIO())
+        
+        self.assertEqual(server.requests, 1)
+        [payload] = server.payloads
+        self.assertEqual(payload['certificate_count'], 3)
+        self.assertEqual(len(payload['certificates']), 3)
+        self.assertEqual(NotificationDigest.objects.get().notification_type, 'webhook')
+    
+    def test_both_sends_email_and_webhook(self):
+        with WebhookStandIn() as webhook_server, SMTPStandIn() as smtp_server:
+            configure_smtp(smtp_server)
+            self.create_rule(webhook_server.url, notification_type='both')
+            call_command('check_expirations', '--send-now', stdout=StringIO())
+        
+        self.assertEqual(webhook_server.requests, 1)
+        self.assertEqual(smtp_server.messages, 1)
+        self.assertEqual(
+            sorted(NotificationDigest.objects.filter(status='sent').values_list('notification_type', flat=True)),
+            ['email', 'webhook'],
+        )
+    
+    def test_failed_webhook_is_recorded(self):
+        with WebhookStandIn(fail_first=10, error_status=500) as server, \
+                self.settings(WEBHOOK_MAX_ATTEMPTS=2):
+            self.create_rule(server.url)
+            call_command('check_expirations', stdout=StringIO())
+        
+        digest = NotificationDigest.objects.get()
+        self.assertEqual(digest.status, 'failed')
+        self.assertEqual(digest.error_message, 'HTTP 500')
+        self.assertEqual(server.requests, 2)
+
+
+def unused_port():
+    """Port local sans serveur (connexion refusée)"""
+    with socketserver.TCPServer(('127.0.0.1', 0), socketserver.BaseRequestHandler) as server:
+        return server.server_address[1]
+
+
+class OutboxDrainTests(TestCase):
+    """File d'attente des emails: lots, débit, nouveaux essais, statuts groupés"""
+    
+    def enqueue(self, count):
+        for i in range(count):
+            OutboundEmail.enqueue(
+                subject=f'Alerte {i}',
+                body='Certificats arrivant à échéance',
+                recipients=['ops@example.com'],
+                from_email='CertiTrack <certitrack@example.com>',
+            )
+    
+    def test_batches_share_one_connection(self):
+        self.enqueue(7)
+        with SMTPStandIn() as server:
+            configure_smtp(server)
+            result = drain_outbox(batch_size=3, rate_limit=0)
+        
+        self.assertEqual(result['sent'], 7)
+        self.assertEqual(result['batches'], 3)
+        self.assertEqual(server.messages, 7)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(OutboundEmail.objects.filter(status='sent', attempts=1, sent_at__isnull=False).count(), 7)
+    
+    def test_rate_limit(self):
+        self.enqueue(5)
+        with SMTPStandIn() as server:
+            configure_smtp(server)
+            started = time.monotonic()
+            drain_outbox(rate_limit=20)
+            elapsed = time.monotonic() - started
+        
+        self.assertEqual(server.messages, 5)
+        # 4 intervalles de 50 ms entre 5 envois
+        self.assertGreaterEqual(elapsed, 0.2)
+    
+    def configure_unreachable_smtp(self):
+        email_settings = EmailSettings.get_settings()
+        email_settings.smtp_host = '127.0.0.1'
+        email_settings.smtp_port = unused_port()
+        email_settings.smtp_use_tls = False
+        email_settings.save()
+    
+    def test_unreachable_relay_is_retried_later(self):
+        self.enqueue(3)
+        self.configure_unreachable_smtp()
+        
+        result = drain_outbox(rate_limit=0)
+        
+        self.assertEqual(result['sent'], 0)
+        self.assertEqual(result['retried'], 3)
+        self.assertEqual(result['batches'], 1)
+        self.assertFalse(OutboundEmail.objects.exclude(status='pending').exists())
+        self.assertFalse(OutboundEmail.objects.filter(next_attempt_at__lte=timezone.now()).exists())
+        # Seul le message tenté compte une tentative, les autres sont reportés
+        self.assertEqual(sorted(OutboundEmail.objects.values_list('attempts', flat=True)), [0, 0, 1])
+        
+        # Pas encore dus: rien n'est retenté immédiatement
+        self.assertEqual(drain_outbox(rate_limit=0)['batches'], 0)
+    
+    def test_last_attempt_marks_failed(self):
+        self.enqueue(1)
+        OutboundEmail.objects.update(attempts=2)
+        self.configure_unreachable_smtp()
+        
+        result = drain_outbox(rate_limit=0, max_attempts=3)
+        
+        self.assertEqual(result['failed'], 1)
+        row = OutboundEmail.objects.get()
+        self.assertEqual(row.status, 'failed')
+        self.assertEqual(row.attempts, 3)
+        self.assertTrue(row.last_error)
+    
+    def test_digest_completed_when_email_is_sent(self):
+        today = timezone.now().date()
+        for i in range(2):
+            Certificate.objects.create(
+                common_name=f'app{i}.eid.local',
+                issuer='eid-CA-01-CA',
+                valid_until=today + timedelta(days=5),
+            )
+        NotificationRule.objects.create(name='Alerte', days_before_expiration=30, email_recipients='ops@example.com')
+        
+        with SMTPStandIn() as server:
+            configure_smtp(server)
+            call_command('check_expirations', stdout=StringIO())
+            
+            # Mis en file: réservé, pas encore envoyé
+            self.assertEqual(server.messages, 0)
+            self.assertEqual(NotificationDigest.objects.get().status, 'pending')
+            self.assertEqual(NotificationLog.objects.filter(status='pending').count(), 2)
+            
+            drain_outbox(rate_limit=0)
+        
+        self.assertEqual(server.messages, 1)
+        self.assertEqual(NotificationDigest.objects.get().status, 'sent')
+        self.assertEqual(NotificationLog.objects.filter(status='sent').count(), 2)
+    
+    def test_rejected_recipients_fail_without_retry(self):
+        Certificate.objects.create(
+            common_name='app.eid.local',
+            issuer='eid-CA-01-CA',
+            valid_until=timezone.now().date() + timedelta(days=5),
+        )
+        NotificationRule.objects.create(name='Alerte', days_before_expiration=30, email_recipients='nobody@example.com')
+        
+        with SMTPStandIn(reject_recipients=True) as server:
+            configure_smtp(server)
+            call_command('check_expirations', stdout=StringIO())
+            result = drain_outbox(rate_limit=0)
+        
+        self.assertEqual(result['failed'], 1)
+        self.assertEqual(OutboundEmail.objects.get().attempts, 1)
+        # L'échec libère la clé du registre
+        self.assertEqual(NotificationDigest.objects.get().status, 'failed')
+
+
+class EmailSettingsCacheTests(TestCase):
+    """Paramètres email en mémoire du processus, rechargés après save()"""
+    
+    def setUp(self):
+        cache.clear()
+        EmailSettings._local_copy = None
+    
+    def test_second_call_does_not_query(self):
+        EmailSettings.get_cached()
+        
+        with self.assertNumQueries(0):
+            EmailSettings.get_cached()
+    
+    def test_save_refreshes_copy(self):
+        EmailSettings.get_cached()
+        
+        email_settings = EmailSettings.get_settings()
+        email_settings.from_name = 'Équipe PKI'
+        email_settings.save()
+        
+        self.assertEqual(EmailSettings.get_cached().from_name, 'Équipe PKI')
+        with self.assertNumQueries(0):
+            EmailSettings.get_cached()
+    
+    def test_shared_cache_ignores_max_age(self):
+        EmailSettings.get_cached()
+        later = time.monotonic() + EmailSettings.LOCAL_MAX_AGE + 1
+        
+        with mock.patch('notifications.models.time.monotonic', return_value=later):
+            with mock.patch.object(EmailSettings, 'cache_is_process_local', return_value=False):
+                with self.assertNumQueries(0):
+                    EmailSettings.get_cached()
+            # Cache propre au processus: la copie expirée est rechargée
+            with self.assertNumQueries(1):
+                EmailSettings.get_cached()
+
+
+class NotificationRetentionTests(TestCase):
+    """Purge du journal par lots et compteurs quotidiens conservés"""
+    
+    def setUp(self):
+        self.rule = NotificationRule.objects.create(
+            name='Alerte',
+            days_before_expiration=30,
+            email_recipients='ops@example.com',
+        )
+        self.certificates = [
+            Certificate.objects.create(
+                common_name=f'app{index}.eid.local',
+                issuer='eid-CA-01-CA',
+                valid_until=timezone.now().date() + timedelta(days=5),
+            )
+            for index in range(5)
+        ]
+    
+    def add_logs(self, status, count):
+        NotificationLog.objects.bulk_create([
+            NotificationLog(certificate=certificate, rule=self.rule, notification_type='email', status=status)
+            for certificate in self.certificates[:count]
+        ])
+    
+    def test_delete_in_chunks_spans_several_chunks(self):
+        self.add_logs('sent', 5)
+        kept = NotificationLog.objects.create(
+            certificate=self.certificates[0], notification_type='email', status='failed'
+        )
+        
+        deleted = delete_in_chunks(NotificationLog.objects.filter(status='sent'), chunk_size=2)
+        
+        self.assertEqual(deleted, 5)
+        self.assertEqual(list(NotificationLog.objects.values_list('pk', flat=True)), [kept.pk])
+    
+    def test_prune_keeps_dashboard_totals(self):
+        NotificationDigest.record(self.certificates[:3], 'sent', ['ops@example.com'], 'Alerte', rule=self.rule)
+        NotificationDigest.record(self.certificates[3:], 'failed', ['ops@example.com'], 'Alerte', rule=self.rule)
+        totals = NotificationDailyStat.totals()
+        self.assertEqual((totals['today_sent'], totals['total_sent'], totals['total_failed']), (3, 3, 2))
+        
+        old = timezone.now() - timedelta(days=400)
+        NotificationLog.objects.update(sent_at=old)
+        NotificationDigest.objects.update(sent_at=old)
+        result = prune_notification_history(retention_days=90, chunk_size=2)
+        
+        self.assertEqual((result['logs'], result['digests']), (5, 2))
+        self.assertFalse(NotificationLog.objects.exists())
+        self.assertEqual(NotificationDailyStat.totals(), totals)
+    
+    def test_increment_and_totals(self):
+        today = timezone.localdate()
+        NotificationDailyStat.increment(self.rule.pk, 'sent', 2, day=today)
+        NotificationDailyStat.increment(self.rule.pk, 'sent', 1, day=today)
+        NotificationDailyStat.increment(self.rule.pk, 'sent', 4, day=today - timedelta(days=10))
+        NotificationDailyStat.increment(self.rule.pk, 'pending', 7, day=today)
+        
+        self.assertEqual(NotificationDailyStat.totals(today), {
+            'today_sent': 3,
+            'week_sent': 3,
+            'total_sent': 7,
+            'total_failed': 0,
+        })
+    
+    def test_migration_backfills_daily_stats(self):
+        self.add_logs('sent', 3)
+        self.add_logs('failed', 1)
+        self.add_logs('pending', 2)
+        migration = importlib.import_module('notifications.migrations.0006_notification_retention_rollups')
+        
+        migration.build_daily_stats(apps, None)
+        
+        stat = NotificationDailyStat.objects.get()
+        self.assertEqual((stat.rule_id, stat.sent_count, stat.failed_count), (self.rule.pk, 3, 1))
@@ -7,7 +7,7 @@ from django.urls import reverse_lazy
 from django.utils import timezone
 from django.http import JsonResponse
 
-from .models import NotificationRule, NotificationLog, EmailSettings
+from .models import NotificationRule, NotificationLog, NotificationDailyStat, EmailSettings
 from .forms import NotificationRuleForm, EmailSettingsForm
 
 
@@ -19,14 +19,15 @@ class NotificationRuleListView(LoginRequiredMixin, ListView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['email_settings'] = EmailSettings.get_settings()
+        context['email_settings'] = EmailSettings.get_cached()
         
-        # Statistiques
+        # Statistiques (compteurs quotidiens: le journal est purgé)
+        totals = NotificationDailyStat.totals()
         context['stats'] = {
             'total_rules': NotificationRule.objects.count(),
             'active_rules': NotificationRule.objects.filter(is_active=True).count(),
-            'total_sent': NotificationLog.objects.filter(status='sent').count(),
-            'total_failed': NotificationLog.objects.filter(status='failed').count(),
+            'total_sent': totals['total_sent'],
+            'total_failed': totals['total_failed'],
         }
         
         return context
@@ -76,7 +77,7 @@ class NotificationLogListView(LoginRequiredMixin, ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        queryset = NotificationLog.objects.select_related('certificate', 'rule')
+        queryset = NotificationLog.objects.select_related('certificate', 'rule', 'digest')
         
         # Filtres
         status = self.request.GET.get('status')
@@ -114,7 +115,7 @@ def email_settings_view(request):
 def test_email_view(request):
     """Tester l'envoi d'email"""
     if request.method == 'POST':
-        email_settings = EmailSettings.get_settings()
+        email_settings = EmailSettings.get_cached()
         recipient = request.POST.get('recipient')
         
         try:
@@ -203,7 +204,6 @@ CertiTrack - Gestion des Certificats SSL/TLS'''
 def dashboard_view(request):
     """Dashboard des notifications"""
     from certificates.models import Certificate
-    from datetime import timedelta
     
     # Certificats expirant bientôt
     expiring_certs = Certificate.objects.filter(
@@ -215,17 +215,12 @@ def dashboard_view(request):
         status='expired'
     ).order_by('-valid_until')[:5]
     
-    # Statistiques notifications
+    # Statistiques notifications (compteurs quotidiens, une requête)
+    totals = NotificationDailyStat.totals()
     logs_stats = {
-        'today_sent': NotificationLog.objects.filter(
-            sent_at__date=timezone.now().date(),
-            status='sent'
-        ).count(),
-        'week_sent': NotificationLog.objects.filter(
-            sent_at__gte=timezone.now() - timedelta(days=7),
-            status='sent'
-        ).count(),
-        'total_failed': NotificationLog.objects.filter(status='failed').count(),
+        'today_sent': totals['today_sent'],
+        'week_sent': totals['week_sent'],
+        'total_failed': totals['total_failed'],
     }
     
     # Règles actives
@@ -236,7 +231,7 @@ def dashboard_view(request):
         'expired_certs': expired_certs,
         'logs_stats': logs_stats,
         'active_rules': active_rules,
-        'email_settings': EmailSettings.get_settings(),
+        'email_settings': EmailSettings.get_cached(),
     }
     
     return render(request, 'notifications/dashboard.html', context)
@@ -252,7 +247,7 @@ def celery_schedules_view(request):
     
     context = {
         'tasks': tasks,
-        'email_settings': EmailSettings.get_settings(),
+        'email_settings': EmailSettings.get_cached(),
         'now': timezone.now(),
     }
     
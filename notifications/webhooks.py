@@ -0,0 +1,259 @@
+"""
+Envoi des webhooks des règles de notification
+
+Chaque envoi groupé est un POST JSON vers NotificationRule.webhook_url. Les
+envois d'un traitement partent en parallèle (nombre de requêtes simultanées
+borné, globalement et par serveur) sur des connexions HTTP keep-alive
+réutilisées. Un échec réseau, un délai dépassé, une réponse 429 ou 5xx est
+retenté avec un délai exponentiel aléatoire (full jitter).
+"""
+import http.client
+import json
+import random
+import ssl
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.utils import timezone
+
+# Réponses après lesquelles un nouvel essai peut réussir
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Connexion keep-alive fermée par le serveur entre deux requêtes
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+USER_AGENT = 'CertiTrack-Webhook/1.0'
+
+
+class WebhookResult(NamedTuple):
+    """Résultat d'un envoi (après les nouveaux essais)"""
+    url: str
+    ok: bool
+    status: Optional[int]
+    attempts: int
+    elapsed: float
+    error: Optional[str] = None
+
+
+class WebhookJob(NamedTuple):
+    """Envoi groupé réservé dans le registre et son contenu"""
+    digest: object
+    url: str
+    payload: Dict
+
+
+def build_digest_payload(rule, certificates, subject) -> Dict:
+    """Corps JSON d'un envoi groupé"""
+    return {
+        'event': 'certificates.expiring',
+        'generated_at': timezone.now().isoformat(),
+        'subject': subject,
+        'rule': {
+            'id': rule.pk,
+            'name': rule.name,
+            'days_before_expiration': rule.days_before_expiration,
+        },
+        'certificate_count': len(certificates),
+        'certificates': [
+            {
+                'id': cert.pk,
+                'common_name': cert.common_name,
+                'issuer': cert.issuer,
+                'valid_until': cert.valid_until.isoformat(),
+                'days_remaining': cert.days_remaining,
+                'environment': cert.environment,
+            }
+            for cert in certificates
+        ],
+    }
+
+
+class HTTPConnectionPool:
+    """
+    Connexions keep-alive inactives, par serveur (schéma, hôte:port)
+    
+    Une connexion n'est utilisée que par un thread à la fois: elle est retirée
+    du pool pendant la requête et y revient si le serveur la garde ouverte.
+    """
+    
+    def __init__(self, timeout: float, max_idle_per_host: int):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+        self._ssl_context = None
+        # Nombre de connexions créées
+        self.connections_opened = 0
+    
+    def acquire(self, origin: Tuple[str, str]):
+        """(connexion, réutilisée)"""
+        with self._lock:
+            if self._idle[origin]:
+                return self._idle[origin].pop(), True
+            self.connections_opened += 1
+        
+        scheme, netloc = origin
+        if scheme == 'https':
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout, context=self._ssl_context), False
+        return http.client.HTTPConnection(netloc, timeout=self.timeout), False
+    
+    def release(self, origin: Tuple[str, str], connection):
+        with self._lock:
+            if len(self._idle[origin]) < self.max_idle_per_host:
+                self._idle[origin].append(connection)
+                return
+        connection.close()
+    
+    def close(self):
+        with self._lock:
+            connections = [conn for idle in self._idle.values() for conn in idle]
+            self._idle.clear()
+        for connection in connections:
+            connection.close()
+
+
+class WebhookDispatcher:
+    """
+    Envoie des webhooks en parallèle sur des connexions réutilisées
+    
+    Usage:
+        with WebhookDispatcher() as dispatcher:
+            results = dispatcher.dispatch([(url, payload), ...])
+    
+    Les résultats sont rendus dans l'ordre des envois; aucune exception n'est
+    levée pour un envoi en échec (voir WebhookResult.error).
+    """
+    
+    def __init__(self, timeout: float = None, max_workers: int = None, max_attempts: int = None,
+                 max_per_host: int = 4, backoff: float = 0.5, max_backoff: float = 30.0):
+        self.timeout = timeout if timeout is not None else settings.WEBHOOK_TIMEOUT
+        self.max_workers = max(1, max_workers or settings.WEBHOOK_MAX_WORKERS)
+        self.max_attempts = max(1, max_attempts or settings.WEBHOOK_MAX_ATTEMPTS)
+        self.max_per_host = max(1, max_per_host)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool = HTTPConnectionPool(self.timeout, self.max_per_host)
+        self._host_slots = defaultdict(lambda: threading.BoundedSemaphore(self.max_per_host))
+        self._slots_lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+    
+    def close(self):
+        self.pool.close()
+    
+    def backoff_delay(self, attempt: int) -> float:
+        """Délai avant l'essai attempt + 1: aléatoire dans [0, backoff * 2^(attempt-1)], plafonné"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+    
+    def dispatch(self, deliveries: Iterable[Tuple[str, Dict]]) -> List[WebhookResult]:
+        """Envoie les (url, payload) en parallèle (au plus max_workers à la fois)"""
+        deliveries = list(deliveries)
+        if not deliveries:
+            return []
+        
+        workers = min(self.max_workers, len(deliveries))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhook') as executor:
+            return list(executor.map(lambda delivery: self.post(*delivery), deliveries))
+    
+    def post(self, url: str, payload: Dict) -> WebhookResult:
+        """Un envoi, retenté jusqu'à max_attempts fois"""
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.netloc)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json; charset=utf-8',
+            'User-Agent': USER_AGENT,
+        }
+        
+        if parts.scheme not in ('http', 'https') or not parts.netloc:
+            return WebhookResult(url, False, None, 0, 0.0, f'URL invalide: {url}')
+        
+        started = time.monotonic()
+        status = None
+        error = None
+        
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with self._host_slot(origin):
+                    status = self._request(origin, path, body, headers)
+            except (OSError, http.client.HTTPException) as e:
+                status = None
+                error = f'{type(e).__name__}: {e}'
+            else:
+                if 200 <= status < 300:
+                    return WebhookResult(url, True, status, attempt, time.monotonic() - started)
+                error = f'HTTP {status}'
+                if status not in RETRYABLE_STATUSES:
+                    break
+            
+            if attempt < self.max_attempts:
+                time.sleep(self.backoff_delay(attempt))
+        
+        return WebhookResult(url, False, status, attempt, time.monotonic() - started, error)
+    
+    def _host_slot(self, origin):
+        """Sémaphore limitant les requêtes simultanées vers un même serveur"""
+        with self._slots_lock:
+            return self._host_slots[origin]
+    
+    def _request(self, origin, path, body, headers) -> int:
+        """POST sur une connexion du pool (nouvelle connexion si la connexion réutilisée a expiré)"""
+        while True:
+            connection, reused = self.pool.acquire(origin)
+            try:
+                connection.request('POST', path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            
+            if response.will_close:
+                connection.close()
+            else:
+                self.pool.release(origin, connection)
+            return response.status
+
+
+def deliver_webhook_jobs(jobs: List[WebhookJob], dispatcher: WebhookDispatcher = None) -> List[WebhookResult]:
+    """
+    Envoie les webhooks réservés et enregistre leur résultat dans le registre
+    
+    Returns:
+        Résultats dans l'ordre des jobs
+    """
+    if not jobs:
+        return []
+    
+    if dispatcher is None:
+        with WebhookDispatcher() as dispatcher:
+            results = dispatcher.dispatch((job.url, job.payload) for job in jobs)
+    else:
+        results = dispatcher.dispatch((job.url, job.payload) for job in jobs)
+    
+    for job, result in zip(jobs, results):
+        message = json.dumps(job.payload, ensure_ascii=False, indent=2)
+        if result.ok:
+            job.digest.complete('sent', message=message)
+        else:
+            job.digest.complete('failed', message=message, error_message=result.error)
+    
+    return results